@@ -0,0 +1,16 @@
+# Бенчмарки запускаются офлайн: конфигурация подменяется до первого импорта configs.env_config,
+# а все файлы бота пишутся во временную папку.
+
+import os
+import tempfile
+
+_workdir = tempfile.mkdtemp(prefix="among_us_bench_")
+os.environ.setdefault("TG_TOKEN", "123456:AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA")
+os.environ.setdefault("ADMIN_USER_ID", "1")
+os.environ.setdefault("TASKS_DB_PATH", os.path.join(_workdir, "tasks.sqlite3"))
+os.environ.setdefault("STATE_DIR", os.path.join(_workdir, "state"))
+os.environ.setdefault("HISTORY_DIR", os.path.join(_workdir, "history"))
+# Фейковый Bot API не ограничивает частоту запросов
+os.environ.setdefault("BROADCAST_THROTTLE", "0")
+# Метрики включаются явно там, где их меряют (bench_metrics), и никто не занимает порт
+os.environ.setdefault("METRICS_PORT", "0")
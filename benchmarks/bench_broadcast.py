@@ -0,0 +1,55 @@
+# benchmarks/bench_broadcast.py
+# Запуск: python -m benchmarks.bench_broadcast
+
+import asyncio
+import time
+
+from aiogram.exceptions import TelegramForbiddenError
+from aiogram.methods import SendMessage
+
+from benchmarks.fake_api import make_fake_bot
+from src.broadcaster import Broadcaster, OutgoingMessage
+
+API_LATENCY = 0.05
+PLAYERS = 12
+
+
+def _blocked_user(method):
+    # Игрок 7 не запускал бота в ЛС
+    if isinstance(method, SendMessage) and method.chat_id == 7:
+        return TelegramForbiddenError(method=method, message="Forbidden: bot can't initiate conversation")
+    return None
+
+
+async def sequential(bot, messages):
+    for m in messages:
+        try:
+            await bot.send_message(m.chat_id, m.text)
+        except Exception:
+            pass
+
+
+async def main():
+    messages = [OutgoingMessage(user_id, f"Роль для игрока {user_id}") for user_id in range(1, PLAYERS + 1)]
+
+    bot = make_fake_bot(latency=API_LATENCY, fail=_blocked_user)
+    started = time.perf_counter()
+    await sequential(bot, messages)
+    sequential_time = time.perf_counter() - started
+
+    bot = make_fake_bot(latency=API_LATENCY, fail=_blocked_user)
+    started = time.perf_counter()
+    results = await Broadcaster().broadcast(bot, messages)
+    concurrent_time = time.perf_counter() - started
+
+    failed = [r.chat_id for r in results if not r.ok]
+    assert failed == [7], failed
+    assert len(bot.session.calls_of("SendMessage")) == PLAYERS
+
+    print(f"{PLAYERS} recipients, API latency {API_LATENCY * 1000:.0f} ms")
+    print(f"  sequential send_message: {sequential_time * 1000:7.1f} ms")
+    print(f"  Broadcaster.broadcast:   {concurrent_time * 1000:7.1f} ms  (undelivered: {failed})")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
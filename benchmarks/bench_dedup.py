@@ -0,0 +1,86 @@
+# benchmarks/bench_dedup.py
+# Запуск: python -m benchmarks.bench_dedup [--chats 200] [--players 8] [--redelivery 0.1]
+# Лобби и голосование, в которых каждое нажатие кнопки сделано дважды, а часть апдейтов
+# доставлена повторно (как при повторах вебхука). Сравнивает число вызовов Bot API и время
+# обработки с дедупликацией src/dedup.py и без нее.
+
+import argparse
+import asyncio
+import copy
+import random
+import time
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+from benchmarks.fake_api import callback_update, make_fake_bot, message_update
+from configs.env_config import Config
+import src.game_state as state
+from src import dedup
+from src.metrics import DEDUP_HITS
+from tg import build_dispatcher
+
+
+def game_updates(game_no: int, players: int, redelivery: float, rng: random.Random):
+    chat_id = -(300_000 + game_no)
+    admin = Config.ADMIN_USER_ID
+    user_ids = [game_no * 1000 + 10 + i for i in range(players)]
+    updates = [message_update(chat_id, admin, "/new_game")]
+    for user_id in user_ids:
+        # Двойное нажатие: два разных апдейта с одинаковой кнопкой
+        updates += [callback_update(chat_id, user_id, "apply_to_join", message_id=5) for _ in range(2)]
+    updates += [callback_update(admin, admin, f"digest_all_{chat_id}", message_id=6) for _ in range(2)]
+    updates.append(message_update(chat_id, admin, "/start_game"))
+    updates.append(message_update(chat_id, user_ids[0], "/vote"))
+    for user_id in user_ids:
+        updates += [callback_update(user_id, user_id, f"vote_{chat_id}_{user_ids[1]}", message_id=7) for _ in range(2)]
+    # Повторная доставка того же апдейта (тот же update_id)
+    redelivered = [u for u in updates if rng.random() < redelivery]
+    return chat_id, updates + [copy.deepcopy(u) for u in redelivered]
+
+
+async def run(dp: Dispatcher, bot: Bot, chats: int, players: int, redelivery: float):
+    rng = random.Random(7)
+    games = [game_updates(game_no, players, redelivery, rng) for game_no in range(chats)]
+
+    async def play(updates):
+        for raw in updates:
+            await dp.feed_update(bot, Update.model_validate(raw, context={"bot": bot}))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(play(updates) for _, updates in games))
+    elapsed = time.perf_counter() - started
+    for chat_id, _ in games:
+        # Двойные нажатия не должны ни задублировать игроков, ни сломать игру
+        game = state.get_game(chat_id)
+        assert game is None or len(game.players) == players, (chat_id, len(game.players))
+        state.end_game(chat_id)
+    return elapsed, sum(len(u) for _, u in games)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chats", type=int, default=200)
+    parser.add_argument("--players", type=int, default=8)
+    parser.add_argument("--redelivery", type=float, default=0.1)
+    args = parser.parse_args()
+
+    dp = build_dispatcher()
+    print(f"{args.chats} chats x {args.players} players, every tap doubled, {args.redelivery:.0%} of updates redelivered")
+    for enabled in (False, True):
+        # TTL 0 — ключи истекают сразу, то есть дедупликации нет
+        dedup.update_cache.ttl = dedup.UPDATE_TTL if enabled else 0
+        dedup.callback_cache.ttl = dedup.CALLBACK_TTL if enabled else 0
+        bot = make_fake_bot()
+        hits_before = DEDUP_HITS.value("update") + DEDUP_HITS.value("callback")
+        elapsed, updates = await run(dp, bot, args.chats, args.players, args.redelivery)
+        hits = DEDUP_HITS.value("update") + DEDUP_HITS.value("callback") - hits_before
+        api_calls = len([c for c in bot.session.calls if type(c).__name__ != "AnswerCallbackQuery"])
+        label = "with dedup" if enabled else "no dedup"
+        print(f"  {label:<10} {updates} updates in {elapsed:.2f} s, API calls (besides callback answers): {api_calls}, "
+              f"dropped duplicates: {hits:.0f}")
+    print(f"  hit counters: update={DEDUP_HITS.value('update'):.0f} callback={DEDUP_HITS.value('callback'):.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,154 @@
+# benchmarks/bench_delivery.py
+# Запуск: python -m benchmarks.bench_delivery [--chats 300] [--messages 5] [--retry-after-rate 0.15] [--timeout-rate 0.1]
+# Доставка личных сообщений через фейковый Bot API, который отвечает 429 и таймаутами:
+# прямая рассылка Broadcaster теряет сообщения, очередь src/delivery.py доставляет все ровно один раз
+# и по порядку — в том числе после "падения" процесса посередине.
+
+import argparse
+import asyncio
+import os
+import random
+import time
+from collections import defaultdict
+
+from aiogram.exceptions import TelegramForbiddenError, TelegramNetworkError, TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+from benchmarks.fake_api import make_fake_bot
+from configs.env_config import Config
+from src.broadcaster import Broadcaster, OutgoingMessage
+from src.delivery import MAX_IN_FLIGHT, DurableOutbox
+
+API_LATENCY = 0.02
+# Пользователь, заблокировавший бота: его сообщения должны попасть к админу как недоставленные
+BLOCKED_USER = 999_999
+
+
+class FlakyApi:
+    """Решает судьбу каждого запроса: 429, таймаут, 403 или успех. Успешные доставки записываются."""
+
+    def __init__(self, retry_after_rate: float, timeout_rate: float, seed: int = 1):
+        self.retry_after_rate = retry_after_rate
+        self.timeout_rate = timeout_rate
+        self.random = random.Random(seed)
+        # {chat_id: [тексты в порядке доставки]}
+        self.delivered = defaultdict(list)
+        self.retry_after = 0
+        self.timeouts = 0
+
+    def __call__(self, method):
+        if not isinstance(method, SendMessage):
+            return None
+        if method.chat_id == BLOCKED_USER:
+            return TelegramForbiddenError(method=method, message="Forbidden: bot was blocked by the user")
+        roll = self.random.random()
+        if roll < self.retry_after_rate:
+            self.retry_after += 1
+            return TelegramRetryAfter(method=method, message="Too Many Requests: retry after 1", retry_after=1)
+        if roll < self.retry_after_rate + self.timeout_rate:
+            self.timeouts += 1
+            return TelegramNetworkError(method=method, message="Request timeout error")
+        self.delivered[method.chat_id].append(method.text)
+        return None
+
+
+def _messages(chats: int, per_chat: int):
+    # id чатов начинаются с 1000, чтобы не совпасть с ADMIN_USER_ID бенчмарков
+    return [OutgoingMessage(chat_id, f"Задание {n} для {chat_id}") for n in range(per_chat) for chat_id in range(1000, 1000 + chats)]
+
+
+async def legacy(messages, api: FlakyApi) -> float:
+    bot = make_fake_bot(latency=API_LATENCY, fail=api)
+    started = time.perf_counter()
+    await Broadcaster(throttle=False).broadcast(bot, messages)
+    return time.perf_counter() - started
+
+
+async def durable(messages, api: FlakyApi, db_path: str, crash_after: float) -> float:
+    bot = make_fake_bot(latency=API_LATENCY, fail=api)
+    queue = DurableOutbox(sender=Broadcaster(throttle=False), max_backoff=2)
+    started = time.perf_counter()
+    queue.start(bot, db_path)
+    for m in messages:
+        queue.enqueue(bot, m.chat_id, m.text, key=m.text)
+    # Повторная постановка (как при повторной доставке апдейта) отбрасывается по ключу
+    duplicates = sum(queue.enqueue(bot, m.chat_id, m.text, key=m.text) for m in messages[:100])
+    assert duplicates == 0, duplicates
+
+    # "Падение": воркер останавливается посередине, очередь открывается заново из того же файла
+    await asyncio.sleep(crash_after)
+    await queue.stop()
+    queue.close()
+    queue = DurableOutbox(sender=Broadcaster(throttle=False), max_backoff=2)
+    queue.start(bot, db_path)
+    drained = await queue.drain(timeout=120)
+    elapsed = time.perf_counter() - started
+    assert drained, queue.counts()
+
+    dead = queue.dead_letters()
+    assert [chat_id for _, chat_id, _, _ in dead] == [BLOCKED_USER], dead
+    # Отчет админу идет через ту же очередь и тоже переживает 429 и таймауты
+    assert len(api.delivered.pop(Config.ADMIN_USER_ID, [])) == 1
+    await queue.stop()
+    queue.close()
+    return elapsed
+
+
+async def saturated_cpu(db_path: str, wait: float = 1.0) -> float:
+    """
+    Все MAX_IN_FLIGHT слотов заняты медленными отправками, за ними в очереди стоят созревшие сообщения:
+    сколько процессорного времени воркер тратит, пока ждет свободного слота.
+    """
+    bot = make_fake_bot(latency=wait * 2)
+    queue = DurableOutbox(sender=Broadcaster(throttle=False))
+    queue.start(bot, db_path)
+    for n in range(MAX_IN_FLIGHT * 2):
+        queue.enqueue(bot, 1000 + n, f"Задание {n}", key=f"saturated:{n}")
+    await asyncio.sleep(0.1)
+    started = time.process_time()
+    await asyncio.sleep(wait)
+    cpu = time.process_time() - started
+    await queue.stop()
+    queue.close()
+    return cpu / wait
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chats", type=int, default=300)
+    parser.add_argument("--messages", type=int, default=5, help="messages per chat")
+    parser.add_argument("--retry-after-rate", type=float, default=0.15)
+    parser.add_argument("--timeout-rate", type=float, default=0.10)
+    args = parser.parse_args()
+
+    messages = _messages(args.chats, args.messages)
+    total = len(messages)
+    print(f"{total} messages to {args.chats} chats (+1 blocked user), API latency {API_LATENCY * 1000:.0f} ms, "
+          f"429 rate {args.retry_after_rate:.0%}, timeout rate {args.timeout_rate:.0%}")
+
+    api = FlakyApi(args.retry_after_rate, args.timeout_rate)
+    elapsed = await legacy(messages, api)
+    delivered = sum(len(texts) for texts in api.delivered.values())
+    print(f"  Broadcaster.broadcast: {elapsed:6.2f} s  delivered {delivered}/{total}, lost {total - delivered} "
+          f"(429: {api.retry_after}, timeouts: {api.timeouts})")
+
+    api = FlakyApi(args.retry_after_rate, args.timeout_rate)
+    db_path = os.path.join(os.environ["STATE_DIR"], "bench-delivery.sqlite3")
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    blocked = [OutgoingMessage(BLOCKED_USER, "Задание для заблокировавшего бота")]
+    elapsed = await durable(messages + blocked, api, db_path, crash_after=0.5)
+    delivered = sum(len(texts) for texts in api.delivered.values())
+    expected = defaultdict(list)
+    for m in messages:
+        expected[m.chat_id].append(m.text)
+    assert api.delivered == expected, "every message delivered exactly once, in order"
+    print(f"  DurableOutbox:         {elapsed:6.2f} s  delivered {delivered}/{total}, lost 0, duplicates 0 "
+          f"(429: {api.retry_after}, timeouts: {api.timeouts}; restarted once, 1 dead letter reported)")
+
+    cpu = await saturated_cpu(os.path.join(os.environ["STATE_DIR"], "bench-delivery-saturated.sqlite3"))
+    print(f"  all {MAX_IN_FLIGHT} send slots busy, more messages due: worker uses {cpu:.0%} CPU while waiting")
+    assert cpu < 0.2, cpu
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,98 @@
+# benchmarks/bench_handlers.py
+# Запуск: python -m benchmarks.bench_handlers [--chats 1 100 1000] [--players 8] [--api-latency-ms 30]
+# Прогоняет полные игры через настоящий Dispatcher (feed_update) с фейковым Bot API
+# и печатает задержку обработки апдейтов (p50/p99) и пропускную способность.
+
+import argparse
+import asyncio
+import statistics
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+from benchmarks.fake_api import callback_update, make_fake_bot, message_update
+from configs.env_config import Config
+import src.game_state as state
+from tg import build_dispatcher
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.updates = 0
+
+    async def feed(self, dp: Dispatcher, bot: Bot, step: str, raw: dict):
+        update = Update.model_validate(raw, context={"bot": bot})
+        started = time.perf_counter()
+        await dp.feed_update(bot, update)
+        self.latencies[step].append(time.perf_counter() - started)
+        self.updates += 1
+
+
+async def play_game(dp: Dispatcher, bot: Bot, rec: Recorder, game_no: int, players: int):
+    chat_id = -(100_000 + game_no)
+    admin = Config.ADMIN_USER_ID
+    user_ids = [game_no * 1000 + 10 + i for i in range(players)]
+
+    await rec.feed(dp, bot, "new_game", message_update(chat_id, admin, "/new_game"))
+    for user_id in user_ids:
+        await rec.feed(dp, bot, "join", callback_update(chat_id, user_id, "apply_to_join"))
+    await rec.feed(dp, bot, "approve_all", callback_update(admin, admin, f"digest_all_{chat_id}"))
+    await rec.feed(dp, bot, "start_game", message_update(chat_id, admin, "/start_game"))
+
+    game = state.get_game(chat_id)
+    imposter_id = game.imposter_ids[0]
+    await rec.feed(dp, bot, "task_tap", callback_update(imposter_id, imposter_id, f"task_done_{chat_id}"))
+    await rec.feed(dp, bot, "task_tap", callback_update(imposter_id, imposter_id, f"task_skip_{chat_id}"))
+
+    voter = next(u for u in user_ids if u != imposter_id)
+    await rec.feed(dp, bot, "vote_start", message_update(chat_id, voter, "/vote"))
+    for user_id in user_ids:
+        accused = imposter_id if user_id != imposter_id else voter
+        await rec.feed(dp, bot, "vote", callback_update(user_id, user_id, f"vote_{chat_id}_{accused}"))
+
+    await rec.feed(dp, bot, "stop_game", message_update(chat_id, admin, "/stop_game"))
+
+
+def percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+async def run(dp: Dispatcher, chats: int, players: int, api_latency: float, first_game: int = 0):
+    bot = make_fake_bot(latency=api_latency)
+    rec = Recorder()
+    started = time.perf_counter()
+    await asyncio.gather(*(play_game(dp, bot, rec, game_no, players) for game_no in range(first_game, first_game + chats)))
+    elapsed = time.perf_counter() - started
+    assert not state.active_games, f"{len(state.active_games)} games left running"
+
+    everything = [x for samples in rec.latencies.values() for x in samples]
+    print(f"\n{chats} concurrent chats: {rec.updates} updates in {elapsed:.2f} s, {rec.updates / elapsed:.0f} updates/s, "
+          f"{len(bot.session.calls)} API calls")
+    print(f"  {'all':<11} p50 {statistics.median(everything) * 1000:8.2f} ms  p99 {percentile(everything, 0.99) * 1000:8.2f} ms")
+    for step, samples in rec.latencies.items():
+        print(f"  {step:<11} p50 {statistics.median(samples) * 1000:8.2f} ms  p99 {percentile(samples, 0.99) * 1000:8.2f} ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chats", type=int, nargs="+", default=[1, 100, 1000])
+    parser.add_argument("--players", type=int, default=8)
+    parser.add_argument("--api-latency-ms", type=float, default=30)
+    args = parser.parse_args()
+
+    dp = build_dispatcher()
+    print(f"{args.players} players per game, fake Bot API latency {args.api_latency_ms:.0f} ms")
+    first_game = 0
+    for chats in args.chats:
+        # Каждый прогон в своих чатах: те же нажатия в тех же чатах срезала бы дедупликация (src/dedup.py)
+        await run(dp, chats, args.players, args.api_latency_ms / 1000, first_game)
+        first_game += chats
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,102 @@
+# benchmarks/bench_history.py
+# Запуск: python -m benchmarks.bench_history [--games 20000] [--players 8]
+# Журнал игровых событий (src/history.py) и /stats (src/analytics.py) на синтетических играх:
+# цена record() в горячем пути, размер и время сжатия сегментов в Parquet,
+# время отчета по сырым JSONL-сегментам и по сжатым файлам.
+
+import argparse
+import glob
+import os
+import random
+import time
+
+from configs.env_config import Config
+from src import analytics
+from src.history import EventLog, compact_segment
+from src.model.game import GameSession, Player
+
+TASKS = [f"Задание {i}: сделать что-нибудь заметное" for i in range(60)]
+
+
+def play(log: EventLog, game_no: int, players: int, rng: random.Random) -> int:
+    """Одна игра: старт, задания импостеров и голосования до победы одной из сторон."""
+    game = GameSession(chat_id=-(700_000 + game_no % 500))
+    for i in range(players):
+        game.add_player(Player(user_id=rng.randrange(10, 5_000), username="", full_name=f"P{i}"))
+    game.started_at = time.time() - rng.uniform(600, 3600)
+    imposters = rng.sample([p.user_id for p in game.players], 2 if players >= 6 else 1)
+    for user_id in imposters:
+        game.imposter_mask |= game._bit(user_id)
+    events = 0
+
+    log.record("game_started", game, value=players - len(imposters))
+    events += 1
+    tasks_done, found = 0, 0
+    while True:
+        task = rng.choice(TASKS)
+        if rng.random() < 0.2:
+            log.record("task_skip", game, user_id=imposters[0], task=task)
+        else:
+            log.record("task_done", game, user_id=imposters[0], task=task)
+            tasks_done += 1
+        log.record("vote_called", game, user_id=game.players[0].user_id)
+        suspect = rng.choice(game.players).user_id
+        for player in game.players:
+            hit = "hit" if suspect in imposters else "miss"
+            log.record("vote_cast", game, user_id=player.user_id, target_id=suspect, outcome=hit)
+        outcome = "found" if suspect in imposters else rng.choice(["miss", "tie"])
+        found += outcome == "found"
+        log.record("vote_result", game, target_id=suspect, outcome=outcome, value=players)
+        events += 4 + players
+        if tasks_done >= 3 or found >= len(imposters):
+            break
+    winner = "imposters" if tasks_done >= 3 else "crew"
+    log.record("game_over", game, outcome=winner, detail="tasks" if winner == "imposters" else "all_found")
+    return events + 1
+
+
+def dir_size(path: str, pattern: str) -> int:
+    return sum(os.path.getsize(p) for p in glob.glob(os.path.join(path, pattern)))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=20_000)
+    parser.add_argument("--players", type=int, default=8)
+    args = parser.parse_args()
+
+    history_dir = os.path.join(Config.HISTORY_DIR, "bench")
+    log = EventLog()
+    log.open(history_dir)
+    rng = random.Random(5)
+    started = time.perf_counter()
+    events = sum(play(log, game_no, rng.randint(4, args.players), rng) for game_no in range(args.games))
+    log.flush()
+    # Без event loop сжатие не запускается: сегменты остаются сырыми до явного compact_segment ниже
+    log.rotate()
+    elapsed = time.perf_counter() - started
+    print(f"{args.games} games, {events} events: record()+flush {elapsed / events * 1e6:.2f} µs/event")
+
+    segments = sorted(glob.glob(os.path.join(history_dir, "*.jsonl")))
+    raw_size = dir_size(history_dir, "*.jsonl")
+    started = time.perf_counter()
+    raw_report = analytics.report(history_dir)
+    print(f"  /stats over {len(segments)} raw JSONL segments ({raw_size / 2**20:.1f} MiB): "
+          f"{time.perf_counter() - started:.2f} s")
+
+    started = time.perf_counter()
+    for path in segments:
+        compact_segment(path)
+    print(f"  compaction to parquet: {time.perf_counter() - started:.2f} s, "
+          f"{dir_size(history_dir, '*.parquet') / 2**20:.1f} MiB")
+
+    started = time.perf_counter()
+    columnar_report = analytics.report(history_dir)
+    print(f"  /stats over parquet: {time.perf_counter() - started:.2f} s")
+    assert raw_report == columnar_report
+    print()
+    print(columnar_report)
+
+
+if __name__ == "__main__":
+    main()
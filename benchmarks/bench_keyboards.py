@@ -0,0 +1,66 @@
+# benchmarks/bench_keyboards.py
+# Запуск: python -m benchmarks.bench_keyboards
+# Сколько стоит разослать клавиатуры голосования всем игрокам большой игры: старый InlineKeyboardBuilder
+# на каждого голосующего против кэша кнопок по версии состава.
+
+import timeit
+
+from aiogram.types import InlineKeyboardButton
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+
+from src.keyboards import create_imposter_task_keyboard, create_lobby_keyboard, create_vote_keyboard
+from src.model.game import GameSession, Player
+
+PLAYERS = 50
+ROUNDS = 20
+
+
+def legacy_vote_keyboard(game: GameSession, voter_id: int):
+    builder = InlineKeyboardBuilder()
+    active_players = [p for p in game.players if p.user_id not in game.voted_out_player_ids]
+    for player in active_players:
+        if player.user_id != voter_id:
+            builder.add(InlineKeyboardButton(text=player.full_name, callback_data=f"vote_{game.chat_id}_{player.user_id}"))
+    builder.adjust(2)
+    return builder.as_markup()
+
+
+def legacy_lobby_keyboard():
+    builder = InlineKeyboardBuilder()
+    builder.add(InlineKeyboardButton(text="Подать заявку", callback_data="apply_to_join"))
+    return builder.as_markup()
+
+
+def main():
+    game = GameSession(chat_id=-1, players=[Player(user_id=i, username=f"u{i}", full_name=f"Игрок {i}") for i in range(PLAYERS)])
+    game.voted_out_mask = 0b11
+    game.roster_version = 1
+    voters = [p.user_id for p in game.players[2:]]
+
+    # Результат должен совпадать со старой реализацией
+    for voter in voters:
+        assert create_vote_keyboard(game, voter) == legacy_vote_keyboard(game, voter)
+
+    def new_ballot():
+        game.roster_version += 1  # новый состав — кэш строится заново, как в начале голосования
+        for voter in voters:
+            create_vote_keyboard(game, voter)
+
+    def old_ballot():
+        for voter in voters:
+            legacy_vote_keyboard(game, voter)
+
+    old = timeit.timeit(old_ballot, number=ROUNDS) / ROUNDS
+    new = timeit.timeit(new_ballot, number=ROUNDS) / ROUNDS
+    print(f"{PLAYERS}-player ballot, {len(voters)} vote keyboards")
+    print(f"  InlineKeyboardBuilder per voter: {old * 1000:7.2f} ms")
+    print(f"  cached buttons per ballot:       {new * 1000:7.2f} ms  (x{old / new:.1f})")
+
+    old = timeit.timeit(legacy_lobby_keyboard, number=10_000) / 10_000
+    new = timeit.timeit(create_lobby_keyboard, number=10_000) / 10_000
+    print(f"  lobby keyboard: builder {old * 1e6:.1f} us, singleton {new * 1e6:.2f} us")
+    assert create_imposter_task_keyboard(game.chat_id, True) is create_imposter_task_keyboard(game.chat_id, True)
+
+
+if __name__ == "__main__":
+    main()
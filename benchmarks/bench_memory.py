@@ -0,0 +1,120 @@
+# benchmarks/bench_memory.py
+# Запуск: python -m benchmarks.bench_memory [--sessions 10000 100000] [--players 8]
+# Сколько байт занимает одна игровая сессия (tracemalloc) при большом числе одновременных игр:
+# прежняя модель (dataclass с __dict__, списки ID, копия колоды на каждую сессию) против текущей
+# (__slots__, битовые маски, курсор по общей колоде).
+
+import argparse
+import gc
+import random
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+from src.model.game import GameSession, Player
+from src.task_deck import DeckCursor, TaskDeck
+from src.tasks import ALL_TASKS
+
+DECK = TaskDeck(tuple(ALL_TASKS))
+
+
+# --- ПРЕЖНЯЯ МОДЕЛЬ (для сравнения) ---
+
+@dataclass
+class LegacyPlayer:
+    user_id: int
+    username: str
+    full_name: str
+    role: str = "crewmate"
+
+
+@dataclass
+class LegacyGameSession:
+    chat_id: int
+    status: str = "lobby"
+    players: List[LegacyPlayer] = field(default_factory=list)
+    pending_players: Dict[int, dict] = field(default_factory=dict)
+    imposter_ids: List[int] = field(default_factory=list)
+    original_imposter_ids: List[int] = field(default_factory=list)
+    voted_out_player_ids: List[int] = field(default_factory=list)
+    tasks_completed: int = 0
+    TASKS_TO_WIN: int = 2
+    imposter_task_skips_left: int = 2
+    imposter_tasks_history: List[str] = field(default_factory=list)
+    votes_total: int = 0
+    votes_used: int = 0
+    vote_timer: Optional[object] = None
+    is_voting_active: bool = False
+    vote_deadline: Optional[float] = None
+    roster_version: int = 0
+    vote_buttons_cache: Optional[tuple] = None
+    render_cache: Optional[object] = None
+    current_votes: Dict[int, int] = field(default_factory=dict)
+    players_voted: Set[int] = field(default_factory=set)
+    vote_leader_id: Optional[int] = None
+    vote_leader_count: int = 0
+    vote_runner_up_count: int = 0
+    available_tasks: List[str] = field(default_factory=lambda: random.sample(ALL_TASKS, len(ALL_TASKS)))
+    current_imposter_task: Optional[str] = None
+
+
+def make_legacy(chat_id: int, players: int, started: bool) -> LegacyGameSession:
+    game = LegacyGameSession(chat_id=chat_id)
+    for i in range(players):
+        user_id = chat_id * 100 + i
+        game.players.append(LegacyPlayer(user_id, f"user{user_id}", f"Игрок {user_id}"))
+    if started:
+        game.status = "in_progress"
+        game.imposter_ids = [game.players[0].user_id, game.players[1].user_id]
+        game.original_imposter_ids = game.imposter_ids.copy()
+        game.players[0].role = game.players[1].role = "imposter"
+        game.current_imposter_task = game.available_tasks.pop(0)
+        game.votes_total = players - 2
+    return game
+
+
+def make_current(chat_id: int, players: int, started: bool) -> GameSession:
+    game = GameSession(chat_id=chat_id)
+    for i in range(players):
+        user_id = chat_id * 100 + i
+        game.add_player(Player(user_id, f"user{user_id}", f"Игрок {user_id}"))
+    if started:
+        game.status = "in_progress"
+        game.imposter_mask = game.original_imposter_mask = 0b11
+        game.players[0].role = game.players[1].role = "imposter"
+        game.task_cursor = DeckCursor.over(DECK)
+        game.current_imposter_task = game.task_cursor.draw()
+        game.votes_total = players - 2
+    return game
+
+
+def bytes_per_session(factory, sessions: int, players: int, started: bool) -> float:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    games = {chat_id: factory(chat_id, players, started) for chat_id in range(1, sessions + 1)}
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del games
+    return (after - before) / sessions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--players", type=int, default=8)
+    args = parser.parse_args()
+
+    print(f"{args.players} players per session, {len(ALL_TASKS)} production tasks")
+    for sessions in args.sessions:
+        for started in (False, True):
+            legacy = bytes_per_session(make_legacy, sessions, args.players, started)
+            current = bytes_per_session(make_current, sessions, args.players, started)
+            label = "in progress" if started else "lobby"
+            print(f"  {sessions:>7} sessions, {label:<11}: legacy {legacy:7.0f} B/session, "
+                  f"current {current:7.0f} B/session  ({(1 - current / legacy) * 100:.0f}% less, "
+                  f"{(legacy - current) * sessions / 2 ** 20:.1f} MiB saved)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# benchmarks/bench_metrics.py
+# Запуск: python -m benchmarks.bench_metrics [--chats 200] [--players 8] [--rounds 3]
+# Во сколько обходятся метрики: одни и те же игры прогоняются через Dispatcher без middleware метрик
+# и с ними (фейковый Bot API без задержки, чтобы накладные расходы не терялись на фоне сети).
+# В конце — стоимость одного наблюдения и одного опроса /metrics.
+
+import argparse
+import asyncio
+import itertools
+import time
+import timeit
+
+import aiohttp
+
+from benchmarks.bench_handlers import Recorder, play_game
+from benchmarks.fake_api import make_fake_bot
+import src.game_state as state
+from src import metrics
+from tg import build_dispatcher
+
+METRICS_PORT = 19100
+
+# Каждый раунд играет в новых чатах: повтор тех же нажатий в тех же чатах срезала бы дедупликация (src/dedup.py)
+_game_numbers = itertools.count()
+
+
+async def run_round(dp, chats: int, players: int, instrumented: bool) -> float:
+    bot = make_fake_bot()
+    if instrumented:
+        metrics.instrument_bot(bot)
+    rec = Recorder()
+    started = time.perf_counter()
+    await asyncio.gather(*(play_game(dp, bot, rec, next(_game_numbers), players) for _ in range(chats)))
+    elapsed = time.perf_counter() - started
+    assert not state.active_games
+    return elapsed / rec.updates
+
+
+async def best_of(dp, rounds: int, chats: int, players: int, instrumented: bool) -> float:
+    return min([await run_round(dp, chats, players, instrumented) for _ in range(rounds)])
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chats", type=int, default=200)
+    parser.add_argument("--players", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    dp = build_dispatcher()
+    await run_round(dp, 20, args.players, False)  # прогрев
+
+    plain = await best_of(dp, args.rounds, args.chats, args.players, False)
+    metrics.setup_dispatcher(dp)
+    instrumented = await best_of(dp, args.rounds, args.chats, args.players, True)
+
+    print(f"{args.chats} chats x {args.players} players, best of {args.rounds}")
+    print(f"  without metrics: {plain * 1e6:8.1f} us per update")
+    print(f"  with metrics:    {instrumented * 1e6:8.1f} us per update  "
+          f"(+{(instrumented - plain) * 1e6:.1f} us, {(instrumented / plain - 1) * 100:+.1f}%)")
+
+    observe = timeit.timeit(lambda: metrics.HANDLER_LATENCY.observe(0.0123, "bench"), number=200_000) / 200_000
+    print(f"  Histogram.observe: {observe * 1e9:.0f} ns")
+    render = timeit.timeit(metrics.registry.render, number=200) / 200
+    print(f"  registry.render:   {render * 1e3:.2f} ms "
+          f"({len(metrics.HANDLER_LATENCY._series)} handler series, {len(metrics.API_LATENCY._series)} API methods)")
+
+    runner = await metrics.start_metrics_server("127.0.0.1", METRICS_PORT)
+    try:
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f"http://127.0.0.1:{METRICS_PORT}{metrics.METRICS_PATH}") as response:
+                body = await response.text()
+                assert response.status == 200, response.status
+        assert 'bot_updates_total{type="callback_query"}' in body
+        assert "telegram_api_duration_seconds_count" in body
+        print(f"  GET {metrics.METRICS_PATH}: {len(body.splitlines())} lines, {response.headers['Content-Type']}")
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
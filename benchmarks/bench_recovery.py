@@ -0,0 +1,93 @@
+# benchmarks/bench_recovery.py
+# Запуск: python -m benchmarks.bench_recovery
+# Время восстановления активных игр из снимка и журнала при разном числе сессий.
+
+import random
+import tempfile
+import time
+
+import src.game_state as state
+from src.model.game import GameSession, Player
+from src.persistence import GameJournal
+
+PLAYERS_PER_GAME = 10
+# Сколько записей журнала приходится на игру поверх снимка
+JOURNAL_RECORDS_PER_GAME = 5
+
+
+def make_game(chat_id: int) -> GameSession:
+    game = GameSession(chat_id=chat_id)
+    for i in range(PLAYERS_PER_GAME):
+        user_id = chat_id * 100 + i
+        game.add_player(Player(user_id=user_id, username=f"user{user_id}", full_name=f"Игрок {user_id}"))
+    game.start_game()
+    game.assign_imposter_task()
+    return game
+
+
+def run(sessions: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        journal = GameJournal(tmp, compact_every=10 ** 9)
+        games = [make_game(-chat_id) for chat_id in range(1, sessions + 1)]
+        journal.compact(games)
+        started = time.perf_counter()
+        for _ in range(JOURNAL_RECORDS_PER_GAME):
+            for game in games:
+                game.current_votes[random.choice(game.players).user_id] = 1
+                journal.record_game(game)
+        append_time = time.perf_counter() - started
+        journal.close()
+
+        started = time.perf_counter()
+        loaded = GameJournal(tmp).load()
+        load_time = time.perf_counter() - started
+        assert len(loaded) == sessions
+
+        state.active_games.clear()
+        started = time.perf_counter()
+        state.restore_games(GameJournal(tmp))
+        recovery_time = time.perf_counter() - started
+        state.journal.close()
+        state.journal = None
+        state.active_games.clear()
+
+    appends = sessions * JOURNAL_RECORDS_PER_GAME
+    print(f"  {sessions:>6} sessions: journal append {append_time / appends * 1e6:6.1f} us/record, "
+          f"replay {load_time * 1000:7.1f} ms, restore_games incl. compaction {recovery_time * 1000:7.1f} ms")
+
+
+def save_stalls(sessions: int, saves: int):
+    """Сколько save_game держит event loop, пока журнал по ходу сворачивается в снимок всех игр."""
+    with tempfile.TemporaryDirectory() as tmp:
+        for chat_id in range(1, sessions + 1):
+            state.active_games[-chat_id] = make_game(-chat_id)
+        state.journal = GameJournal(tmp, compact_every=5000)
+        games = list(state.active_games.values())
+        latencies = []
+        for i in range(saves):
+            game = games[i % len(games)]
+            game.current_votes[random.choice(game.players).user_id] = 1
+            started = time.perf_counter()
+            state.save_game(game)
+            latencies.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        state.journal.close()
+        drain = time.perf_counter() - started
+        assert len(GameJournal(tmp).load()) == sessions
+        state.journal = None
+        state.active_games.clear()
+    latencies.sort()
+    print(f"  {sessions:>6} sessions, {saves} save_game with compaction every 5000: "
+          f"p50 {latencies[len(latencies) // 2] * 1e6:.1f} us, p99.9 {latencies[int(len(latencies) * 0.999)] * 1e6:.1f} us, "
+          f"max {latencies[-1] * 1000:.1f} ms; writer drained the rest in {drain * 1000:.0f} ms")
+
+
+def main():
+    print(f"{PLAYERS_PER_GAME} players per game, snapshot + {JOURNAL_RECORDS_PER_GAME} journal records per game")
+    for sessions in (1_000, 5_000, 20_000):
+        run(sessions)
+    save_stalls(20_000, 20_000)
+
+
+if __name__ == "__main__":
+    main()
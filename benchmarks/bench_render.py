@@ -0,0 +1,81 @@
+# benchmarks/bench_render.py
+# Запуск: python -m benchmarks.bench_render [--players 50 500 2000]
+# Стоимость текстов для больших лобби: объявления о вступлении по мере набора игроков
+# (старый код заново экранировал весь список на каждое одобрение) и финальное сообщение игры.
+
+import argparse
+import re
+import time
+
+from src import render
+from src.model.game import GameSession, Player
+
+
+def legacy_escape(text: str) -> str:
+    return re.sub(r'([_*`\[])', r'\\\1', text)
+
+
+def legacy_joined(game: GameSession, new_player: Player) -> str:
+    player_names = [legacy_escape(p.full_name) for p in game.players]
+    return f"✅ {legacy_escape(new_player.full_name)} присоединяется к игре!\n**Текущий список игроков ({len(player_names)}):** {', '.join(player_names)}"
+
+
+def legacy_game_over(game: GameSession) -> str:
+    imposter_names = [legacy_escape(p.full_name) for p in game.players if p.user_id in game.original_imposter_ids]
+    tasks_summary = ""
+    if game.tasks_completed:
+        tasks_summary = "\n\nЗадания, которые импостер успел выполнить:\n" + "\n\n".join(
+            f"{i}. {legacy_escape(task)}" for i, task in enumerate(game.imposter_tasks_history[:game.tasks_completed], 1)
+        )
+    return (f"🏆 **Победа Экипажа!**\nВсе импостеры были найдены!\n"
+            f"Коварными импостерами были: {', '.join(imposter_names)}!{tasks_summary}")
+
+
+def fill_lobby(players: int, joined) -> float:
+    game = GameSession(chat_id=-1)
+    started = time.perf_counter()
+    for i in range(players):
+        player = Player(user_id=i, username=f"user_{i}", full_name=f"Игрок_{i} *[{i}]*")
+        game.add_player(player)
+        joined(game, player)
+    return time.perf_counter() - started
+
+
+def finished_game(players: int) -> GameSession:
+    game = GameSession(chat_id=-1, players=[Player(user_id=i, username=f"user_{i}", full_name=f"Игрок_{i} *[{i}]*") for i in range(players)])
+    game.original_imposter_mask = sum(1 << i for i in range(0, players, 4))
+    game.imposter_tasks_history = [f"Задание_{i} с `кодом`" for i in range(20)]
+    game.tasks_completed = 20
+    return game
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--players", type=int, nargs="+", default=[50, 500, 2000])
+    args = parser.parse_args()
+
+    for players in args.players:
+        # Результат должен совпадать со старой реализацией
+        game = finished_game(players)
+        assert render.player_joined(game, game.players[-1]) == legacy_joined(game, game.players[-1])
+        assert render.game_over(game, render.CREW_WINS) == legacy_game_over(game)
+
+        old = fill_lobby(players, legacy_joined)
+        new = fill_lobby(players, render.player_joined)
+        print(f"{players} players")
+        print(f"  all join announcements: legacy {old * 1000:9.2f} ms, render {new * 1000:8.2f} ms  (x{old / new:.1f})")
+
+        repeats = 200
+        started = time.perf_counter()
+        for _ in range(repeats):
+            legacy_game_over(game)
+        old = (time.perf_counter() - started) / repeats
+        started = time.perf_counter()
+        for _ in range(repeats):
+            render.game_over(game, render.CREW_WINS)
+        new = (time.perf_counter() - started) / repeats
+        print(f"  game over message:      legacy {old * 1e6:9.1f} us, render {new * 1e6:8.1f} us  (x{old / new:.1f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+# benchmarks/bench_sharding.py
+# Запуск: python -m benchmarks.bench_sharding
+# Пропускная способность шардированного рантайма при разном числе воркеров.
+# Каждая игра проходит лобби, старт и голосование; Bot API подменен фейковой сессией.
+# Затем — перезапуск посреди голосования: голоса приходят сразу после старта нового рантайма,
+# до того как воркеры восстановили игры и прислали маршруты игрок -> игра, и при смене числа воркеров.
+
+import os
+import shutil
+import time
+
+from benchmarks.fake_api import callback_update, message_update
+from configs.env_config import Config
+from src.persistence import GameJournal, reshard_state, shard_of_chat, shard_state_dir
+from src.sharding import ShardedRuntime
+
+GAMES = 300
+PLAYERS = 8
+WORKER_COUNTS = (1, 2, 4)
+
+
+def game_updates(game_no: int):
+    chat_id = -(10_000 + game_no)
+    admin = Config.ADMIN_USER_ID
+    players = [game_no * 100 + 10 + i for i in range(PLAYERS)]
+    yield message_update(chat_id, admin, "/new_game")
+    for user_id in players:
+        yield callback_update(chat_id, user_id, "apply_to_join")
+
+
+def approval_updates(game_no: int):
+    admin = Config.ADMIN_USER_ID
+    yield callback_update(admin, admin, f"digest_all_{-(10_000 + game_no)}")
+
+
+def start_updates(game_no: int):
+    chat_id = -(10_000 + game_no)
+    yield message_update(chat_id, Config.ADMIN_USER_ID, "/start_game")
+    yield message_update(chat_id, game_no * 100 + 10, "/vote")
+
+
+def vote_updates(game_no: int):
+    chat_id = -(10_000 + game_no)
+    # Все голосуют за первого игрока, сам он — за второго
+    target = game_no * 100 + 10
+    for i in range(PLAYERS):
+        user_id = game_no * 100 + 10 + i
+        yield callback_update(user_id, user_id, f"vote_{chat_id}_{target if user_id != target else target + 1}")
+
+
+def wait_processed(runtime: ShardedRuntime, expected: int, timeout: float = 120):
+    deadline = time.time() + timeout
+    while runtime.processed < expected:
+        if time.time() > deadline:
+            raise TimeoutError(f"processed {runtime.processed} of {expected}")
+        time.sleep(0.01)
+
+
+def route_phases(runtime: ShardedRuntime, phases, total: int) -> int:
+    # Воркер обрабатывает апдейты конкурентно, и сообщения одной игры могут обогнать ее же кнопки:
+    # фазы разделены ожиданием, чтобы /start_game не пришел раньше заявок
+    for phase in phases:
+        for game_no in range(GAMES):
+            for update in phase(game_no):
+                runtime.route(update)
+                total += 1
+        wait_processed(runtime, total)
+    return total
+
+
+def run(workers: int, state_dir: str) -> float:
+    runtime = ShardedRuntime(workers, bot_factory="benchmarks.fake_api:make_fake_bot", state_dir=state_dir)
+    runtime.start()
+    # Прогрев: воркеры импортируют aiogram и поднимают диспетчер
+    runtime.route(message_update(-1, 2, "/vote"))
+    wait_processed(runtime, 1)
+
+    started = time.perf_counter()
+    total = route_phases(runtime, (game_updates, approval_updates, start_updates, vote_updates), 1)
+    elapsed = time.perf_counter() - started
+    runtime.stop()
+    return (total - 1) / elapsed
+
+
+def restart_mid_vote(workers: int, restart_workers: int, state_dir: str):
+    """Голосование открыто, рантайм перезапускается с другим числом воркеров, голоса приходят сразу."""
+    runtime = ShardedRuntime(workers, bot_factory="benchmarks.fake_api:make_fake_bot", state_dir=state_dir)
+    runtime.start()
+    route_phases(runtime, (game_updates, approval_updates, start_updates), 0)
+    runtime.stop()
+
+    runtime = ShardedRuntime(restart_workers, bot_factory="benchmarks.fake_api:make_fake_bot", state_dir=state_dir)
+    runtime.start()
+    # Без прогрева: таблица маршрутов фронта пока пуста, голоса идут по chat_id из callback_data
+    route_phases(runtime, (vote_updates,), 0)
+    runtime.stop()
+
+
+def load_games(state_dir: str) -> dict:
+    journal = GameJournal(state_dir)
+    games = journal.load()
+    journal.close()
+    return games
+
+
+def check_journals(state_dir: str, workers: int):
+    """Все игры лежат в журнале своего шарда, ни одно голосование не осталось открытым."""
+    games = {}
+    for shard_id in range(workers):
+        for chat_id, game in load_games(shard_state_dir(state_dir, shard_id)).items():
+            assert shard_of_chat(chat_id, workers) == shard_id, f"game {chat_id} is stranded in shard-{shard_id}"
+            games[chat_id] = game
+    voting = [chat_id for chat_id, game in games.items() if game.status != "in_progress" or game.is_voting_active]
+    assert not voting, f"{len(voting)} games did not finish the vote"
+
+
+def check_reshard(state_dir: str):
+    """Смена числа воркеров и переход в обычный режим: ни одна игра не теряется."""
+    before = sum(len(load_games(shard_state_dir(state_dir, shard_id))) for shard_id in range(3))
+    started = time.perf_counter()
+    moved = reshard_state(state_dir, 0)
+    elapsed = time.perf_counter() - started
+    after = len(load_games(state_dir))
+    assert moved == before == after, (moved, before, after)
+    print(f"  re-sharded {moved} games from 3 shards to a single journal in {elapsed * 1000:.0f} ms")
+
+
+def main():
+    print(f"{GAMES} games x {PLAYERS} players, full lobby/start/vote cycle, cpu count {os.cpu_count()}")
+    baseline = None
+    for workers in WORKER_COUNTS:
+        state_dir = os.path.join(os.environ["STATE_DIR"], f"bench-{workers}")
+        throughput = run(workers, state_dir)
+        check_journals(state_dir, workers)
+        baseline = baseline or throughput
+        print(f"  {workers} worker(s): {throughput:8.0f} updates/s  (x{throughput / baseline:.2f})")
+
+    state_dir = os.path.join(os.environ["STATE_DIR"], "bench-restart")
+    shutil.rmtree(state_dir, ignore_errors=True)
+    restart_mid_vote(4, 3, state_dir)
+    check_journals(state_dir, 3)
+    print(f"  restart 4 -> 3 workers mid-vote: all {GAMES} votes counted")
+    check_reshard(state_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# benchmarks/bench_startup.py
+# Запуск: python -m benchmarks.bench_startup [--runs 5] [--latency 0.15]
+# Время от запуска процесса до первого обработанного апдейта: каждый прогон — новый процесс
+# python, который импортирует tg и выполняет tg.main() с фейковым Bot API (задержка --latency
+# на каждый запрос, как до серверов Telegram). Режимы:
+#   legacy — как раньше: обе регистрации команд (set_my_commands) ждем до начала polling;
+#   cold   — sync_commands без сохраненного хэша: регистрация в фоне;
+#   warm   — хэш совпал: регистрации нет вовсе.
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+MODES = ("legacy", "cold", "warm")
+# Модули, которых не должно быть в процессе к первому апдейту
+HEAVY_MODULES = ("pandas", "numpy", "pyarrow", "aiohttp.web")
+
+
+def child(mode: str, started: float, latency: float):
+    """Процесс бота: печатает JSON с замерами после первого обработанного апдейта и выходит."""
+    import_started = time.time()
+    import tg
+    imported = time.time()
+    # После tg: его импорт меряется отдельно и не должен заранее получить прогретый aiogram
+    from benchmarks.fake_api import make_fake_bot, message_update
+
+    session_calls = []
+
+    def create_bot():
+        bot = make_fake_bot(latency=latency, on_request=lambda m: session_calls.append(type(m).__name__))
+        # Группа без игры: /vote отвечает "нет активной игры"
+        bot.session.push_update(message_update(-100, 10, "/vote"))
+        return bot
+
+    build_dispatcher = tg.build_dispatcher
+
+    def instrumented_dispatcher():
+        dp = build_dispatcher()
+
+        @dp.update.outer_middleware()
+        async def first_update(handler, event, data):
+            result = await handler(event, data)
+            print(json.dumps({
+                "total": time.time() - started,
+                "interpreter": import_started - started,
+                "import": imported - import_started,
+                "calls_before_update": list(session_calls),
+                "heavy": [m for m in HEAVY_MODULES if m in sys.modules],
+            }), flush=True)
+            os._exit(0)
+            return result
+        return dp
+
+    tg.create_bot = create_bot
+    tg.build_dispatcher = instrumented_dispatcher
+    if mode == "legacy":
+        # Прежний main ждал обе регистрации команд и только потом удалял вебхук и начинал polling
+        from aiogram import Bot
+        delete_webhook = Bot.delete_webhook
+
+        async def register_then_delete_webhook(self, *args, **kwargs):
+            await tg.set_commands(self)
+            return await delete_webhook(self, *args, **kwargs)
+
+        tg.sync_commands = lambda bot: None
+        Bot.delete_webhook = register_then_delete_webhook
+    asyncio.run(tg.main())
+
+
+def run_once(mode: str, state_dir: str, latency: float) -> dict:
+    env = dict(os.environ, STATE_DIR=state_dir, BOT_MODE="polling", SHARD_WORKERS="0")
+    started = time.time()
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_startup", "--child", mode, "--started", repr(started), "--latency", str(latency)],
+        env=env, capture_output=True, text=True, timeout=60,
+    )
+    for line in out.stdout.splitlines():
+        if line.startswith("{"):
+            return json.loads(line)
+    raise RuntimeError(f"{mode} run produced no result:\n{out.stderr[-2000:]}")
+
+
+def save_commands_hash(state_dir: str):
+    import tg
+    from benchmarks.fake_api import make_fake_bot
+
+    with open(os.path.join(state_dir, tg.COMMANDS_HASH_FILE), "w") as f:
+        f.write(tg.commands_hash(make_fake_bot()))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.15, help="fake Bot API round trip, seconds")
+    parser.add_argument("--child", choices=MODES)
+    parser.add_argument("--started", type=float)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.started, args.latency)
+        return
+
+    print(f"Process start -> first update handled, {args.runs} runs per mode, Bot API latency {args.latency * 1000:.0f} ms")
+    for mode in MODES:
+        results = []
+        for _ in range(args.runs):
+            state_dir = tempfile.mkdtemp(prefix="among_us_startup_")
+            try:
+                if mode == "warm":
+                    # Как после прошлого запуска с теми же командами
+                    save_commands_hash(state_dir)
+                results.append(run_once(mode, state_dir, args.latency))
+            finally:
+                shutil.rmtree(state_dir, ignore_errors=True)
+        total = statistics.median(r["total"] for r in results)
+        imports = statistics.median(r["import"] for r in results)
+        interpreter = statistics.median(r["interpreter"] for r in results)
+        calls = results[-1]["calls_before_update"]
+        print(f"  {mode:<6} median {total * 1000:6.0f} ms (interpreter {interpreter * 1000:.0f} ms, import tg {imports * 1000:.0f} ms), "
+              f"API calls before first update: {len(calls)} {calls}; heavy modules loaded: {results[-1]['heavy'] or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# benchmarks/bench_task_deck.py
+# Запуск: python -m benchmarks.bench_task_deck [--deck-sizes 10 1000 100000]
+# Стоимость создания игры и выдачи заданий при разном размере колоды:
+# прежняя копия колоды на каждую игру (random.sample + pop(0)) против курсора по общей колоде.
+
+import argparse
+import random
+import time
+
+from src.task_deck import AliasTable, DeckCursor, TaskDeck, register_deck
+
+GAMES = 2_000
+DRAWS_PER_GAME = 5
+
+
+def legacy(tasks: list) -> float:
+    started = time.perf_counter()
+    for _ in range(GAMES):
+        available = random.sample(tasks, len(tasks))
+        for _ in range(DRAWS_PER_GAME):
+            available.pop(0)
+    return (time.perf_counter() - started) / GAMES
+
+
+def cursor(deck: TaskDeck) -> float:
+    started = time.perf_counter()
+    for _ in range(GAMES):
+        game_cursor = DeckCursor.over(deck)
+        for _ in range(DRAWS_PER_GAME):
+            game_cursor.draw()
+    return (time.perf_counter() - started) / GAMES
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--deck-sizes", type=int, nargs="+", default=[10, 1_000, 100_000])
+    args = parser.parse_args()
+
+    # Курсор выдает каждое задание ровно один раз
+    deck = TaskDeck(tuple(f"Задание {i}" for i in range(500)))
+    full_cursor = DeckCursor.over(deck)
+    drawn = [full_cursor.draw() for _ in range(len(deck))]
+    assert sorted(drawn) == sorted(deck.tasks) and full_cursor.draw() is None and not full_cursor.swaps
+    # И с весами: уже выпавшие задания отбрасываются, даже если их место в перестановке занято другим
+    weights = AliasTable([random.uniform(0.05, 1.0) for _ in range(len(deck))])
+    index_of = {task: i for i, task in enumerate(deck.tasks)}
+    for _ in range(20):
+        weighted_cursor = DeckCursor.over(deck)
+        drawn = []
+        for _ in range(len(deck)):
+            drawn.append(weighted_cursor.draw(weights))
+            assert all(weighted_cursor._position(index_of[task]) < weighted_cursor.drawn for task in drawn)
+        assert sorted(drawn) == sorted(deck.tasks) and not weighted_cursor.swaps
+    # Курсор из журнала (обратная таблица строится заново) продолжает ту же перестановку
+    register_deck(deck)
+    saved = DeckCursor.over(deck)
+    drawn = [saved.draw(weights) for _ in range(len(deck) // 2)]
+    restored = DeckCursor.from_dict(saved.to_dict())
+    drawn += [restored.draw(weights) for _ in range(len(deck) - len(drawn))]
+    assert sorted(drawn) == sorted(deck.tasks)
+    # Колода сменилась: выданные игре задания из новой колоды не выпадают
+    dealt = drawn[:100]
+    rebased = DeckCursor.over(deck)
+    rebased.rebase(TaskDeck(deck.tasks + ("Новое задание",)), dealt)
+    rest = [rebased.draw(weights) for _ in range(rebased.remaining())]
+    assert not set(rest) & set(dealt) and len(rest) == len(deck) - 100 + 1 and rebased.draw() is None
+
+    print(f"{GAMES} games, {DRAWS_PER_GAME} tasks drawn per game")
+    for size in args.deck_sizes:
+        tasks = [f"Задание {i}" for i in range(size)]
+        deck = TaskDeck(tuple(tasks))
+        old = legacy(tasks)
+        new = cursor(deck)
+        print(f"  deck of {size:>7}: copy per game {old * 1e6:10.1f} us/game, shared deck cursor {new * 1e6:6.1f} us/game  (x{old / new:.0f})")
+
+
+if __name__ == "__main__":
+    main()
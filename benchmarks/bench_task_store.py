@@ -0,0 +1,81 @@
+# benchmarks/bench_task_store.py
+# Запуск: python -m benchmarks.bench_task_store
+# Сравнивает старое хранение заданий (exec по src/tasks.py + перезапись файла) с TaskStore на SQLite.
+
+import os
+import statistics
+import tempfile
+import time
+
+from src.task_store import TaskStore
+
+TASKS = 10_000
+ROUNDS = 50
+
+
+# --- Старая реализация из src/task_manager.py, только путь к файлу параметризован ---
+
+def legacy_read(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        local_scope = {}
+        exec(f.read(), {}, local_scope)
+        return local_scope.get("ALL_TASKS", []), local_scope.get("BACKLOG_TASKS", [])
+
+def legacy_write(path, prod_tasks, backlog_tasks):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("# src/tasks.py\n\n")
+        for name, tasks in (("ALL_TASKS", prod_tasks), ("BACKLOG_TASKS", backlog_tasks)):
+            f.write(f"{name} = [\n")
+            for task in tasks:
+                formatted_task = task.replace('"', '\\"')
+                if '\n' in formatted_task:
+                    f.write(f'    """{formatted_task}""",\n')
+                else:
+                    f.write(f'    "{formatted_task}",\n')
+            f.write("]\n\n")
+
+def legacy_move(path, task_index):
+    prod_tasks, backlog_tasks = legacy_read(path)
+    if 0 <= task_index < len(backlog_tasks):
+        prod_tasks.append(backlog_tasks.pop(task_index))
+    legacy_write(path, prod_tasks, backlog_tasks)
+
+def legacy_delete(path, task_index):
+    prod_tasks, backlog_tasks = legacy_read(path)
+    if 0 <= task_index < len(prod_tasks):
+        prod_tasks.pop(task_index)
+    legacy_write(path, prod_tasks, backlog_tasks)
+
+
+def measure(fn, rounds=ROUNDS):
+    samples = []
+    for i in range(rounds):
+        started = time.perf_counter()
+        fn(i)
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), max(samples)
+
+
+def report(name, legacy, store):
+    print(f"  {name:<7} legacy p50 {legacy[0]:8.2f} ms (max {legacy[1]:8.2f}) | "
+          f"store p50 {store[0]:7.3f} ms (max {store[1]:7.3f}) | x{legacy[0] / store[0]:.0f}")
+
+
+def main():
+    prod = [f"Задание номер {i} — сделай что-нибудь \"странное\"" for i in range(TASKS // 2)]
+    backlog = [f"Черновик номер {i}" for i in range(TASKS // 2)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, "tasks.py")
+        legacy_write(legacy_path, prod, backlog)
+        store = TaskStore(os.path.join(tmp, "tasks.sqlite3"), seed=(prod, backlog))
+
+        print(f"{TASKS} tasks, {ROUNDS} rounds per operation")
+        report("list", measure(lambda i: legacy_read(legacy_path)[0]), measure(lambda i: store.list_tasks("prod")))
+        report("move", measure(lambda i: legacy_move(legacy_path, i)), measure(lambda i: store.move("backlog", i, "prod")))
+        report("delete", measure(lambda i: legacy_delete(legacy_path, i)), measure(lambda i: store.delete("prod", i)))
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
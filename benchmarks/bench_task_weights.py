@@ -0,0 +1,141 @@
+# benchmarks/bench_task_weights.py
+# Запуск: python -m benchmarks.bench_task_weights [--deck-sizes 60 1000 100000] [--games 20000]
+# Выбор заданий по весам истории (src/task_weights.py):
+#  - скорость выбора: таблица алиасов против random.choices и равномерного курсора;
+#  - точность: частоты выборов по таблице против заданных весов;
+#  - эффект: на колоде, где часть заданий игроки почти всегда меняют, сколько выданных заданий
+#    уходит в смену при равномерной выдаче и при выдаче по весам, и как распределились веса.
+
+import argparse
+import random
+import statistics
+import time
+
+from src.task_deck import AliasTable, DeckCursor, TaskDeck
+from src.task_weights import TaskWeights
+
+DRAWS = 200_000
+# Тяжелые задания игроки меняют в 90% случаев, обычные — в 10%
+HARD_SHARE = 0.2
+HARD_SKIP = 0.9
+EASY_SKIP = 0.1
+
+
+def sampling_speed(deck_size: int, rng: random.Random):
+    weights = [rng.uniform(0.05, 1.0) for _ in range(deck_size)]
+    indices = range(deck_size)
+
+    started = time.perf_counter()
+    table = AliasTable(weights)
+    build = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for _ in range(DRAWS):
+        table.sample()
+    alias = (time.perf_counter() - started) / DRAWS
+
+    # random.choices с готовыми накопленными весами — бинарный поиск, O(log n)
+    cum = []
+    total = 0.0
+    for w in weights:
+        total += w
+        cum.append(total)
+    started = time.perf_counter()
+    for _ in range(DRAWS):
+        random.choices(indices, cum_weights=cum)
+    choices = (time.perf_counter() - started) / DRAWS
+
+    # Полная версия для одной игры: курсор с отбрасыванием уже выпавших
+    deck = TaskDeck(tuple(f"Задание {i}" for i in range(deck_size)))
+    per_game = min(5, deck_size)
+    started = time.perf_counter()
+    for _ in range(DRAWS // per_game):
+        cursor = DeckCursor.over(deck)
+        for _ in range(per_game):
+            cursor.draw(table)
+    weighted_cursor = (time.perf_counter() - started) / (DRAWS // per_game * per_game)
+
+    started = time.perf_counter()
+    for _ in range(DRAWS // per_game):
+        cursor = DeckCursor.over(deck)
+        for _ in range(per_game):
+            cursor.draw()
+    uniform_cursor = (time.perf_counter() - started) / (DRAWS // per_game * per_game)
+
+    print(f"  deck {deck_size:>7}: build {build * 1e3:7.2f} ms | alias {alias * 1e6:.2f} µs | "
+          f"random.choices {choices * 1e6:.2f} µs | cursor weighted {weighted_cursor * 1e6:.2f} µs, "
+          f"uniform {uniform_cursor * 1e6:.2f} µs")
+
+
+def sampling_accuracy(rng: random.Random):
+    weights = [rng.uniform(0.05, 1.0) for _ in range(50)]
+    table = AliasTable(weights)
+    counts = [0] * len(weights)
+    draws = 1_000_000
+    for _ in range(draws):
+        counts[table.sample()] += 1
+    total = sum(weights)
+    error = max(abs(c / draws - w / total) / (w / total) for c, w in zip(counts, weights))
+    print(f"  alias table over 50 weights, {draws} draws: max relative frequency error {error:.2%}")
+    assert error < 0.05
+
+
+def simulate(deck_size: int, games: int, weighted: bool, rng: random.Random):
+    """Каждая игра тянет задания, пока импостеры не выполнят 3; сменить можно один раз за игру."""
+    tasks = tuple(f"Задание {i}" for i in range(deck_size))
+    hard = set(rng.sample(tasks, int(deck_size * HARD_SHARE)))
+    deck = TaskDeck(tasks)
+    weights = TaskWeights()
+    drawn = skipped = started = 0
+    record_time = 0.0
+    for _ in range(games):
+        cursor = DeckCursor.over(deck)
+        done, skips_left = 0, 1
+        while done < 3:
+            task = cursor.draw(weights.table_for(deck) if weighted else None)
+            if task is None:
+                break
+            drawn += 1
+            skip = rng.random() < (HARD_SKIP if task in hard else EASY_SKIP)
+            if skip and skips_left:
+                skips_left -= 1
+                skipped += 1
+                is_done = False
+            else:
+                # Без смены задание все-таки делают
+                done += 1
+                is_done = True
+            started = time.perf_counter()
+            weights.record(task, is_done)
+            record_time += time.perf_counter() - started
+    hard_weights = [weights.weight(t) for t in hard]
+    easy_weights = [weights.weight(t) for t in tasks if t not in hard]
+    return drawn, skipped, record_time / drawn, hard_weights, easy_weights
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--deck-sizes", type=int, nargs="+", default=[60, 1_000, 100_000])
+    parser.add_argument("--games", type=int, default=20_000)
+    args = parser.parse_args()
+    rng = random.Random(11)
+
+    print(f"Sampling speed ({DRAWS} draws):")
+    for size in args.deck_sizes:
+        sampling_speed(size, rng)
+    sampling_accuracy(rng)
+
+    print(f"\n{args.games} games, {HARD_SHARE:.0%} of tasks skipped {HARD_SKIP:.0%} of the time, the rest {EASY_SKIP:.0%}:")
+    for size in args.deck_sizes:
+        for weighted in (False, True):
+            drawn, skipped, record, hard, easy = simulate(size, args.games, weighted, random.Random(size))
+            label = "weighted" if weighted else "uniform"
+            print(f"  deck {size:>7} {label:<8} skipped {skipped / drawn:5.1%} of {drawn} draws, record() {record * 1e6:.2f} µs")
+        hard_q = statistics.quantiles(hard, n=4)
+        easy_q = statistics.quantiles(easy, n=4)
+        print(f"    weights after weighted run: hard tasks p25/p50/p75 {hard_q[0]:.2f}/{hard_q[1]:.2f}/{hard_q[2]:.2f}, "
+              f"easy tasks {easy_q[0]:.2f}/{easy_q[1]:.2f}/{easy_q[2]:.2f}")
+
+
+if __name__ == "__main__":
+    main()
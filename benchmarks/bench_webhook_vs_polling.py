@@ -0,0 +1,113 @@
+# benchmarks/bench_webhook_vs_polling.py
+# Запуск: python -m benchmarks.bench_webhook_vs_polling
+# Шлет синтетические апдейты через встроенный webhook-сервер (POST) и через polling (getUpdates)
+# и сравнивает задержку от получения апдейта до ответа бота.
+
+import asyncio
+import statistics
+import time
+from typing import Dict
+
+from aiogram import Dispatcher
+from aiogram.methods import SendMessage
+from aiohttp import ClientSession, web
+
+from benchmarks.fake_api import make_fake_bot, message_update
+from configs.env_config import Config
+import src.game_state as state
+from src.handlers import admin_router, player_router
+from src.webhook import HEALTH_PATH, build_webhook_app
+
+UPDATES = 200
+SECRET = "bench-secret"
+PORT = 18080
+
+
+class ReplyWaiter:
+    """Сопоставляет ответ бота (SendMessage в чат) с апдейтом, который его вызвал."""
+
+    def __init__(self):
+        self.waiting: Dict[int, asyncio.Future] = {}
+
+    def expect(self, chat_id: int) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self.waiting[chat_id] = future
+        return future
+
+    def on_request(self, method):
+        if isinstance(method, SendMessage):
+            future = self.waiting.pop(method.chat_id, None)
+            if future and not future.done():
+                future.set_result(time.perf_counter())
+
+
+def build_dispatcher() -> Dispatcher:
+    dp = Dispatcher()
+    dp.include_router(admin_router)
+    dp.include_router(player_router)
+    return dp
+
+
+def new_game_update(i: int) -> dict:
+    # Каждый апдейт — новое лобби в отдельном чате, ответ приходит в этот же чат
+    return message_update(chat_id=-(1000 + i), user_id=Config.ADMIN_USER_ID, text="/new_game")
+
+
+async def bench_webhook(dp: Dispatcher, waiter: ReplyWaiter):
+    bot = make_fake_bot(on_request=waiter.on_request)
+    app = build_webhook_app(dp, bot, "/webhook", SECRET)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", PORT).start()
+
+    latencies = []
+    async with ClientSession() as http:
+        async with http.post(f"http://127.0.0.1:{PORT}/webhook", json=new_game_update(0), headers={"X-Telegram-Bot-Api-Secret-Token": "wrong"}) as resp:
+            assert resp.status == 401, resp.status
+        async with http.get(f"http://127.0.0.1:{PORT}{HEALTH_PATH}") as resp:
+            assert resp.status == 200, resp.status
+        for i in range(UPDATES):
+            update = new_game_update(i)
+            reply = waiter.expect(update["message"]["chat"]["id"])
+            started = time.perf_counter()
+            async with http.post(f"http://127.0.0.1:{PORT}/webhook", json=update, headers={"X-Telegram-Bot-Api-Secret-Token": SECRET}) as resp:
+                assert resp.status == 200, resp.status
+            latencies.append(await reply - started)
+    await runner.cleanup()
+    return latencies
+
+
+async def bench_polling(dp: Dispatcher, waiter: ReplyWaiter):
+    bot = make_fake_bot(on_request=waiter.on_request)
+    polling = asyncio.create_task(dp.start_polling(bot, handle_signals=False, polling_timeout=1))
+    await asyncio.sleep(0.1)
+
+    latencies = []
+    for i in range(UPDATES):
+        update = new_game_update(UPDATES + i)
+        reply = waiter.expect(update["message"]["chat"]["id"])
+        started = time.perf_counter()
+        bot.session.push_update(update)
+        latencies.append(await reply - started)
+    await dp.stop_polling()
+    await polling
+    return latencies
+
+
+def report(name, latencies):
+    ms = sorted(x * 1000 for x in latencies)
+    print(f"  {name:<8} p50 {statistics.median(ms):6.2f} ms  p99 {ms[int(len(ms) * 0.99) - 1]:6.2f} ms")
+
+
+async def main():
+    # Роутеры можно подключить только к одному диспетчеру, поэтому он общий для обоих режимов
+    dp = build_dispatcher()
+    waiter = ReplyWaiter()
+    print(f"{UPDATES} sequential /new_game updates, local fake Bot API (network latency excluded)")
+    report("webhook", await bench_webhook(dp, waiter))
+    state.active_games.clear()
+    report("polling", await bench_polling(dp, waiter))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,146 @@
+# benchmarks/fake_api.py
+
+import asyncio
+import itertools
+from datetime import datetime
+from typing import Any, AsyncGenerator, Callable, Dict, List, Optional
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import GetUpdates, TelegramMethod
+from aiogram.types import Chat, Message, Update, User
+
+# Токен нужного формата, сеть с ним не используется
+FAKE_TOKEN = "123456:AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA"
+
+
+class FakeTelegramSession(BaseSession):
+    """
+    Сессия бота без сети: отвечает правдоподобными объектами после искусственной задержки.
+    `fail` позволяет подсунуть исключение для конкретного вызова (или вернуть None, чтобы пропустить).
+    """
+
+    def __init__(self, latency: float = 0.0, fail: Optional[Callable[[TelegramMethod], Optional[Exception]]] = None,
+                 on_request: Optional[Callable[[TelegramMethod], None]] = None):
+        super().__init__()
+        self.latency = latency
+        self.fail = fail
+        self.on_request = on_request
+        self.calls: List[TelegramMethod] = []
+        self._message_ids = itertools.count(1)
+        self._updates: Optional[asyncio.Queue] = None
+
+    def push_update(self, update: dict):
+        """Кладет апдейт в очередь, которую отдает getUpdates (для режима polling)."""
+        if self._updates is None:
+            self._updates = asyncio.Queue()
+        self._updates.put_nowait(update)
+
+    async def _get_updates(self, method: GetUpdates) -> List[Update]:
+        if self._updates is None:
+            self._updates = asyncio.Queue()
+        # Как настоящий long polling: ждем первый апдейт, остальные забираем пачкой
+        try:
+            first = await asyncio.wait_for(self._updates.get(), timeout=0.1 if method.timeout is None else method.timeout)
+        except asyncio.TimeoutError:
+            return []
+        batch = [first]
+        while not self._updates.empty():
+            batch.append(self._updates.get_nowait())
+        return [Update.model_validate(u) for u in batch]
+
+    async def make_request(self, bot: Bot, method: TelegramMethod, timeout: Optional[int] = None) -> Any:
+        if isinstance(method, GetUpdates):
+            return await self._get_updates(method)
+        self.calls.append(method)
+        if self.on_request is not None:
+            self.on_request(method)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.fail is not None:
+            error = self.fail(method)
+            if error is not None:
+                raise error
+        return self._fake_result(bot, method)
+
+    def _fake_result(self, bot: Bot, method: TelegramMethod) -> Any:
+        returning = method.__returning__
+        if returning is User:
+            return User(id=bot.id, is_bot=True, first_name="Bot", username="fake_bot")
+        if returning is Message or "Message" in str(returning):
+            chat_id = getattr(method, "chat_id", None) or 0
+            return Message(
+                message_id=getattr(method, "message_id", None) or next(self._message_ids),
+                date=datetime.now(),
+                chat=Chat(id=chat_id, type="private" if int(chat_id) > 0 else "group"),
+                text=getattr(method, "text", None),
+            )
+        if returning is bool:
+            return True
+        return None
+
+    def calls_of(self, method_name: str) -> List[TelegramMethod]:
+        return [call for call in self.calls if type(call).__name__ == method_name]
+
+    async def stream_content(self, url: str, headers: Optional[Dict[str, Any]] = None, timeout: int = 30,
+                             chunk_size: int = 65536, raise_for_status: bool = True) -> AsyncGenerator[bytes, None]:
+        yield b""
+
+    async def close(self) -> None:
+        pass
+
+
+def make_fake_bot(latency: float = 0.0, fail: Optional[Callable[[TelegramMethod], Optional[Exception]]] = None,
+                  on_request: Optional[Callable[[TelegramMethod], None]] = None, **bot_kwargs) -> Bot:
+    session = FakeTelegramSession(latency=latency, fail=fail, on_request=on_request)
+    return Bot(token=FAKE_TOKEN, session=session, **bot_kwargs)
+
+
+# --- СИНТЕТИЧЕСКИЕ АПДЕЙТЫ ---
+
+_update_ids = itertools.count(1)
+
+
+def _chat(chat_id: int) -> dict:
+    if chat_id > 0:
+        return {"id": chat_id, "type": "private", "first_name": f"User {chat_id}"}
+    return {"id": chat_id, "type": "group", "title": f"Chat {chat_id}"}
+
+
+def _user(user_id: int) -> dict:
+    return {"id": user_id, "is_bot": False, "first_name": f"User {user_id}", "username": f"user{user_id}"}
+
+
+def message_update(chat_id: int, user_id: int, text: str, message_id: int = 1) -> dict:
+    update = {
+        "update_id": next(_update_ids),
+        "message": {
+            "message_id": message_id,
+            "date": int(datetime.now().timestamp()),
+            "chat": _chat(chat_id),
+            "from": _user(user_id),
+            "text": text,
+        },
+    }
+    if text.startswith("/"):
+        command = text.split()[0]
+        update["message"]["entities"] = [{"type": "bot_command", "offset": 0, "length": len(command)}]
+    return update
+
+
+def callback_update(chat_id: int, user_id: int, data: str, message_id: int = 1) -> dict:
+    return {
+        "update_id": next(_update_ids),
+        "callback_query": {
+            "id": str(next(_update_ids)),
+            "from": _user(user_id),
+            "chat_instance": str(chat_id),
+            "data": data,
+            "message": {
+                "message_id": message_id,
+                "date": int(datetime.now().timestamp()),
+                "chat": _chat(chat_id),
+                "text": "...",
+            },
+        },
+    }
@@ -0,0 +1,184 @@
+# benchmarks/stress_game_actor.py
+# Запуск: python -m benchmarks.stress_game_actor [--chats 300] [--players 8] [--taps 3]
+# Стресс-тест очередей игр (src/game_actor.py): в каждой игре одновременно прилетают все голоса
+# (каждый дважды, с разных сообщений), дедлайн голосования из таймера планировщика (взведенного,
+# как и в /vote, из очереди игры) и повторные "задание выполнено" от импостеров. Проверяются инварианты: ровно одно объявление итогов голосования, не больше одного
+# финала на игру, счетчики не выходят за пределы. Прогон без очередей показывает, что ломается без них.
+
+import argparse
+import asyncio
+import itertools
+import random
+import time
+from collections import Counter
+from functools import partial
+
+from aiogram.types import Update
+
+from benchmarks.fake_api import callback_update, make_fake_bot, message_update
+from configs.env_config import Config
+import src.game_state as state
+from src.error_reports import error_reports
+from src.game_actor import actors
+from src.handlers import _on_vote_deadline
+from src.outbox import outbox
+from src.scheduler import scheduler
+from tg import build_dispatcher
+
+# Фразы, которыми заканчивается голосование (ровно одна на голосование)
+VOTE_OUTCOMES = ("никто не проголосовал", "Голоса разделились", "импостер был найден", "Вы ошиблись в выборе")
+GAME_OVER = "🏆"
+# Дедлайн голосования наступает в пределах этого окна после начала голосов
+DEADLINE_SPREAD = 0.05
+
+_message_ids = itertools.count(1000)
+
+
+async def setup_game(dp, bot, game_no: int, players: int) -> int:
+    chat_id = -(500_000 + game_no)
+    admin = Config.ADMIN_USER_ID
+    user_ids = [game_no * 1000 + 10 + i for i in range(players)]
+    raws = [message_update(chat_id, admin, "/new_game")]
+    raws += [callback_update(chat_id, user_id, "apply_to_join") for user_id in user_ids]
+    raws += [callback_update(admin, admin, f"digest_all_{chat_id}"),
+             message_update(chat_id, admin, "/start_game"),
+             message_update(chat_id, user_ids[0], "/vote")]
+    for raw in raws:
+        await dp.feed_update(bot, Update.model_validate(raw, context={"bot": bot}))
+    return chat_id
+
+
+async def arm_deadline(bot, chat_id: int, delay: float):
+    """
+    Перевзводит таймер голосования на delay секунд из очереди игры, как /vote: тот тоже взводит таймер
+    в обработчике и, пока рассылает клавиатуры, еще занимает очередь игры.
+    """
+    async def rearm():
+        game = state.get_game(chat_id)
+        if game is None or not game.is_voting_active:
+            return
+        scheduler.cancel(game.vote_timer)
+        game.vote_timer = scheduler.schedule(delay, partial(_on_vote_deadline, chat_id, bot), kind="vote", group=chat_id)
+        await asyncio.sleep(DEADLINE_SPREAD)
+    await actors.run(chat_id, rearm)
+
+
+def conflicting_events(dp, bot, chat_id: int, taps: int, rng: random.Random):
+    game = state.get_game(chat_id)
+    user_ids = [p.user_id for p in game.players]
+    suspect = rng.choice(user_ids)
+    raws = []
+    for user_id in user_ids:
+        # Два нажатия с разных сообщений: дедупликация их не склеит, отсечь должна сама игра
+        raws += [callback_update(user_id, user_id, f"vote_{chat_id}_{suspect}", message_id=next(_message_ids)) for _ in range(2)]
+    for imposter_id in game.imposter_ids:
+        raws += [callback_update(imposter_id, imposter_id, f"task_done_{chat_id}", message_id=next(_message_ids)) for _ in range(taps)]
+    rng.shuffle(raws)
+    events = [dp.feed_update(bot, Update.model_validate(raw, context={"bot": bot})) for raw in raws]
+    # Таймер голосования срабатывает посреди голосов
+    events.insert(rng.randrange(len(events) + 1), arm_deadline(bot, chat_id, rng.uniform(0, DEADLINE_SPREAD)))
+    return events
+
+
+class OverlapTracker:
+    """Оборачивает actors.run и считает события игры, начатые, пока другое событие той же игры еще выполняется."""
+
+    def __init__(self):
+        self.busy = Counter()
+        self.overlaps = Counter()
+        self._run = actors.run
+
+    async def run(self, key, job):
+        async def tracked():
+            self.busy[key] += 1
+            if self.busy[key] > 1:
+                self.overlaps[key] += 1
+            try:
+                return await job()
+            finally:
+                self.busy[key] -= 1
+        return await self._run(key, tracked)
+
+
+def check_invariants(bot, chat_ids) -> Counter:
+    texts = Counter()
+    for call in bot.session.calls_of("SendMessage"):
+        if call.chat_id in chat_ids:
+            for phrase in VOTE_OUTCOMES:
+                texts[(call.chat_id, "outcome")] += call.text.count(phrase)
+            texts[(call.chat_id, "game_over")] += call.text.count(GAME_OVER)
+
+    violations = Counter()
+    for chat_id in chat_ids:
+        # Голосование закрывается ровно один раз — либо досрочно, либо по таймеру (если игра не кончилась раньше заданиями)
+        if texts[(chat_id, "outcome")] > 1:
+            violations["vote closed more than once"] += 1
+        if texts[(chat_id, "game_over")] > 1:
+            violations["game over announced more than once"] += 1
+        game = state.get_game(chat_id)
+        if game is not None:
+            if game.tasks_completed >= game.TASKS_TO_WIN:
+                violations["game survived a task win"] += 1
+            if game.votes_used > game.votes_total:
+                violations["votes_used over votes_total"] += 1
+            if game.is_voting_active:
+                violations["vote left open"] += 1
+            if game.imposter_mask & game.voted_out_mask:
+                violations["voted-out imposter still alive"] += 1
+    return violations
+
+
+async def run(dp, chats: int, players: int, taps: int, enabled: bool):
+    actors.enabled = enabled
+    rng = random.Random(3)
+    # Задержка API дает хендлерам прерваться посередине, как в проде
+    bot = make_fake_bot(latency=0.002)
+    offset = 0 if enabled else chats
+    chat_ids = await asyncio.gather(*(setup_game(dp, bot, offset + game_no, players) for game_no in range(chats)))
+    errors_before = sum(s.total for s in error_reports.stats.values())
+
+    events = [e for chat_id in chat_ids for e in conflicting_events(dp, bot, chat_id, taps, rng)]
+    tracker = OverlapTracker()
+    actors.run = tracker.run
+    started = time.perf_counter()
+    await asyncio.gather(*events)
+    elapsed = time.perf_counter() - started
+    # Таймеры, взведенные в конце, должны успеть сработать и доработать
+    await asyncio.sleep(DEADLINE_SPREAD)
+    await scheduler.wait_running(10)
+    await outbox.flush_all()
+    del actors.run
+
+    violations = check_invariants(bot, set(chat_ids))
+    overlapped = sum(1 for chat_id in chat_ids if tracker.overlaps[chat_id])
+    if overlapped:
+        violations["events of one game overlapped"] += overlapped
+    errors = sum(s.total for s in error_reports.stats.values()) - errors_before
+    if errors:
+        violations["handler exceptions"] += errors
+    for chat_id in chat_ids:
+        state.end_game(chat_id)
+    return len(events), elapsed, violations
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chats", type=int, default=300)
+    parser.add_argument("--players", type=int, default=8)
+    parser.add_argument("--taps", type=int, default=3, help="task_done taps per imposter")
+    args = parser.parse_args()
+
+    dp = build_dispatcher()
+    print(f"{args.chats} games x {args.players} players: all votes twice + vote deadline + {args.taps} task taps per imposter at once")
+    for enabled in (False, True):
+        events, elapsed, violations = await run(dp, args.chats, args.players, args.taps, enabled)
+        label = "game actors" if enabled else "no actors"
+        print(f"  {label:<11} {events} events in {elapsed:.2f} s ({events / elapsed:.0f}/s), "
+              f"invariant violations: {sum(violations.values())}")
+        for name, count in violations.most_common():
+            print(f"    {name}: {count}")
+    assert not violations, violations
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,208 @@
+# benchmarks/stress_shutdown.py
+# Запуск: python -m benchmarks.stress_shutdown [--lobbies 40] [--votes 20] [--players 8] [--latency 0.05] [--downtime 2]
+# Остановка бота посреди нагрузки (src/shutdown.py). Каждый прогон — отдельный процесс с tg.main() и
+# фейковым Bot API: заводим --votes игр с открытым голосованием и --lobbies лобби, затем разом
+# приходят /start_game во все лобби, и посреди их обработки процесс получает SIGTERM. Режимы:
+#   legacy   — как раньше: сигналы ловит aiogram, после остановки polling asyncio.run отменяет
+#              недоделанные хендлеры, голосования ничего о себе не сохраняют;
+#   graceful — poll_until_signal + graceful_shutdown.
+# Меряем время остановки, сколько игроков начатых игр так и не получили сообщение с ролью, и —
+# после перезапуска через --downtime секунд в новом процессе — сколько времени потеряли голосования.
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+MODES = ("legacy", "graceful")
+# Через сколько задержек API после первого принятого /start_game приходит SIGTERM
+KILL_AFTER_ROUND_TRIPS = 0.5
+
+
+def child_run(mode: str, lobbies: int, votes: int, players: int, latency: float):
+    import tg
+    from aiogram.types import Update
+    from benchmarks.fake_api import callback_update, make_fake_bot, message_update
+    from configs.env_config import Config
+    import src.game_state as state
+    from src import shutdown
+    from src.delivery import delivery
+    from src.history import history
+    from src.outbox import outbox
+
+    delivered = []
+    result = {}
+
+    def create_bot():
+        bot = make_fake_bot(latency=latency)
+        make_request = bot.session.make_request
+
+        async def tracked(bot_, method, timeout=None):
+            response = await make_request(bot_, method, timeout)
+            # Учитываем только запросы, на которые пришел ответ
+            delivered.append(method)
+            return response
+
+        bot.session.make_request = tracked
+        return bot
+
+    async def setup_game(dp, bot, game_no: int, vote: bool) -> int:
+        chat_id = -(700_000 + game_no)
+        admin = Config.ADMIN_USER_ID
+        user_ids = [game_no * 1000 + 10 + i for i in range(players)]
+        raws = [message_update(chat_id, admin, "/new_game")]
+        raws += [callback_update(chat_id, user_id, "apply_to_join") for user_id in user_ids]
+        raws.append(callback_update(admin, admin, f"digest_all_{chat_id}"))
+        if vote:
+            raws += [message_update(chat_id, admin, "/start_game"), message_update(chat_id, user_ids[0], "/vote")]
+        for raw in raws:
+            await dp.feed_update(bot, Update.model_validate(raw, context={"bot": bot}))
+        return chat_id
+
+    def wrap_polling(poll):
+        async def setup_then_poll(dp, bot):
+            vote_chats = [await setup_game(dp, bot, game_no, vote=True) for game_no in range(votes)]
+            lobby_chats = [await setup_game(dp, bot, votes + game_no, vote=False) for game_no in range(lobbies)]
+            await outbox.flush_all()
+            delivered.clear()
+            result["lobby_chats"] = lobby_chats
+            result["vote_chats"] = vote_chats
+
+            for chat_id in lobby_chats:
+                bot.session.push_update(message_update(chat_id, Config.ADMIN_USER_ID, "/start_game"))
+
+            def terminate():
+                now = time.time()
+                result["signal_at"] = now
+                # Сколько времени оставалось голосованиям в момент остановки
+                result["vote_left"] = {str(c): state.get_game(c).vote_deadline - now for c in vote_chats}
+                os.kill(os.getpid(), signal.SIGTERM)
+
+            @dp.update.outer_middleware()
+            async def kill_after_first(handler, event, data):
+                # Отсчет до сигнала — с первого /start_game, который принял polling
+                if "signal_at" not in result and "armed" not in result:
+                    result["armed"] = True
+                    asyncio.get_running_loop().call_later(latency * KILL_AFTER_ROUND_TRIPS, terminate)
+                return await handler(event, data)
+
+            await poll(dp, bot)
+        return setup_then_poll
+
+    if mode == "legacy":
+        async def legacy_poll(dp, bot):
+            await bot.delete_webhook(drop_pending_updates=True)
+            await dp.start_polling(bot)
+
+        async def legacy_shutdown(bot, timeout=Config.DRAIN_TIMEOUT, acknowledge=False):
+            await delivery.stop()
+            await history.close()
+
+        shutdown.poll_until_signal = wrap_polling(legacy_poll)
+        shutdown.graceful_shutdown = legacy_shutdown
+    else:
+        shutdown.poll_until_signal = wrap_polling(shutdown.poll_until_signal)
+    tg.create_bot = create_bot
+
+    # asyncio.run, как и в проде: после выхода из main он отменяет все, что еще не доделано
+    asyncio.run(tg.main())
+    stopped = time.time()
+
+    got_role = {m.chat_id for m in delivered if type(m).__name__ == "SendMessage" and int(m.chat_id) > 0}
+    started_players = missing = 0
+    for chat_id in result["lobby_chats"]:
+        game = state.get_game(chat_id)
+        if game is None or game.status == "lobby":
+            continue
+        for player in game.players:
+            started_players += 1
+            missing += player.user_id not in got_role
+    print(json.dumps({
+        "shutdown": stopped - result["signal_at"],
+        "started_games": sum(1 for c in result["lobby_chats"] if state.get_game(c) and state.get_game(c).status != "lobby"),
+        "started_players": started_players,
+        "missing_roles": missing,
+        "vote_left": result["vote_left"],
+        "stopped_at": stopped,
+    }), flush=True)
+
+
+def child_resume():
+    """Новый процесс после перезапуска: восстанавливаем игры и смотрим, сколько времени у голосований."""
+    from benchmarks.fake_api import make_fake_bot
+    from configs.env_config import Config
+    import src.game_state as state
+    from src.handlers import resume_vote_timers
+    from src.persistence import GameJournal
+    from src.scheduler import scheduler
+
+    async def resume():
+        state.restore_games(GameJournal(Config.STATE_DIR))
+        resume_vote_timers(make_fake_bot())
+        left = {}
+        for game in state.active_games.values():
+            if game.vote_timer is not None:
+                left[str(game.chat_id)] = scheduler.remaining(game.vote_timer)
+                scheduler.cancel(game.vote_timer)
+        return left
+
+    print(json.dumps({"vote_left": asyncio.run(resume())}), flush=True)
+
+
+def run_child(state_dir: str, child_args):
+    env = dict(os.environ, STATE_DIR=state_dir, BOT_MODE="polling", SHARD_WORKERS="0",
+               HISTORY_DIR=os.path.join(state_dir, "history"), TASKS_DB_PATH=os.path.join(state_dir, "tasks.sqlite3"))
+    out = subprocess.run([sys.executable, "-m", "benchmarks.stress_shutdown", *child_args],
+                         env=env, capture_output=True, text=True, timeout=120)
+    for line in out.stdout.splitlines():
+        if line.startswith("{"):
+            return json.loads(line)
+    raise RuntimeError(f"child {child_args} produced no result:\n{out.stderr[-3000:]}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lobbies", type=int, default=40, help="lobbies that get /start_game right before SIGTERM")
+    parser.add_argument("--votes", type=int, default=20, help="games with an open vote at shutdown")
+    parser.add_argument("--players", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.05, help="fake Bot API round trip, seconds")
+    parser.add_argument("--downtime", type=float, default=2.0, help="seconds between shutdown and restart")
+    parser.add_argument("--child", choices=MODES + ("resume",))
+    args = parser.parse_args()
+
+    if args.child == "resume":
+        child_resume()
+        return
+    if args.child:
+        child_run(args.child, args.lobbies, args.votes, args.players, args.latency)
+        return
+
+    print(f"SIGTERM during /start_game in {args.lobbies} lobbies x {args.players} players, {args.votes} open votes, "
+          f"Bot API latency {args.latency * 1000:.0f} ms, restart after {args.downtime:.0f} s")
+    for mode in MODES:
+        state_dir = tempfile.mkdtemp(prefix="among_us_shutdown_")
+        try:
+            run = run_child(state_dir, ["--child", mode, "--lobbies", str(args.lobbies), "--votes", str(args.votes),
+                                              "--players", str(args.players), "--latency", str(args.latency)])
+            time.sleep(max(0.0, args.downtime - (time.time() - run["stopped_at"])))
+            resumed = run_child(state_dir, ["--child", "resume"])["vote_left"]
+        finally:
+            shutil.rmtree(state_dir, ignore_errors=True)
+        lost = [run["vote_left"][c] - resumed.get(c, 0.0) for c in run["vote_left"]]
+        print(f"  {mode:<8} shutdown {run['shutdown']:5.2f} s | {run['started_games']}/{args.lobbies} games started, "
+              f"{run['missing_roles']}/{run['started_players']} players never got their role | "
+              f"{len(resumed)}/{args.votes} votes resumed, vote time lost on restart: "
+              f"avg {sum(lost) / max(len(lost), 1):.2f} s, max {max(lost, default=0.0):.2f} s")
+        if mode == "graceful":
+            assert run["missing_roles"] == 0, run
+            assert len(resumed) == args.votes and max(lost, default=0.0) < 0.5, lost
+
+
+if __name__ == "__main__":
+    main()
@@ -9,4 +9,59 @@ class Config:
     TG_TOKEN = os.getenv("TG_TOKEN", "")
     
     # ID администратора игры (преобразуем в число)
-    ADMIN_USER_ID = int(os.getenv("ADMIN_USER_ID", 0))
\ No newline at end of file
+    ADMIN_USER_ID = int(os.getenv("ADMIN_USER_ID", 0))
+    
+    # Путь к базе заданий (SQLite)
+    TASKS_DB_PATH = os.getenv("TASKS_DB_PATH", "data/tasks.sqlite3")
+    
+    # Папка для журнала и снимков активных игр (восстановление после перезапуска)
+    STATE_DIR = os.getenv("STATE_DIR", "data/state")
+    # fsync после каждой пачки записей журнала: надежнее при падении ОС, но медленнее
+    JOURNAL_FSYNC = os.getenv("JOURNAL_FSYNC", "0") == "1"
+    
+    # Режим получения апдейтов: "polling" или "webhook"
+    BOT_MODE = os.getenv("BOT_MODE", "polling")
+    # Публичный адрес, на который Telegram будет слать апдейты (например, https://bot.example.com)
+    WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL", "")
+    WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+    # Секрет, который Telegram передает в заголовке X-Telegram-Bot-Api-Secret-Token
+    WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+    # Адрес встроенного aiohttp-сервера
+    WEBAPP_HOST = os.getenv("WEBAPP_HOST", "0.0.0.0")
+    WEBAPP_PORT = int(os.getenv("WEBAPP_PORT", 8080))
+    # Сколько секунд при остановке ждать хендлеры, которые еще обрабатывают апдейты
+    DRAIN_TIMEOUT = float(os.getenv("DRAIN_TIMEOUT", 10))
+    # Сбрасывать ли апдейты, накопившиеся в Telegram, пока бот не работал (по умолчанию сбрасываются).
+    # С 0 бот после перезапуска обработает накопившееся; дублей не будет: при штатной остановке
+    # обработанные апдейты подтверждаются (src/shutdown.py)
+    DROP_PENDING_UPDATES = os.getenv("DROP_PENDING_UPDATES", "1") == "1"
+    
+    # Число процессов-воркеров, между которыми игры делятся по chat_id (0 — все в одном процессе)
+    SHARD_WORKERS = int(os.getenv("SHARD_WORKERS", 0))
+    
+    # Соблюдать лимиты Telegram при рассылках. Отключается только для локальных бенчмарков с фейковым API
+    BROADCAST_THROTTLE = os.getenv("BROADCAST_THROTTLE", "1") == "1"
+    
+    # Локальный HTTP-эндпоинт метрик в формате Prometheus (/metrics). 0 — метрики не собираются.
+    # Воркеры шардов слушают следующие порты: METRICS_PORT + 1 + номер шарда
+    METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+    METRICS_PORT = int(os.getenv("METRICS_PORT", 9100))
+    
+    # Сколько секунд копить заявки в лобби, прежде чем обновить сводку заявок у админа
+    APPROVAL_DIGEST_DELAY = float(os.getenv("APPROVAL_DIGEST_DELAY", 3))
+    
+    # Окно склейки исходящих сообщений в чат, секунды: сообщения, отправленные подряд, уходят одним (0 — без склейки)
+    OUTBOX_WINDOW = float(os.getenv("OUTBOX_WINDOW", 0.3))
+    
+    # Очередь личных сообщений с повторами (src/delivery.py): сколько раз пробовать при сетевых ошибках
+    # и 5xx, прежде чем отдать сообщение админу как недоставленное, и потолок паузы между попытками, секунды
+    DELIVERY_MAX_ATTEMPTS = int(os.getenv("DELIVERY_MAX_ATTEMPTS", 8))
+    DELIVERY_MAX_BACKOFF = float(os.getenv("DELIVERY_MAX_BACKOFF", 300))
+    
+    # Ошибки хендлеров (src/error_reports.py): предупреждать админа, если одна и та же ошибка
+    # повторилась столько раз за минуту, и присылать сводку ошибок не чаще чем раз в столько секунд
+    ERROR_ALERT_RATE = int(os.getenv("ERROR_ALERT_RATE", 10))
+    ERROR_DIGEST_INTERVAL = float(os.getenv("ERROR_DIGEST_INTERVAL", 3600))
+    
+    # История игровых событий для /stats (src/history.py): сегменты JSONL сжимаются в Parquet
+    HISTORY_DIR = os.getenv("HISTORY_DIR", "data/history")
\ No newline at end of file
@@ -0,0 +1,92 @@
+# src/analytics.py
+# Агрегаты по истории игр (src/history.py). Модуль тянет pandas, поэтому импортируется
+# только внутри админских команд и выполняется в отдельном потоке.
+
+import pandas as pd
+
+from src.history import load_history
+
+# Сколько голосов должно быть у игрока, чтобы его точность попала в распределение
+MIN_VOTES_PER_PLAYER = 3
+ACCURACY_BINS = [-0.001, 0.25, 0.5, 0.75, 1.0]
+ACCURACY_LABELS = ["0–25%", "25–50%", "50–75%", "75–100%"]
+VOTE_OUTCOMES = {"found": "импостер найден", "miss": "промах", "tie": "ничья", "empty": "никто не голосовал"}
+TOP_TASKS = 10
+
+
+def win_rates(frame: pd.DataFrame) -> pd.DataFrame:
+    """Доля побед импостеров и экипажа и медианная длительность игры по числу игроков (без остановленных админом)."""
+    over = frame[(frame["event"] == "game_over") & (frame["outcome"] != "stopped")]
+    if over.empty:
+        return pd.DataFrame(columns=["games", "imposters", "crew", "minutes"])
+    over = over.assign(
+        imposters_won=(over["outcome"] == "imposters").astype(float),
+        minutes=(over["ts"] - over["game"]) / 60,
+    )
+    table = over.groupby("players", observed=True).agg(
+        games=("imposters_won", "size"), imposters=("imposters_won", "mean"), minutes=("minutes", "median")
+    )
+    table["crew"] = 1 - table["imposters"]
+    return table[["games", "imposters", "crew", "minutes"]]
+
+
+def vote_outcomes(frame: pd.DataFrame) -> pd.Series:
+    results = frame.loc[frame["event"] == "vote_result", "outcome"]
+    shares = results.value_counts(normalize=True)
+    # У категориальной колонки value_counts перечисляет и исходы других событий — с нулями
+    return shares[shares > 0]
+
+
+def voter_accuracy(frame: pd.DataFrame) -> pd.Series:
+    """Распределение игроков по доле голосов, попавших в импостера."""
+    casts = frame[frame["event"] == "vote_cast"]
+    per_player = (casts["outcome"] == "hit").groupby(casts["user_id"]).agg(["mean", "size"])
+    per_player = per_player[per_player["size"] >= MIN_VOTES_PER_PLAYER]
+    return pd.cut(per_player["mean"], ACCURACY_BINS, labels=ACCURACY_LABELS).value_counts(sort=False)
+
+
+def task_rates(frame: pd.DataFrame) -> pd.DataFrame:
+    """Сколько раз каждое задание выполнили и сменили; доля смен."""
+    tasks = frame[frame["event"].isin(["task_done", "task_skip"])]
+    table = pd.crosstab(tasks["task"], tasks["event"]).reindex(columns=["task_done", "task_skip"], fill_value=0)
+    table.columns = ["done", "skipped"]
+    table["skip_rate"] = table["skipped"] / (table["done"] + table["skipped"])
+    return table.sort_values(["skip_rate", "skipped"], ascending=False)
+
+
+def report(history_dir: str) -> str:
+    """Текст ответа на /stats (Markdown, таблицы — моноширинным блоком)."""
+    frame = load_history(history_dir)
+    games = int((frame["event"] == "game_over").sum())
+    if games == 0:
+        return "📊 Сыгранных игр пока нет."
+
+    lines = [f"📊 Статистика по {games} играм", "```"]
+    rates = win_rates(frame)
+    if not rates.empty:
+        lines.append("игроков    игр  импостеры  экипаж  мин")
+        for players, row in rates.iterrows():
+            lines.append(f"{players:>7}  {row['games']:>5.0f}  {row['imposters']:>9.0%}  {row['crew']:>6.0%}  {row['minutes']:>3.0f}")
+    outcomes = vote_outcomes(frame)
+    if not outcomes.empty:
+        lines.append("")
+        lines.append(f"Итоги голосований ({int((frame['event'] == 'vote_result').sum())}):")
+        for outcome, share in outcomes.items():
+            lines.append(f"  {VOTE_OUTCOMES.get(outcome, outcome)}: {share:.0%}")
+    accuracy = voter_accuracy(frame)
+    if accuracy.sum():
+        lines.append("")
+        lines.append(f"Точность голосов игроков (от {MIN_VOTES_PER_PLAYER} голосов):")
+        for label, count in accuracy.items():
+            lines.append(f"  {label}: {count}")
+    tasks = task_rates(frame)
+    if not tasks.empty:
+        lines.append("")
+        lines.append("Чаще всего меняют задания:")
+        for task, row in tasks.head(TOP_TASKS).iterrows():
+            # Внутри блока кода Markdown опасны только обратные кавычки
+            title = (task if len(task) <= 40 else task[:39] + "…").replace("`", "'")
+            skipped, total = int(row["skipped"]), int(row["done"] + row["skipped"])
+            lines.append(f"  {row['skip_rate']:>4.0%} ({skipped}/{total}) {title}")
+    lines.append("```")
+    return "\n".join(lines)
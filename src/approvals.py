@@ -0,0 +1,102 @@
+# src/approvals.py
+
+import logging
+from functools import partial
+from typing import Set
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramBadRequest
+
+from configs.env_config import Config
+import src.game_state as state
+from src import render
+from src.game_actor import actors
+from src.keyboards import create_approval_digest_keyboard
+from src.outbox import outbox
+from src.scheduler import scheduler
+
+ADMIN_UNREACHABLE = "Не удалось связаться с админом. Попросите его проверить ЛС с ботом."
+
+# Лобби, чья последняя сводка не дошла до админа (например, он не открыл ЛС с ботом или сеть упала)
+_unreachable_digests: Set[int] = set()
+
+
+def admin_unreachable(chat_id: int) -> bool:
+    return chat_id in _unreachable_digests
+
+
+def schedule_digest(game, bot: Bot):
+    """
+    Откладывает обновление сводки заявок лобби: все заявки, пришедшие за APPROVAL_DIGEST_DELAY секунд,
+    попадают в админский чат одним сообщением (или одной правкой уже отправленной сводки).
+    """
+    if game.approval_timer is None:
+        game.approval_timer = scheduler.schedule(
+            Config.APPROVAL_DIGEST_DELAY, partial(_on_digest_timer, game.chat_id, bot), kind="approval_digest", group=game.chat_id
+        )
+
+
+def resume_digests(bot: Bot) -> int:
+    """После перезапуска досылает сводки по заявкам, которые не успели попасть к админу."""
+    resumed = 0
+    for game in state.active_games.values():
+        if game.status == "lobby" and game.pending_players and game.approval_timer is None:
+            schedule_digest(game, bot)
+            resumed += 1
+    return resumed
+
+
+async def _on_digest_timer(chat_id: int, bot: Bot):
+    # Сводка читает и меняет заявки лобби, поэтому встает в очередь игры вместе с хендлерами
+    await actors.run(chat_id, partial(_flush_scheduled_digest, chat_id, bot))
+
+
+async def _flush_scheduled_digest(chat_id: int, bot: Bot):
+    # Игрокам уже ответили, что заявка отправлена: о неудаче сообщаем в чат лобби
+    if not await flush_digest(chat_id, bot):
+        outbox.post(bot, chat_id, ADMIN_UNREACHABLE)
+
+
+async def flush_digest(chat_id: int, bot: Bot) -> bool:
+    """
+    Отправляет или правит сводку заявок лобби прямо сейчас. False — сводка не дошла до админа:
+    заявки остаются в лобби и попадут в следующую сводку.
+    """
+    game = state.get_game(chat_id)
+    if not game:
+        _unreachable_digests.discard(chat_id)
+        return True
+    scheduler.cancel(game.approval_timer)
+    game.approval_timer = None
+
+    text = render.approval_digest(game)
+    markup = create_approval_digest_keyboard(game) if game.pending_players else None
+    delivered = True
+    if game.approval_message_id is not None:
+        try:
+            await bot.edit_message_text(text, chat_id=Config.ADMIN_USER_ID, message_id=game.approval_message_id, reply_markup=markup)
+        except TelegramBadRequest as e:
+            if "message is not modified" not in str(e):
+                # Сводку удалили или она слишком старая для правки — отправим новую
+                logging.warning(f"Could not edit approval digest for {chat_id}: {e}")
+                game.approval_message_id = None
+        except TelegramAPIError as e:
+            # Админ заблокировал бота, сеть, 429: сводка остается прежней, новую не шлем
+            logging.error(f"Failed to edit approval digest for {chat_id}: {e}")
+            delivered = False
+    if delivered and game.approval_message_id is None and game.pending_players:
+        try:
+            sent = await bot.send_message(Config.ADMIN_USER_ID, text, reply_markup=markup)
+            game.approval_message_id = sent.message_id
+        except TelegramAPIError as e:
+            logging.error(f"Failed to send approval digest for {chat_id} to admin: {e}")
+            delivered = False
+    if delivered:
+        _unreachable_digests.discard(chat_id)
+    else:
+        _unreachable_digests.add(chat_id)
+    if not game.pending_players:
+        # Сводка закрыта; следующая пачка заявок придет новым сообщением, внизу чата
+        game.approval_message_id = None
+    state.save_game(game)
+    return delivered
@@ -0,0 +1,199 @@
+# src/balance_sim.py
+# Запуск: python -m src.balance_sim [--games 1000000] [--players 4 12] [--voting random informed]
+#         [--two-imposters-from 6] [--tasks-to-win 2 3] [--votes-offset -1 0] [--workers N]
+# Монте-Карло баланса правил старта игры (src/model/balance.py). Игры одной конфигурации
+# считаются пачками массивов numpy, пачки раздаются процессам multiprocessing.
+#
+# Модель раунда: между голосованиями импостеры выполняют Poisson(task_rate) общих заданий,
+# затем все живые игроки голосуют. Итоги — как в process_vote_results: выгоняют только
+# единоличного лидера и только если он импостер; после голосования проверяются победа экипажа
+# (импостеров не осталось), победа импостеров числом (их не меньше мирных) и по попыткам.
+# Голосование:
+#   random   — каждый голосует за случайного другого живого игрока;
+#   informed — мирный с вероятностью accuracy голосует за живого импостера, иначе случайно;
+#              импостеры сговариваются и голосуют за одного и того же мирного.
+
+import argparse
+import multiprocessing as mp
+import os
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from src.model.balance import DEFAULT_RULES, BalanceRules
+
+# Исходы игры
+RUNNING, CREW, IMP_TASKS, IMP_NUMBERS, IMP_VOTES = range(5)
+OUTCOMES = (CREW, IMP_TASKS, IMP_NUMBERS, IMP_VOTES)
+
+# Игр в одной пачке numpy: матрица случайных чисел пачки — BATCH x N x N float32
+BATCH = 50_000
+# Игр в одном задании для процесса
+CHUNK = 200_000
+VOTING_MODELS = ("random", "informed")
+
+
+@dataclass(frozen=True, slots=True)
+class SimParams:
+    voting: str = "informed"
+    accuracy: float = 0.35
+    turnout: float = 0.9
+    task_rate: float = 0.5
+
+
+DEFAULT_PARAMS = SimParams()
+
+
+def _pick(rng: np.random.Generator, allowed: np.ndarray) -> np.ndarray:
+    """Случайный допустимый индекс по последней оси (-1, если допустимых нет)."""
+    scores = rng.random(allowed.shape, dtype=np.float32)
+    scores[~allowed] = -1.0
+    picked = scores.argmax(axis=-1)
+    return np.where(allowed.any(axis=-1), picked, -1)
+
+
+def simulate_batch(rng: np.random.Generator, games: int, players: int, rules: BalanceRules,
+                   params: SimParams) -> Tuple[np.ndarray, int]:
+    """Исходы games игр на players игроков. Импостеры — игроки 0..k-1 (роли симметричны)."""
+    k, tasks_to_win, votes_total = rules.for_players(players)
+    crew = players - k
+    imposter = np.arange(players) < k
+    not_self = ~np.eye(players, dtype=bool)
+
+    outcome = np.full(games, RUNNING, dtype=np.int8)
+    alive = np.ones((games, players), dtype=bool)
+    tasks = np.zeros(games, dtype=np.int32)
+    votes_used = np.zeros(games, dtype=np.int32)
+    # Голосований не больше votes_total, после этого импостеры добирают задания
+    while True:
+        running = np.flatnonzero(outcome == RUNNING)
+        if running.size == 0:
+            break
+        tasks[running] += rng.poisson(params.task_rate, running.size).astype(np.int32)
+        done = tasks[running] >= tasks_to_win
+        outcome[running[done]] = IMP_TASKS
+        running = running[~done & (votes_used[running] < votes_total)]
+        if running.size == 0:
+            continue
+
+        g = running.size
+        living = alive[running]
+        # Кандидаты: живые игроки, кроме самого голосующего. Форма (g, голосующий, цель)
+        candidates = living[:, None, :] & not_self[None, :, :]
+        targets = _pick(rng, candidates)
+        if params.voting == "informed":
+            informed = rng.random((g, players)) < params.accuracy
+            targets = np.where(informed & ~imposter, _pick(rng, candidates & imposter), targets)
+            # Импостеры голосуют дружно за одного мирного
+            scapegoat = _pick(rng, np.broadcast_to(~imposter, (g, players)))
+            targets = np.where(imposter, scapegoat[:, None], targets)
+        voting = living & (rng.random((g, players)) < params.turnout) & (targets >= 0)
+
+        rows = np.broadcast_to(np.arange(g)[:, None], (g, players))
+        counts = np.bincount((rows * players + targets)[voting], minlength=g * players).reshape(g, players)
+        leader = counts.argmax(axis=1)
+        top = counts[np.arange(g), leader]
+        unique = (top > 0) & ((counts == top[:, None]).sum(axis=1) == 1)
+        found = unique & (leader < k)
+        alive[running[found], leader[found]] = False
+        votes_used[running] += 1
+
+        imposters_left = alive[running, :k].sum(axis=1)
+        finished = np.full(g, RUNNING, dtype=np.int8)
+        finished[(votes_used[running] >= votes_total)] = IMP_VOTES
+        finished[imposters_left >= crew] = IMP_NUMBERS
+        finished[imposters_left == 0] = CREW
+        outcome[running] = finished
+    return outcome, int(votes_used.sum())
+
+
+def _run_chunk(job: Tuple[int, BalanceRules, SimParams, int, np.random.SeedSequence]) -> Tuple[int, str, np.ndarray, int]:
+    players, rules, params, games, seed = job
+    rng = np.random.default_rng(seed)
+    counts = np.zeros(len(OUTCOMES) + 1, dtype=np.int64)
+    votes = 0
+    for start in range(0, games, BATCH):
+        outcome, used = simulate_batch(rng, min(BATCH, games - start), players, rules, params)
+        counts += np.bincount(outcome, minlength=len(counts))
+        votes += used
+    return players, params.voting, counts, votes
+
+
+def simulate(players_range: range, rules: BalanceRules, models: List[SimParams], games: int,
+             workers: int, seed: int) -> Dict[Tuple[int, str], Tuple[np.ndarray, int]]:
+    """{(игроков, модель голосования): (число исходов по OUTCOMES, всего потраченных попыток)}"""
+    jobs = []
+    seeds = np.random.SeedSequence(seed)
+    for params in models:
+        for players in players_range:
+            for start in range(0, games, CHUNK):
+                jobs.append((players, rules, params, min(CHUNK, games - start), seeds.spawn(1)[0]))
+
+    results: Dict[Tuple[int, str], Tuple[np.ndarray, int]] = {}
+
+    def collect(result):
+        players, voting, counts, votes = result
+        total, total_votes = results.get((players, voting), (0, 0))
+        results[(players, voting)] = (total + counts, total_votes + votes)
+
+    if workers <= 1:
+        for job in jobs:
+            collect(_run_chunk(job))
+    else:
+        with mp.get_context("spawn").Pool(workers) as pool:
+            for result in pool.imap_unordered(_run_chunk, jobs):
+                collect(result)
+    return results
+
+
+def render_table(results, players_range: range, rules: BalanceRules, params: SimParams) -> str:
+    lines = [
+        f"voting={params.voting}" + (f" accuracy={params.accuracy:.0%}" if params.voting == "informed" else "")
+        + f" turnout={params.turnout:.0%} task_rate={params.task_rate}",
+        "players imp tasks votes |  crew  | imp:tasks imp:votes imp:numbers | votes used",
+    ]
+    for players in players_range:
+        k, tasks_to_win, votes_total = rules.for_players(players)
+        counts, votes = results[(players, params.voting)]
+        games = counts.sum()
+        share = counts / games
+        lines.append(
+            f"{players:>7} {k:>3} {tasks_to_win:>5} {votes_total:>5} | {share[CREW]:>6.1%} | "
+            f"{share[IMP_TASKS]:>9.1%} {share[IMP_VOTES]:>9.1%} {share[IMP_NUMBERS]:>11.1%} | {votes / games:>10.2f}"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo balance of the start_game rules")
+    parser.add_argument("--games", type=int, default=1_000_000, help="games per player count and voting model")
+    parser.add_argument("--players", type=int, nargs=2, default=[4, 12], metavar=("MIN", "MAX"))
+    parser.add_argument("--voting", choices=VOTING_MODELS, nargs="+", default=list(VOTING_MODELS))
+    parser.add_argument("--accuracy", type=float, default=DEFAULT_PARAMS.accuracy)
+    parser.add_argument("--turnout", type=float, default=DEFAULT_PARAMS.turnout)
+    parser.add_argument("--task-rate", type=float, default=DEFAULT_PARAMS.task_rate, help="expected imposter tasks between votes")
+    parser.add_argument("--two-imposters-from", type=int, default=DEFAULT_RULES.two_imposters_from)
+    parser.add_argument("--tasks-to-win", type=int, nargs=2, default=list(DEFAULT_RULES.tasks_to_win), metavar=("ONE", "TWO"))
+    parser.add_argument("--votes-offset", type=int, nargs=2, default=list(DEFAULT_RULES.votes_offset), metavar=("ONE", "TWO"))
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rules = BalanceRules(args.two_imposters_from, tuple(args.tasks_to_win), tuple(args.votes_offset))
+    models = [SimParams(voting, args.accuracy, args.turnout, args.task_rate) for voting in args.voting]
+    players_range = range(args.players[0], args.players[1] + 1)
+
+    started = time.perf_counter()
+    results = simulate(players_range, rules, models, args.games, args.workers, args.seed)
+    elapsed = time.perf_counter() - started
+    total = len(players_range) * len(models) * args.games
+    print(f"{rules}\n{total} games in {elapsed:.1f} s on {args.workers} workers ({total / elapsed:,.0f} games/s)")
+    for params in models:
+        print()
+        print(render_table(results, players_range, rules, params))
+
+
+if __name__ == "__main__":
+    main()
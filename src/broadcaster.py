@@ -0,0 +1,140 @@
+# src/broadcaster.py
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.types import Message
+
+from configs.env_config import Config
+
+# Лимиты Telegram: ~30 сообщений в секунду на бота,
+# ~1 сообщение в секунду в личный чат и ~20 в минуту в группу.
+GLOBAL_RATE = 30.0
+PRIVATE_CHAT_RATE = 1.0
+GROUP_CHAT_RATE = 20 / 60
+# Короткие всплески Telegram допускает, поэтому в ведре есть небольшой запас
+CHAT_BURST = 3
+
+
+class TokenBucket:
+    """Ведро токенов. Токены можно бронировать в долг — тогда вызывающий ждет своей очереди."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at: Optional[float] = None
+
+    def _refill(self, now: float):
+        if self._updated_at is None:
+            self._updated_at = now
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def reserve(self) -> float:
+        """Забирает один токен и возвращает, сколько секунд нужно подождать."""
+        self._refill(asyncio.get_running_loop().time())
+        self._tokens -= 1
+        if self._tokens >= 0:
+            return 0.0
+        return -self._tokens / self.rate
+
+    async def acquire(self):
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def is_idle(self, now: float) -> bool:
+        if self._updated_at is None:
+            return True
+        return self._tokens + (now - self._updated_at) * self.rate >= self.capacity
+
+
+@dataclass
+class OutgoingMessage:
+    chat_id: int
+    text: str
+    # Остальные аргументы bot.send_message (reply_markup, parse_mode и т.д.)
+    kwargs: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class DeliveryResult:
+    chat_id: int
+    message: Optional[Message] = None
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class Broadcaster:
+    """Параллельная рассылка сообщений с соблюдением глобального и поштучного лимитов."""
+
+    # Сколько ведер личных чатов держать, прежде чем чистить простаивающие
+    MAX_IDLE_BUCKETS = 1000
+
+    def __init__(self, global_rate: float = GLOBAL_RATE, private_rate: float = PRIVATE_CHAT_RATE,
+                 group_rate: float = GROUP_CHAT_RATE, chat_burst: float = CHAT_BURST, max_retries: int = 1,
+                 throttle: bool = True):
+        self.throttle = throttle
+        self.global_rate = global_rate
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.private_rate = private_rate
+        self.group_rate = group_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self._chat_buckets: Dict[int, TokenBucket] = {}
+
+    def share_global_rate(self, parts: int):
+        """Отдает этому процессу 1/parts глобального лимита: столько процессов шлют сообщения с одним токеном."""
+        rate = self.global_rate / parts
+        self.global_bucket = TokenBucket(rate, rate)
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) >= self.MAX_IDLE_BUCKETS:
+                self._prune_idle_buckets()
+            # В Telegram id групп отрицательные, личных чатов — положительные
+            rate = self.private_rate if chat_id > 0 else self.group_rate
+            bucket = TokenBucket(rate, self.chat_burst)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    def _prune_idle_buckets(self):
+        now = asyncio.get_running_loop().time()
+        for chat_id in [cid for cid, b in self._chat_buckets.items() if b.is_idle(now)]:
+            del self._chat_buckets[chat_id]
+
+    async def send(self, bot: Bot, chat_id: int, text: str, *, retries: Optional[int] = None, **kwargs) -> DeliveryResult:
+        """retries — сколько раз переждать 429 перед тем, как вернуть ошибку (по умолчанию max_retries)."""
+        max_retries = self.max_retries if retries is None else retries
+        attempt = 0
+        while True:
+            if self.throttle:
+                await self._chat_bucket(chat_id).acquire()
+                await self.global_bucket.acquire()
+            try:
+                message = await bot.send_message(chat_id, text, **kwargs)
+                return DeliveryResult(chat_id=chat_id, message=message)
+            except TelegramRetryAfter as e:
+                if attempt >= max_retries:
+                    return DeliveryResult(chat_id=chat_id, error=e)
+                attempt += 1
+                logging.warning(f"Flood limit for chat {chat_id}, retrying in {e.retry_after}s")
+                await asyncio.sleep(e.retry_after)
+            except Exception as e:
+                return DeliveryResult(chat_id=chat_id, error=e)
+
+    async def broadcast(self, bot: Bot, messages: Iterable[OutgoingMessage]) -> List[DeliveryResult]:
+        """Отправляет все сообщения одновременно. Результаты идут в том же порядке, что и сообщения."""
+        return await asyncio.gather(*(self.send(bot, m.chat_id, m.text, **m.kwargs) for m in messages))
+
+
+broadcaster = Broadcaster(throttle=Config.BROADCAST_THROTTLE)
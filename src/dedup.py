@@ -0,0 +1,109 @@
+# src/dedup.py
+
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.types import CallbackQuery, TelegramObject, Update
+
+from src.metrics import DEDUP_HITS
+
+# Сколько помнить update_id: повторы вебхука и переотправка после перезапуска приходят в пределах минут
+UPDATE_TTL = 10 * 60
+# Окно, в котором повторное нажатие той же кнопки тем же игроком считается случайным двойным нажатием
+CALLBACK_TTL = 2.0
+# Кнопки-переключатели: повторное нажатие отменяет первое, это не двойное нажатие (отметка заявки в сводке)
+CALLBACK_DEDUP_EXEMPT = ("digest_toggle_",)
+MAX_ENTRIES = 50_000
+
+
+class SeenCache:
+    """
+    Множество недавно виденных ключей с TTL и ограничением размера.
+    TTL одинаковый для всех ключей и при повторном попадании не продлевается, поэтому порядок вставки
+    совпадает с порядком истечения: просроченные и лишние ключи всегда снимаются с начала, за O(1).
+    """
+
+    def __init__(self, ttl: float, max_entries: int = MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # {ключ: момент истечения (time.monotonic())}
+        self._expires: "OrderedDict[Hashable, float]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._expires)
+
+    def check_and_add(self, key: Hashable) -> bool:
+        """True, если ключ уже встречался в пределах TTL. Иначе запоминает его."""
+        now = time.monotonic()
+        expires = self._expires
+        while expires:
+            oldest_key, oldest_expires = next(iter(expires.items()))
+            if oldest_expires > now and len(expires) < self.max_entries:
+                break
+            del expires[oldest_key]
+        if key in expires:
+            self.hits += 1
+            return True
+        expires[key] = now + self.ttl
+        self.misses += 1
+        return False
+
+
+class UpdateDedupMiddleware(BaseMiddleware):
+    """Внешний middleware на dp.update: апдейт с уже обработанным update_id отбрасывается до роутинга."""
+
+    def __init__(self, cache: SeenCache):
+        self.cache = cache
+
+    async def __call__(self, handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                       event: Update, data: Dict[str, Any]) -> Any:
+        if self.cache.check_and_add(event.update_id):
+            DEDUP_HITS.inc("update")
+            logging.info(f"Dropping duplicate update {event.update_id}")
+            return None
+        return await handler(event, data)
+
+
+class CallbackDedupMiddleware(BaseMiddleware):
+    """
+    Внешний middleware на dp.callback_query: повторное нажатие той же кнопки на том же сообщении
+    тем же пользователем в течение CALLBACK_TTL не доходит до хендлеров. Нажатию только гасится "часики".
+    Кнопки с callback_data из exempt_prefixes (переключатели) не дедуплицируются.
+    """
+
+    def __init__(self, cache: SeenCache, exempt_prefixes: Tuple[str, ...] = CALLBACK_DEDUP_EXEMPT):
+        self.cache = cache
+        self.exempt_prefixes = exempt_prefixes
+
+    async def __call__(self, handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                       event: CallbackQuery, data: Dict[str, Any]) -> Any:
+        if event.data and event.data.startswith(self.exempt_prefixes):
+            return await handler(event, data)
+        message = event.message
+        if message is not None:
+            key = (event.from_user.id, message.chat.id, message.message_id, event.data)
+        else:
+            key = (event.from_user.id, event.inline_message_id, event.data)
+        if self.cache.check_and_add(key):
+            DEDUP_HITS.inc("callback")
+            try:
+                await event.answer()
+            except Exception as e:
+                logging.debug(f"Could not answer a duplicate callback: {e}")
+            return None
+        return await handler(event, data)
+
+
+update_cache = SeenCache(UPDATE_TTL)
+callback_cache = SeenCache(CALLBACK_TTL)
+
+
+def setup_dispatcher(dp: Dispatcher):
+    # Внешние middleware срабатывают до фильтров и хендлеров, поэтому дубликат не стоит ни поиска игры, ни запросов к API
+    dp.update.outer_middleware(UpdateDedupMiddleware(update_cache))
+    dp.callback_query.outer_middleware(CallbackDedupMiddleware(callback_cache))
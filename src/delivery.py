@@ -0,0 +1,316 @@
+# src/delivery.py
+
+import asyncio
+import html
+import json
+import logging
+import os
+import random
+import sqlite3
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+from aiogram.types import InlineKeyboardMarkup
+
+from configs.env_config import Config
+from src.broadcaster import Broadcaster, DeliveryResult, broadcaster
+
+# Статусы сообщений в очереди
+PENDING = "pending"
+SENDING = "sending"
+SENT = "sent"
+DEAD = "dead"
+
+# Экспоненциальная пауза между попытками при сетевых ошибках и 5xx, секунды
+BACKOFF_BASE = 1.0
+# Сколько одновременно отправок держит воркер (в разные чаты; в один чат — всегда по одной)
+MAX_IN_FLIGHT = 100
+# Сколько хранить доставленные и мертвые сообщения: все это время повтор с тем же ключом отбрасывается
+RETENTION = 24 * 60 * 60
+PRUNE_INTERVAL = 10 * 60
+# Сколько текста недоставленного сообщения показывать админу
+DEAD_LETTER_PREVIEW = 500
+
+# Ошибки, после которых есть смысл повторить: сеть, таймауты и 5xx. Остальные (400, 403, 404) — окончательные
+_TRANSIENT_ERRORS = (TelegramNetworkError, TelegramServerError, asyncio.TimeoutError, OSError)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    key        TEXT    NOT NULL UNIQUE,
+    chat_id    INTEGER NOT NULL,
+    text       TEXT    NOT NULL,
+    options    TEXT    NOT NULL,
+    status     TEXT    NOT NULL,
+    attempts   INTEGER NOT NULL DEFAULT 0,
+    due_at     REAL    NOT NULL,
+    updated_at REAL    NOT NULL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS outbox_queue ON outbox (chat_id, id) WHERE status IN ('pending', 'sending');
+CREATE INDEX IF NOT EXISTS outbox_finished ON outbox (status, updated_at);
+"""
+
+# Голова очереди каждого чата; чат, голова которого уже отправляется, пропускается
+_DUE_HEADS = """
+SELECT id, chat_id, text, options, attempts FROM outbox
+WHERE id IN (SELECT MIN(id) FROM outbox WHERE status IN ('pending', 'sending') GROUP BY chat_id)
+  AND status = 'pending' AND due_at <= ?
+ORDER BY due_at, id LIMIT ?
+"""
+_NEXT_DUE = """
+SELECT MIN(due_at) FROM outbox
+WHERE id IN (SELECT MIN(id) FROM outbox WHERE status IN ('pending', 'sending') GROUP BY chat_id)
+  AND status = 'pending'
+"""
+
+
+def _dump_options(parse_mode: Optional[str], reply_markup: Optional[InlineKeyboardMarkup]) -> str:
+    options: Dict[str, Any] = {}
+    if parse_mode is not None:
+        options["parse_mode"] = parse_mode
+    if reply_markup is not None:
+        options["reply_markup"] = reply_markup.model_dump(mode="json", exclude_none=True)
+    return json.dumps(options, ensure_ascii=False, separators=(",", ":"))
+
+
+def _load_options(raw: str) -> Dict[str, Any]:
+    options = json.loads(raw)
+    if "reply_markup" in options:
+        options["reply_markup"] = InlineKeyboardMarkup.model_validate(options["reply_markup"])
+    return options
+
+
+def backoff_delay(attempts: int, cap: float) -> float:
+    """Пауза перед следующей попыткой: BACKOFF_BASE * 2^(n-1), не больше cap, со случайным разбросом вниз до половины."""
+    delay = min(cap, BACKOFF_BASE * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+class DurableOutbox:
+    """
+    Очередь исходящих личных сообщений, переживающая сбои Telegram и перезапуск бота.
+    Сообщение сначала пишется в SQLite, потом отправляется фоновым воркером:
+      - 429 (TelegramRetryAfter) — повтор ровно через retry_after, попытка не засчитывается;
+      - сеть, таймауты, 5xx — повтор с экспоненциальной паузой, до max_attempts попыток;
+      - прочие ошибки (бот заблокирован, чат не найден, непредвиденные исключения) — сразу в мертвые.
+    О мертвых сообщениях админ узнает через ту же очередь. В один чат сообщения уходят строго по одному и по порядку.
+    Ключ идемпотентности уникален: повторная постановка того же сообщения (например, при повторной
+    доставке апдейта) отбрасывается, пока запись хранится (RETENTION).
+    """
+
+    def __init__(self, sender: Broadcaster = broadcaster, max_attempts: int = Config.DELIVERY_MAX_ATTEMPTS,
+                 max_backoff: float = Config.DELIVERY_MAX_BACKOFF):
+        self.sender = sender
+        self.max_attempts = max_attempts
+        self.max_backoff = max_backoff
+        self.db_path: Optional[str] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self._bot: Optional[Bot] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._in_flight: Dict[int, asyncio.Task] = {}
+        self._pruned_at = 0.0
+
+    # --- ХРАНИЛИЩЕ ---
+
+    def open(self, db_path: str):
+        if self._conn is not None:
+            return
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        # Записи короткие и редкие, поэтому идут прямо из event loop: WAL + synchronous=NORMAL не ждут fsync
+        self._conn = sqlite3.connect(db_path, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        # Отправки, прерванные остановкой процесса: неизвестно, дошли ли они, поэтому отправляем еще раз
+        self._conn.execute("UPDATE outbox SET status = ? WHERE status = ?", (PENDING, SENDING))
+        self.db_path = db_path
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def counts(self) -> Dict[str, int]:
+        """{статус: число сообщений} — для метрик и бенчмарков."""
+        if self._conn is None:
+            return {}
+        return dict(self._conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+
+    def dead_letters(self) -> List[Tuple[str, int, str, Optional[str]]]:
+        """[(ключ, chat_id, текст, последняя ошибка)]"""
+        if self._conn is None:
+            return []
+        return self._conn.execute(
+            "SELECT key, chat_id, text, last_error FROM outbox WHERE status = ? ORDER BY id", (DEAD,)
+        ).fetchall()
+
+    # --- ПОСТАНОВКА В ОЧЕРЕДЬ ---
+
+    def enqueue(self, bot: Bot, chat_id: int, text: str, key: Optional[str] = None, parse_mode: Optional[str] = None,
+                reply_markup: Optional[InlineKeyboardMarkup] = None) -> bool:
+        """
+        Записывает сообщение в очередь и будит воркер. Возвращает False, если сообщение с таким
+        ключом уже было поставлено. Без ключа сообщения не дедуплицируются.
+        parse_mode=None — режим бота по умолчанию.
+        """
+        if self._worker is None:
+            self.start(bot)
+        now = time.time()
+        cursor = self._conn.execute(
+            "INSERT OR IGNORE INTO outbox (key, chat_id, text, options, status, due_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key or uuid.uuid4().hex, chat_id, text, _dump_options(parse_mode, reply_markup), PENDING, now, now)
+        )
+        if cursor.rowcount == 0:
+            logging.info(f"Message {key} to chat {chat_id} is already queued, skipping the duplicate")
+            return False
+        self._wakeup.set()
+        return True
+
+    # --- ВОРКЕР ---
+
+    def start(self, bot: Bot, db_path: Optional[str] = None):
+        """Открывает очередь (по умолчанию STATE_DIR/delivery.sqlite3) и запускает фоновую отправку."""
+        self.open(db_path or os.path.join(Config.STATE_DIR, "delivery.sqlite3"))
+        if self._worker is not None:
+            return
+        self._bot = bot
+        self._wakeup = asyncio.Event()
+        self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self, timeout: float = 0):
+        """
+        Останавливает воркер. С timeout > 0 сначала ждет, пока очередь опустеет (но не дольше timeout);
+        недоставленное остается в базе и уйдет после следующего запуска.
+        """
+        if self._worker is None:
+            return
+        if timeout > 0:
+            await self.drain(timeout)
+        self._worker.cancel()
+        await asyncio.gather(self._worker, *self._in_flight.values(), return_exceptions=True)
+        self._worker = None
+        self._in_flight.clear()
+        # Отмененные на полпути отправки снова ждут своей очереди
+        self._conn.execute("UPDATE outbox SET status = ? WHERE status = ?", (PENDING, SENDING))
+
+    async def drain(self, timeout: float) -> bool:
+        """Ждет, пока в очереди не останется неотправленных сообщений. True, если успели."""
+        deadline = time.monotonic() + timeout
+        while self._has_unfinished():
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(0.05)
+        return True
+
+    def _has_unfinished(self) -> bool:
+        return self._conn.execute(
+            "SELECT 1 FROM outbox WHERE status IN (?, ?) LIMIT 1", (PENDING, SENDING)
+        ).fetchone() is not None
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            now = time.time()
+            if now - self._pruned_at >= PRUNE_INTERVAL:
+                self._prune(now)
+            free = MAX_IN_FLIGHT - len(self._in_flight)
+            rows = self._conn.execute(_DUE_HEADS, (now, free)).fetchall() if free > 0 else []
+            for row in rows:
+                self._dispatch(*row)
+            if rows:
+                # Отдаем управление, чтобы отправки стартовали, и сразу проверяем очередь снова
+                await asyncio.sleep(0)
+                continue
+            if free <= 0:
+                # Все слоты заняты: ждать срока следующей попытки бессмысленно, он мог и пройти —
+                # разбудит завершение отправки (_on_attempt_done)
+                timeout = None
+            else:
+                next_due = self._conn.execute(_NEXT_DUE).fetchone()[0]
+                timeout = None if next_due is None else max(0.0, next_due - time.time())
+            try:
+                # Будит новое сообщение, завершение отправки или наступление срока следующей попытки
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _dispatch(self, message_id: int, chat_id: int, text: str, options: str, attempts: int):
+        self._conn.execute("UPDATE outbox SET status = ? WHERE id = ?", (SENDING, message_id))
+        task = asyncio.get_running_loop().create_task(self._attempt(message_id, chat_id, text, options, attempts))
+        self._in_flight[message_id] = task
+        task.add_done_callback(lambda t: self._on_attempt_done(message_id))
+
+    def _on_attempt_done(self, message_id: int):
+        self._in_flight.pop(message_id, None)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _attempt(self, message_id: int, chat_id: int, text: str, options: str, attempts: int):
+        try:
+            await self._send_once(message_id, chat_id, text, options, attempts)
+        except Exception as error:
+            # Битые options, ошибка SQLite и прочее непредвиденное: запись не должна остаться в sending,
+            # иначе она навсегда задержит остальные сообщения этого чата
+            logging.exception(f"Unexpected error while delivering queued message {message_id} to chat {chat_id}")
+            try:
+                self._finish(message_id, DEAD, time.time(), attempts + 1, error)
+                self._report_dead_letter(message_id, chat_id, text, attempts + 1, error)
+            except Exception:
+                logging.exception(f"Failed to mark queued message {message_id} as dead")
+
+    async def _send_once(self, message_id: int, chat_id: int, text: str, options: str, attempts: int):
+        # Повторы 429 делает сама очередь, поэтому отправитель не ждет retry_after внутри
+        result: DeliveryResult = await self.sender.send(self._bot, chat_id, text, retries=0, **_load_options(options))
+        now = time.time()
+        error = result.error
+        if error is None:
+            self._finish(message_id, SENT, now)
+        elif isinstance(error, TelegramRetryAfter):
+            logging.warning(f"Flood limit for chat {chat_id}, queued message {message_id} retries in {error.retry_after}s")
+            self._retry(message_id, attempts, now + error.retry_after, error, now)
+        elif isinstance(error, _TRANSIENT_ERRORS) and attempts + 1 < self.max_attempts:
+            delay = backoff_delay(attempts + 1, self.max_backoff)
+            logging.warning(f"Failed to deliver queued message {message_id} to chat {chat_id} "
+                            f"(attempt {attempts + 1}), retrying in {delay:.1f}s: {error}")
+            self._retry(message_id, attempts + 1, now + delay, error, now)
+        else:
+            self._finish(message_id, DEAD, now, attempts + 1, error)
+            logging.error(f"Giving up on queued message {message_id} to chat {chat_id} after {attempts + 1} attempt(s): {error}")
+            self._report_dead_letter(message_id, chat_id, text, attempts + 1, error)
+
+    def _retry(self, message_id: int, attempts: int, due_at: float, error: Exception, now: float):
+        self._conn.execute(
+            "UPDATE outbox SET status = ?, attempts = ?, due_at = ?, updated_at = ?, last_error = ? WHERE id = ?",
+            (PENDING, attempts, due_at, now, f"{type(error).__name__}: {error}", message_id)
+        )
+
+    def _finish(self, message_id: int, status: str, now: float, attempts: Optional[int] = None, error: Optional[Exception] = None):
+        self._conn.execute(
+            "UPDATE outbox SET status = ?, attempts = COALESCE(?, attempts + 1), updated_at = ?, last_error = ? WHERE id = ?",
+            (status, attempts, now, f"{type(error).__name__}: {error}" if error else None, message_id)
+        )
+
+    def _prune(self, now: float):
+        self._conn.execute("DELETE FROM outbox WHERE status IN (?, ?) AND updated_at < ?", (SENT, DEAD, now - RETENTION))
+        self._pruned_at = now
+
+    def _report_dead_letter(self, message_id: int, chat_id: int, text: str, attempts: int, error: Exception):
+        if not Config.ADMIN_USER_ID or chat_id == Config.ADMIN_USER_ID:
+            # Недоставленное админу ему же не пересылаем, иначе очередь зациклится
+            return
+        preview = text if len(text) <= DEAD_LETTER_PREVIEW else text[:DEAD_LETTER_PREVIEW] + "…"
+        # HTML с экранированием: в тексте ошибки и исходного сообщения могут быть символы Markdown
+        self.enqueue(
+            self._bot, Config.ADMIN_USER_ID,
+            f"📭 Не удалось доставить сообщение в чат {chat_id} (попыток: {attempts}).\n"
+            f"Ошибка: {html.escape(f'{type(error).__name__}: {error}')}\n\n{html.escape(preview)}",
+            key=f"dead-letter:{message_id}", parse_mode="HTML"
+        )
+
+delivery = DurableOutbox()
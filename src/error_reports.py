@@ -0,0 +1,175 @@
+# src/error_reports.py
+
+import hashlib
+import html
+import os
+import time
+import traceback
+from collections import deque
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Deque, Dict, List, Optional
+
+from aiogram import Bot
+from aiogram.enums import ParseMode
+
+from configs.env_config import Config
+from src.delivery import delivery
+from src.scheduler import Timer, scheduler
+
+# Окно, в котором считается частота ошибки, секунды
+RATE_WINDOW = 60
+# Не чаще одного предупреждения о частоте на отпечаток за это время, секунды
+RATE_ALERT_COOLDOWN = 10 * 60
+# Сообщение Telegram ограничено 4096 символами; оставляем запас на разметку
+MAX_MESSAGE_LENGTH = 4000
+# Сколько последних строк трейсбека показывать в сводке на каждую ошибку
+DIGEST_TRACEBACK_LINES = 6
+DIGEST_MAX_FINGERPRINTS = 10
+
+# Кадры из установленных пакетов (aiogram, aiohttp) при поиске места ошибки пропускаются
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@dataclass(slots=True)
+class ErrorStats:
+    fingerprint: str
+    error_type: str
+    # "файл:функция" — самый глубокий кадр кода бота
+    location: str
+    total: int = 0
+    # Сколько раз случилась с прошлой сводки
+    since_digest: int = 0
+    first_seen: float = 0.0
+    last_seen: float = 0.0
+    last_traceback: str = ""
+    last_rate_alert: float = 0.0
+    # Моменты последних rate_threshold появлений: если первое из них не старше RATE_WINDOW — частота превышена
+    recent: Deque[float] = field(default_factory=deque)
+
+
+def _escape(text: str) -> str:
+    return html.escape(text, quote=False)
+
+
+def _location(exception: BaseException) -> str:
+    frames = traceback.extract_tb(exception.__traceback__)
+    own = [f for f in frames if f.filename.startswith(_PROJECT_ROOT) and "site-packages" not in f.filename]
+    if own:
+        return f"{os.path.relpath(own[-1].filename, _PROJECT_ROOT)}:{own[-1].name}"
+    if frames:
+        return f"{os.path.basename(frames[-1].filename)}:{frames[-1].name}"
+    return "?"
+
+
+def fingerprint(exception: BaseException) -> ErrorStats:
+    """Отпечаток ошибки: тип исключения и место в коде бота. Номер строки не входит — он меняется от правок."""
+    error_type = type(exception).__qualname__
+    location = _location(exception)
+    digest = hashlib.blake2b(f"{error_type}@{location}".encode(), digest_size=4).hexdigest()
+    return ErrorStats(fingerprint=digest, error_type=error_type, location=location)
+
+
+class ErrorReports:
+    """
+    Счетчики ошибок из хендлеров по отпечаткам вместо письма админу на каждое исключение.
+    Админ получает:
+      - полный трейсбек при первом появлении отпечатка;
+      - предупреждение, если отпечаток повторился rate_threshold раз за RATE_WINDOW секунд
+        (не чаще раза в RATE_ALERT_COOLDOWN);
+      - через digest_interval после первой новой ошибки — сводку со счетчиками и последним трейсбеком каждой.
+    Сообщения идут через очередь доставки (src/delivery.py) и не мешают рассылкам игр.
+    """
+
+    def __init__(self, rate_threshold: int = Config.ERROR_ALERT_RATE, digest_interval: float = Config.ERROR_DIGEST_INTERVAL):
+        self.rate_threshold = rate_threshold
+        self.digest_interval = digest_interval
+        self.stats: Dict[str, ErrorStats] = {}
+        self._digest_timer: Optional[Timer] = None
+        self._digest_period_started = time.time()
+
+    def record(self, bot: Bot, exception: BaseException, event_type: str, tb: str) -> ErrorStats:
+        now = time.time()
+        candidate = fingerprint(exception)
+        stats = self.stats.setdefault(candidate.fingerprint, candidate)
+        stats.total += 1
+        stats.since_digest += 1
+        stats.last_seen = now
+        stats.last_traceback = tb
+        stats.recent.append(now)
+        if len(stats.recent) > self.rate_threshold:
+            stats.recent.popleft()
+
+        if stats.total == 1:
+            stats.first_seen = now
+            self._alert_first(bot, stats, event_type)
+        elif (len(stats.recent) >= self.rate_threshold and now - stats.recent[0] <= RATE_WINDOW
+              and now - stats.last_rate_alert >= RATE_ALERT_COOLDOWN):
+            stats.last_rate_alert = now
+            self._alert_rate(bot, stats, now - stats.recent[0])
+
+        if self._digest_timer is None and self.digest_interval > 0:
+            self._digest_timer = scheduler.schedule(self.digest_interval, partial(self.send_digest, bot), kind="error_digest")
+        return stats
+
+    # --- СООБЩЕНИЯ АДМИНУ ---
+
+    def _send(self, bot: Bot, text: str):
+        if Config.ADMIN_USER_ID:
+            delivery.enqueue(bot, Config.ADMIN_USER_ID, text, parse_mode=ParseMode.HTML)
+
+    def _alert_first(self, bot: Bot, stats: ErrorStats, event_type: str):
+        tb = stats.last_traceback
+        header = (f"❗️ Новая ошибка в боте <b>#{stats.fingerprint}</b>\n\n"
+                  f"Тип апдейта: {_escape(event_type)}\n"
+                  f"Место: {_escape(stats.location)}\n\nTraceback:\n")
+        budget = MAX_MESSAGE_LENGTH - len(header) - len("<code></code>") - 30
+        escaped = _escape(tb)
+        if len(escaped) > budget:
+            # Режем исходный текст, а не экранированный, чтобы не разорвать сущность вроде &amp;
+            escaped = "... (Traceback урезан) ...\n" + _escape(tb[-(budget * len(tb) // len(escaped)):])
+        self._send(bot, f"{header}<code>{escaped}</code>")
+
+    def _alert_rate(self, bot: Bot, stats: ErrorStats, span: float):
+        self._send(bot, (
+            f"🔁 Ошибка <b>#{stats.fingerprint}</b> {_escape(stats.error_type)} в {_escape(stats.location)} "
+            f"повторилась {len(stats.recent)} раз за {span:.0f} с (всего {stats.total}).\n"
+            f"Следующее предупреждение — не раньше чем через {RATE_ALERT_COOLDOWN // 60} мин, подробности будут в сводке."
+        ))
+
+    def render_digest(self, now: float) -> Optional[str]:
+        fresh: List[ErrorStats] = sorted(
+            (s for s in self.stats.values() if s.since_digest), key=lambda s: s.since_digest, reverse=True
+        )
+        if not fresh:
+            return None
+        minutes = max(1, round((now - self._digest_period_started) / 60))
+        parts = [f"📊 Сводка ошибок за {minutes} мин: {sum(s.since_digest for s in fresh)} шт., отпечатков: {len(fresh)}"]
+        length = len(parts[0])
+        for stats in fresh[:DIGEST_MAX_FINGERPRINTS]:
+            tail = "\n".join(stats.last_traceback.rstrip().splitlines()[-DIGEST_TRACEBACK_LINES:])
+            part = (f"<b>#{stats.fingerprint}</b> {_escape(stats.error_type)} в {_escape(stats.location)}: "
+                    f"{stats.since_digest} (всего {stats.total})\n<code>{_escape(tail)}</code>")
+            if length + len(part) + 2 > MAX_MESSAGE_LENGTH:
+                # Трейсбек не влезает — оставляем хотя бы счетчик
+                part = part.split("\n", 1)[0]
+                if length + len(part) + 2 > MAX_MESSAGE_LENGTH:
+                    break
+            parts.append(part)
+            length += len(part) + 2
+        if len(fresh) > len(parts) - 1:
+            parts.append(f"…и еще {len(fresh) - (len(parts) - 1)}")
+        return "\n\n".join(parts)
+
+    async def send_digest(self, bot: Bot):
+        now = time.time()
+        self._digest_timer = None
+        text = self.render_digest(now)
+        for stats in self.stats.values():
+            stats.since_digest = 0
+        self._digest_period_started = now
+        if text:
+            self._send(bot, text)
+
+
+error_reports = ErrorReports()
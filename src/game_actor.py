@@ -0,0 +1,146 @@
+# src/game_actor.py
+
+import asyncio
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.types import CallbackQuery, Message, TelegramObject
+
+import src.game_state as state
+from src.keyboards import callback_chat_id
+
+# Сколько событий может ждать своей очереди в одной игре; дальше отправитель ждет (обратное давление)
+MAILBOX_SIZE = 256
+
+T = TypeVar("T")
+Job = Callable[[], Awaitable[Any]]
+
+
+class GameActor:
+    __slots__ = ("key", "mailbox", "consumer", "waiting")
+
+    def __init__(self, key: int, mailbox_size: int):
+        self.key = key
+        self.mailbox: "asyncio.Queue[Tuple[Job, asyncio.Future]]" = asyncio.Queue(mailbox_size)
+        self.consumer: Optional[asyncio.Task] = None
+        # Отправители, которые ждут места в полном ящике: пока они есть, обработчик не уходит
+        self.waiting = 0
+
+
+class GameActors:
+    """
+    Последовательная обработка событий каждой игры.
+    У игры свой почтовый ящик и одна задача-обработчик: хендлеры апдейтов и таймеры одной игры
+    выполняются строго по одному, поэтому между проверкой состояния и его изменением
+    (await запроса к Telegram посередине) другое событие той же игры вклиниться не может.
+    Разные игры обрабатываются параллельно. Обработчик живет, пока в ящике есть события:
+    простаивающие игры не держат ни задач, ни очередей.
+    """
+
+    def __init__(self, mailbox_size: int = MAILBOX_SIZE):
+        self.mailbox_size = mailbox_size
+        self.actors: Dict[int, GameActor] = {}
+        # Выключается только в бенчмарках — для сравнения с прежним поведением
+        self.enabled = True
+
+    async def run(self, key: int, job: Callable[[], Awaitable[T]]) -> T:
+        """Выполняет job в очереди игры key и возвращает его результат."""
+        actor = self.actors.get(key)
+        # Вложенный run из обработчика той же игры выполняется сразу, иначе он ждал бы сам себя.
+        # Проверяем саму задачу, а не contextvar: таймеры, взведенные внутри обработчика, наследуют его контекст
+        if not self.enabled or (actor is not None and asyncio.current_task() is actor.consumer):
+            return await job()
+        if actor is None:
+            actor = self.actors[key] = GameActor(key, self.mailbox_size)
+            actor.consumer = asyncio.get_running_loop().create_task(self._consume(actor))
+        future = asyncio.get_running_loop().create_future()
+        actor.waiting += 1
+        try:
+            await actor.mailbox.put((job, future))
+        finally:
+            actor.waiting -= 1
+        return await future
+
+    def queued(self) -> int:
+        return sum(actor.mailbox.qsize() for actor in self.actors.values())
+
+    async def _consume(self, actor: GameActor):
+        while True:
+            try:
+                job, future = actor.mailbox.get_nowait()
+            except asyncio.QueueEmpty:
+                if actor.waiting:
+                    # Отправитель, разбуженный освободившимся местом, положит событие на своем следующем шаге
+                    await asyncio.sleep(0)
+                    continue
+                # Между проверкой и удалением нет await: новое событие либо уже в ящике, либо создаст нового актера
+                del self.actors[actor.key]
+                return
+            if future.cancelled():
+                continue
+            try:
+                result = await job()
+            except asyncio.CancelledError:
+                if not asyncio.current_task().cancelling():
+                    # Отменилось что-то внутри самого события: это его результат, очередь игры живет дальше
+                    future.cancel()
+                    continue
+                # Обработчик остановлен (завершение процесса): ждущие в ящике события тоже отменяем
+                future.cancel()
+                self.actors.pop(actor.key, None)
+                while not actor.mailbox.empty():
+                    actor.mailbox.get_nowait()[1].cancel()
+                raise
+            except Exception as e:
+                if not future.cancelled():
+                    future.set_exception(e)
+            else:
+                if not future.cancelled():
+                    future.set_result(result)
+
+
+def actor_key(event: TelegramObject) -> int:
+    """
+    Игра, к которой относится апдейт. Групповые апдейты — по чату, кнопки сводки заявок, голосов
+    и заданий — по chat_id из callback_data, остальные личные — по игре пользователя. Пользователь вне игр получает собственную очередь.
+    """
+    if isinstance(event, CallbackQuery):
+        if event.message is not None and event.message.chat.id < 0:
+            return event.message.chat.id
+        data = event.data or ""
+        if data.startswith("digest_"):
+            return int(data.split("_")[2])
+        chat_id = callback_chat_id(data)
+        if chat_id is not None:
+            return chat_id
+        if data.startswith(("admin_approve_", "admin_reject_")):
+            user_id = int(data.rsplit("_", 1)[1])
+            game = state.find_game_by_pending(user_id) or state.find_game_by_player(user_id)
+            return game.chat_id if game is not None else user_id
+        user_id = event.from_user.id
+    elif isinstance(event, Message):
+        if event.chat.id < 0:
+            return event.chat.id
+        user_id = event.from_user.id if event.from_user else event.chat.id
+    else:
+        return 0
+    chat_id = state.chat_id_of_user(user_id)
+    return chat_id if chat_id is not None else user_id
+
+
+class GameActorMiddleware(BaseMiddleware):
+    """Внутренний middleware: хендлер, уже выбранный фильтрами, выполняется в очереди своей игры."""
+
+    async def __call__(self, handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                       event: TelegramObject, data: Dict[str, Any]) -> Any:
+        return await actors.run(actor_key(event), partial(handler, event, data))
+
+
+actors = GameActors()
+
+
+def setup_dispatcher(dp: Dispatcher):
+    middleware = GameActorMiddleware()
+    dp.message.middleware(middleware)
+    dp.callback_query.middleware(middleware)
@@ -1,17 +1,201 @@
-from typing import Dict, Optional
-from src.model.game import GameSession
+from typing import Callable, Dict, List, Optional, Set
+from src.model.game import GameSession, Player
+from src.persistence import GameJournal
+from src.scheduler import scheduler
 
 # {chat_id: GameSession}
 active_games: Dict[int, GameSession] = {}
 
+# --- ОБРАТНЫЕ ИНДЕКСЫ ---
+# Позволяют находить игру игрока без перебора всех сессий. Игрок может одновременно играть
+# в одной группе и подать заявку в лобби другой, поэтому у каждого пользователя — множество чатов.
+# {user_id: {chat_id}} — одобренные участники игры
+player_index: Dict[int, Set[int]] = {}
+# {user_id: {chat_id}} — заявки, ожидающие решения админа
+pending_index: Dict[int, Set[int]] = {}
+# {user_id: {chat_id}} — импостеры, которые еще не выбыли
+imposter_index: Dict[int, Set[int]] = {}
+
+# Подписчики на изменение принадлежности игрока к игре: callback(user_id, chat_id_of_user(user_id)).
+# Нужны, например, фронтовому процессу шардирования, чтобы маршрутизировать личные апдейты игрока.
+membership_listeners: List[Callable[[int, Optional[int]], None]] = []
+
+# Журнал для восстановления игр после перезапуска (None — игры живут только в памяти)
+journal: Optional[GameJournal] = None
+
+
 def get_game(chat_id: int) -> Optional[GameSession]:
     return active_games.get(chat_id)
 
-def create_game(chat_id: int) -> GameSession:
-    game = GameSession(chat_id=chat_id)
+def create_game(chat_id: int, chat_title: str = "") -> GameSession:
+    game = GameSession(chat_id=chat_id, chat_title=chat_title)
     active_games[chat_id] = game
+    save_game(game)
     return game
 
 def end_game(chat_id: int):
-    if chat_id in active_games:
-        del active_games[chat_id]
\ No newline at end of file
+    game = active_games.pop(chat_id, None)
+    if game is None:
+        return
+    if journal:
+        journal.record_end(chat_id)
+    # Дедлайны закончившейся игры больше не должны срабатывать
+    scheduler.cancel_group(chat_id)
+    # Удаляем записи индексов только если они указывают именно на эту игру
+    for user_id in game.pending_players:
+        _unindex(pending_index, user_id, chat_id)
+        _notify_membership(user_id)
+    for player in game.players:
+        _unindex(player_index, player.user_id, chat_id)
+        _unindex(imposter_index, player.user_id, chat_id)
+        _notify_membership(player.user_id)
+
+
+def save_game(game: GameSession):
+    """
+    Фиксирует текущее состояние игры в журнале. Вызывается после каждого изменения сессии.
+    Здесь игра только сериализуется; запись на диск и свертка снимка — в потоке журнала.
+    """
+    if journal is None or game.chat_id not in active_games:
+        return
+    journal.record_game(game)
+
+def restore_games(game_journal: GameJournal) -> int:
+    """Загружает игры из журнала, перестраивает индексы и подключает журнал. Возвращает число игр."""
+    global journal
+    journal = game_journal
+    for game in journal.load().values():
+        active_games[game.chat_id] = game
+        for user_id in game.pending_players:
+            _index(pending_index, user_id, game.chat_id)
+        for player in game.players:
+            _index(player_index, player.user_id, game.chat_id)
+        for user_id in game.imposter_ids:
+            _index(imposter_index, user_id, game.chat_id)
+    for game in active_games.values():
+        for user_id in game.pending_players:
+            _notify_membership(user_id)
+        for player in game.players:
+            _notify_membership(player.user_id)
+    # Сразу сворачиваем журнал: после этого в нем нет хвоста, недописанного при падении
+    journal.compact(active_games.values())
+    return len(active_games)
+
+
+def _notify_membership(user_id: int):
+    if not membership_listeners:
+        return
+    chat_id = chat_id_of_user(user_id)
+    for listener in membership_listeners:
+        listener(user_id, chat_id)
+
+def _index(index: Dict[int, Set[int]], user_id: int, chat_id: int):
+    index.setdefault(user_id, set()).add(chat_id)
+
+def _unindex(index: Dict[int, Set[int]], user_id: int, chat_id: int):
+    chat_ids = index.get(user_id)
+    if chat_ids is None:
+        return
+    chat_ids.discard(chat_id)
+    if not chat_ids:
+        del index[user_id]
+
+
+# --- ПОИСК ИГРЫ ПО ИГРОКУ ---
+
+def _find(index: Dict[int, Set[int]], user_id: int) -> Optional[GameSession]:
+    """Игра пользователя из индекса; идущая игра важнее лобби, в котором он ждет следующую."""
+    found = None
+    for chat_id in index.get(user_id, ()):
+        game = active_games.get(chat_id)
+        if game is None:
+            continue
+        if game.status == "in_progress":
+            return game
+        found = found or game
+    return found
+
+def find_game_by_player(user_id: int) -> Optional[GameSession]:
+    return _find(player_index, user_id)
+
+def find_game_by_pending(user_id: int) -> Optional[GameSession]:
+    return _find(pending_index, user_id)
+
+def find_game_by_imposter(user_id: int) -> Optional[GameSession]:
+    return _find(imposter_index, user_id)
+
+def chat_id_of_user(user_id: int) -> Optional[int]:
+    """Чат, которому принадлежат личные апдейты пользователя: его идущая игра, затем лобби, затем заявка."""
+    game = find_game_by_player(user_id) or find_game_by_pending(user_id)
+    return game.chat_id if game is not None else None
+
+
+# --- ИЗМЕНЕНИЯ СОСТАВА, ПОДДЕРЖИВАЮЩИЕ ИНДЕКСЫ ---
+
+def add_pending_player(game: GameSession, user_id: int, username: Optional[str], full_name: str):
+    game.pending_players[user_id] = {"username": username, "full_name": full_name, "selected": True}
+    _index(pending_index, user_id, game.chat_id)
+    _notify_membership(user_id)
+    save_game(game)
+
+def _admit(game: GameSession, user_id: int) -> Player:
+    user_data = game.pending_players.pop(user_id)
+    _unindex(pending_index, user_id, game.chat_id)
+    player = Player(user_id=user_id, username=user_data["username"], full_name=user_data["full_name"])
+    game.add_player(player)
+    _index(player_index, user_id, game.chat_id)
+    _notify_membership(user_id)
+    return player
+
+def _refuse(game: GameSession, user_id: int) -> dict:
+    user_data = game.pending_players.pop(user_id)
+    _unindex(pending_index, user_id, game.chat_id)
+    _notify_membership(user_id)
+    return user_data
+
+def approve_pending_player(game: GameSession, user_id: int) -> Player:
+    player = _admit(game, user_id)
+    game.roster_version += 1
+    save_game(game)
+    return player
+
+def approve_pending_players(game: GameSession, user_ids: List[int]) -> List[Player]:
+    """Одобряет пачку заявок за одно изменение: одна запись в журнал и одна новая версия состава."""
+    players = [_admit(game, user_id) for user_id in user_ids if user_id in game.pending_players]
+    if players:
+        game.roster_version += 1
+        save_game(game)
+    return players
+
+def reject_pending_player(game: GameSession, user_id: int) -> dict:
+    user_data = _refuse(game, user_id)
+    save_game(game)
+    return user_data
+
+def reject_pending_players(game: GameSession, user_ids: List[int]) -> List[dict]:
+    rejected = [_refuse(game, user_id) for user_id in user_ids if user_id in game.pending_players]
+    if rejected:
+        save_game(game)
+    return rejected
+
+def toggle_pending_player(game: GameSession, user_id: int) -> bool:
+    """Переключает отметку заявки в сводке. Возвращает новое состояние отметки."""
+    user_data = game.pending_players[user_id]
+    user_data["selected"] = not user_data.get("selected", True)
+    save_game(game)
+    return user_data["selected"]
+
+def start_game(game: GameSession):
+    game.start_game()
+    for user_id in game.imposter_ids:
+        _index(imposter_index, user_id, game.chat_id)
+    for player in game.players:
+        # Идущая игра теперь важнее лобби, куда игрок мог подать заявку
+        _notify_membership(player.user_id)
+    save_game(game)
+
+def vote_out_imposter(game: GameSession, user_id: int):
+    game.vote_out(user_id)
+    game.roster_version += 1
+    _unindex(imposter_index, user_id, game.chat_id)
+    save_game(game)
@@ -1,31 +1,42 @@
 # src/handlers.py (исправленная версия)
 
+import asyncio
 import logging
-import re
 from collections import Counter
+from typing import Optional
 from aiogram import Router, F, Bot
 from aiogram.types import Message, CallbackQuery
 from aiogram.filters import Command
 
 from configs.env_config import Config
 import src.game_state as state
-from src.model.game import Player, GameSession
+from src.model.game import GameSession
 from src.keyboards import (
+    callback_chat_id,
     create_lobby_keyboard,
-    create_admin_approval_keyboard,
     create_imposter_task_keyboard,
-    create_vote_keyboard
+    create_vote_keyboard,
+    parse_vote_data
 )
 from aiogram.exceptions import TelegramBadRequest
-import asyncio
+import time
+from functools import partial
 from aiogram.filters import CommandObject
 import src.task_manager as tm
-
-# --- НОВАЯ ВСПОМОГАТЕЛЬНАЯ ФУНКЦИЯ ---
-def escape_markdown(text: str) -> str:
-    """Экранирует специальные символы Markdown V1."""
-    # Экранируем _, *, `, [
-    return re.sub(r'([_*`\[])', r'\\\1', text)
+from src.broadcaster import broadcaster, OutgoingMessage
+from src.scheduler import scheduler
+from src import render
+from src.render import escape_markdown
+from src.approvals import ADMIN_UNREACHABLE, admin_unreachable, schedule_digest, flush_digest
+from src.outbox import outbox
+from src.delivery import delivery
+from src.game_actor import actors
+from src.history import history
+
+# Длительность голосования в секундах
+VOTE_DURATION = 300
+# Через сколько секунд удалять служебные подсказки в групповом чате
+HINT_TTL = 5
 
 # --- ИНИЦИАЛИЗАЦИЯ РОУТЕРОВ ---
 admin_router = Router()
@@ -35,6 +46,37 @@ admin_router.callback_query.filter(F.from_user.id == Config.ADMIN_USER_ID)
 player_router = Router()
 
 
+def send_task_to_imposters(bot: Bot, game: GameSession, text: str, keyboard, reason: str):
+    """
+    Рассылает задание живым импостерам через очередь с повторами (src/delivery.py):
+    из-за 429 или сбоя сети импостеры не должны остаться без следующего задания.
+    Ключ — игра, номер задания и повод, поэтому повторно обработанный апдейт не задублирует рассылку.
+    """
+    task_number = game.task_cursor.drawn if game.task_cursor else 0
+    for imposter_id in game.imposter_ids:
+        delivery.enqueue(
+            bot, imposter_id, text, key=f"task:{game.chat_id}:{game.started_at}:{task_number}:{reason}:{imposter_id}",
+            reply_markup=keyboard
+        )
+
+
+def post_to_chat(message: Message, text: str, **kwargs) -> asyncio.Future:
+    """
+    Ответ в чат игры через outbox (src/outbox.py), а не message.answer: прямая отправка обогнала бы
+    итоги и объявления, которые еще ждут окна склейки в очереди этого чата.
+    """
+    return outbox.post(message.bot, message.chat.id, text, **kwargs)
+
+
+async def finish_game(game: GameSession, bot: Bot, headline: str, winner: str, reason: str):
+    """Финал игры: итог уходит в группу сразу вместе со всем, что накопилось в outbox чата, игра попадает в историю и удаляется."""
+    outbox.post(bot, game.chat_id, render.game_over(game, headline))
+    # Доставки не ждем: лимит частоты на группу не должен держать очередь игры
+    outbox.flush_nowait(game.chat_id)
+    history.record("game_over", game, outcome=winner, detail=reason)
+    state.end_game(game.chat_id)
+
+
 # ---------------------------------------------------------------------
 # --- АДМИНСКИЙ БЛОК: УПРАВЛЕНИЕ ИГРОЙ ---
 # ---------------------------------------------------------------------
@@ -47,11 +89,12 @@ async def new_game_handler(message: Message):
     # ... (остальной код функции без изменений)
     chat_id = message.chat.id
     if state.get_game(chat_id):
-        await message.answer("Игра в этом чате уже идет. Завершите ее командой /stop_game перед началом новой")
+        post_to_chat(message, "Игра в этом чате уже идет. Завершите ее командой /stop_game перед началом новой")
         return
-    game = state.create_game(chat_id)
+    game = state.create_game(chat_id, message.chat.title or "")
     logging.info(f"New game created in chat {chat_id}")
-    await message.answer(
+    post_to_chat(
+        message,
         "Начинаем новую игру! Кто хочет испытать свою интуицию?\n"
         "Нажмите кнопку ниже, чтобы подать заявку на участие.",
         reply_markup=create_lobby_keyboard()
@@ -63,52 +106,47 @@ async def start_game_handler(message: Message, bot: Bot):
     chat_id = message.chat.id
     game = state.get_game(chat_id)
     if not game or game.status != "lobby":
-        await message.answer("Нет активного лобби для старта игры. Создайте его командой /new_game.")
+        post_to_chat(message, "Нет активного лобби для старта игры. Создайте его командой /new_game.")
         return
     
     if len(game.players) < 1:
-        await message.answer(f"Недостаточно игроков для начала. Нужно минимум 1, сейчас {len(game.players)}.")
+        post_to_chat(message, f"Недостаточно игроков для начала. Нужно минимум 1, сейчас {len(game.players)}.")
         return
         
-    game.start_game()
+    state.start_game(game)
     game.assign_imposter_task()
+    state.save_game(game)
+    history.record("game_started", game, value=game.votes_total)
     
-    num_imposters = len(game.imposter_ids)
+    num_imposters = game.imposters_count()
     # ИСПРАВЛЕНИЕ: Используем imposter_ids вместо imposter_id
     logging.info(f"Game started in chat {chat_id}. Imposters ({num_imposters}): {game.imposter_ids}")
     
-    await message.answer(
-        f"Игра началась! Среди вас **{num_imposters}** импостера(-ов).\n"
-        f"У вас есть {game.votes_total} попыток на голосование. Удачи!"
-    )
+    post_to_chat(message, render.game_started(game))
+
+    imposter_keyboard = create_imposter_task_keyboard(game.chat_id, can_skip=True)
+    role_messages = [
+        OutgoingMessage(
+            player.user_id,
+            render.role_message(game, player),
+            {"reply_markup": imposter_keyboard} if player.role == "imposter" else {}
+        )
+        for player in game.players
+    ]
 
-    for player in game.players:
-        try:
-            if player.role == "imposter":
-                teammates = [p.full_name for p in game.players if p.user_id in game.imposter_ids and p.user_id != player.user_id]
-                teammates_text = f"\nВаши напарники: **{', '.join(teammates)}**." if teammates else ""
-                
-                await bot.send_message(
-                    player.user_id,
-                    f"🤫 Ты — Импостер! Твоя цель — выполнить {game.TASKS_TO_WIN} задания вместе с командой.{teammates_text}\n\n"
-                    f"Ваше общее задание: **{escape_markdown(game.current_imposter_task)}**\n\n"
-                    f"У тебя есть {game.imposter_task_skips_left} возможность сменить задание.",
-                    reply_markup=create_imposter_task_keyboard(can_skip=True)
-                )
-            else:
-                await bot.send_message(
-                    player.user_id,
-                    f"👥 Ты — член экипажа. Ваша цель — вычислить **{num_imposters}** импостера(-ов).\n"
-                    f"У вас есть {game.votes_total} попыток на голосование. Используйте их с умом!"
-                )
-        except Exception as e:
-            logging.error(f"Failed to send message to user {player.user_id}: {e}")
-            await message.answer(f"⚠️ Не удалось отправить сообщение игроку {escape_markdown(player.full_name)}. Убедитесь, что он запустил бота в ЛС")
+    results = await broadcaster.broadcast(bot, role_messages)
+    for player, result in zip(game.players, results):
+        if not result.ok:
+            logging.error(f"Failed to send message to user {player.user_id}: {result.error}")
+            post_to_chat(message, f"⚠️ Не удалось отправить сообщение игроку {render.player_name(game, player)}. Убедитесь, что он запустил бота в ЛС")
 
 @admin_router.message(Command("stop_game"))
 async def stop_game_handler(message: Message):
+    game = state.get_game(message.chat.id)
+    if game and game.status == "in_progress":
+        history.record("game_over", game, outcome="stopped", detail="stopped")
     state.end_game(message.chat.id)
-    await message.answer("Игра принудительно завершена")
+    post_to_chat(message, "Игра принудительно завершена")
 
 
 @admin_router.message(Command("player_list"))
@@ -119,7 +157,7 @@ async def player_list_handler(message: Message, bot: Bot):
         return
     
     # ИЗМЕНЕНИЕ: Экранируем имена игроков
-    player_lines = [f"- ID: {p.user_id}, Имя: {escape_markdown(p.full_name)}" for p in game.players]
+    player_lines = [f"- ID: {p.user_id}, Имя: {render.player_name(game, p)}" for p in game.players]
     player_text = "\n".join(player_lines) if player_lines else "В лобби пока пусто"
     
     try:
@@ -132,42 +170,89 @@ async def player_list_handler(message: Message, bot: Bot):
         await message.answer("Не могу отправить вам личное сообщение. Пожалуйста, начните диалог с ботом")
 
 
+# --- СВОДКА ЗАЯВОК ---
+# Заявки копятся в одном сообщении у админа (src/approvals.py). Кнопки сводки: digest_<действие>_<chat_id>[_<user_id>]
+
+async def _digest_game(query: CallbackQuery) -> Optional[GameSession]:
+    game = state.get_game(int(query.data.split("_")[2]))
+    if not game or game.status != "lobby":
+        await query.answer("Набор в эту игру уже закрыт", show_alert=True)
+        try:
+            await query.message.edit_reply_markup(reply_markup=None)
+        except TelegramBadRequest:
+            pass
+        return None
+    # Админ нажал кнопку именно этого сообщения — его и правим дальше
+    game.approval_message_id = query.message.message_id
+    return game
+
+
+@admin_router.callback_query(F.data.startswith("digest_toggle_"))
+async def digest_toggle_callback(query: CallbackQuery, bot: Bot):
+    game = await _digest_game(query)
+    if not game:
+        return
+    user_id = int(query.data.split("_")[3])
+    if user_id not in game.pending_players:
+        await query.answer("Эта заявка уже разобрана")
+    else:
+        state.toggle_pending_player(game, user_id)
+        await query.answer()
+    await flush_digest(game.chat_id, bot)
+
+
+@admin_router.callback_query(F.data.startswith(("digest_approve_", "digest_all_")))
+async def digest_approve_callback(query: CallbackQuery, bot: Bot):
+    game = await _digest_game(query)
+    if not game:
+        return
+    approve_all = query.data.startswith("digest_all_")
+    user_ids = [uid for uid, data in game.pending_players.items() if approve_all or data.get("selected", True)]
+    new_players = state.approve_pending_players(game, user_ids)
+    await query.answer(f"Одобрено заявок: {len(new_players)}")
+    await flush_digest(game.chat_id, bot)
+    if new_players:
+        # Одно объявление в группу на всю пачку вместо сообщения на каждого игрока
+        outbox.post(bot, game.chat_id, render.players_joined(game, new_players))
+
+
+@admin_router.callback_query(F.data.startswith("digest_reject_"))
+async def digest_reject_callback(query: CallbackQuery, bot: Bot):
+    game = await _digest_game(query)
+    if not game:
+        return
+    user_ids = [uid for uid, data in game.pending_players.items() if data.get("selected", True)]
+    rejected = state.reject_pending_players(game, user_ids)
+    await query.answer(f"Отклонено заявок: {len(rejected)}")
+    await flush_digest(game.chat_id, bot)
+
+
+# Одиночные кнопки одобрения из сообщений, отправленных до появления сводки
 @admin_router.callback_query(F.data.startswith("admin_approve_"))
 async def admin_approve_callback(query: CallbackQuery, bot: Bot):
     # ... (код функции до отправки сообщения в группу без изменений)
     target_user_id = int(query.data.split("_")[2])
-    game_to_update = None
-    for chat_id, game in state.active_games.items():
-        if target_user_id in game.pending_players:
-            game_to_update = game
-            break
+    game_to_update = state.find_game_by_pending(target_user_id)
     if not game_to_update:
         await query.message.edit_text("Не удалось найти игру для этого игрока. Возможно, она была отменена")
         return
 
-    user_data = game_to_update.pending_players.pop(target_user_id)
-    new_player = Player(user_id=target_user_id, **user_data)
-    game_to_update.players.append(new_player)
-    # ИЗМЕНЕНИЕ: Экранируем имя одобренного пользователя
-    await query.message.edit_text(f"Вы одобрили заявку от {escape_markdown(user_data['full_name'])}.")
-    # ИЗМЕНЕНИЕ: Экранируем имена всех игроков в списке
-    player_names = [escape_markdown(p.full_name) for p in game_to_update.players]
-    try:
-        await bot.send_message(game_to_update.chat_id, f"✅ {escape_markdown(new_player.full_name)} присоединяется к игре!\n**Текущий список игроков ({len(player_names)}):** {', '.join(player_names)}")
-    except Exception as e:
-        logging.warning(f"Could not update lobby message in {game_to_update.chat_id}: {e}")
+    new_player = state.approve_pending_player(game_to_update, target_user_id)
+    # Имена экранируются один раз при вступлении, список игроков дописывается инкрементально (src/render.py)
+    await query.message.edit_text(f"Вы одобрили заявку от {render.player_name(game_to_update, new_player)}.")
+    outbox.post(bot, game_to_update.chat_id, render.player_joined(game_to_update, new_player))
 
 
 @admin_router.callback_query(F.data.startswith("admin_reject_"))
 async def admin_reject_callback(query: CallbackQuery):
     # ... (код до изменения текста без изменений)
     target_user_id = int(query.data.split("_")[2])
-    for game in state.active_games.values():
-        if target_user_id in game.pending_players:
-            user_data = game.pending_players.pop(target_user_id)
-            # ИЗМЕНЕНИЕ: Экранируем имя отклоненного пользователя
-            await query.message.edit_text(f"Вы отклонили заявку от {escape_markdown(user_data['full_name'])}.")
-            return
+    game = state.find_game_by_pending(target_user_id)
+    if game:
+        user_data = state.reject_pending_player(game, target_user_id)
+        # ИЗМЕНЕНИЕ: Экранируем имя отклоненного пользователя
+        await query.message.edit_text(f"Вы отклонили заявку от {escape_markdown(user_data['full_name'])}.")
+        return
     await query.message.edit_text("Не удалось найти этого игрока в заявках")
 
 
@@ -189,11 +274,13 @@ async def add_task_score_handler(message: Message):
     """Увеличивает счет выполненных заданий импостера на 1."""
     game = state.get_game(message.chat.id)
     if not game or game.status != "in_progress":
-        await message.answer("Нет активной игры для изменения")
+        post_to_chat(message, "Нет активной игры для изменения")
         return
     
     game.tasks_completed += 1
-    await message.answer(
+    state.save_game(game)
+    post_to_chat(
+        message,
         f"✅ Команда администратора: счет заданий импостеров увеличен\n"
         f"Текущий счет: {game.tasks_completed}/{game.TASKS_TO_WIN}"
     )
@@ -203,13 +290,15 @@ async def remove_task_score_handler(message: Message):
     """Уменьшает счет выполненных заданий импостера на 1."""
     game = state.get_game(message.chat.id)
     if not game or game.status != "in_progress":
-        await message.answer("Нет активной игры для изменения")
+        post_to_chat(message, "Нет активной игры для изменения")
         return
     
     if game.tasks_completed > 0:
         game.tasks_completed -= 1
+        state.save_game(game)
     
-    await message.answer(
+    post_to_chat(
+        message,
         f"✅ Команда администратора: счет заданий импостеров уменьшен\n"
         f"Текущий счет: {game.tasks_completed}/{game.TASKS_TO_WIN}"
     )
@@ -219,11 +308,13 @@ async def add_vote_handler(message: Message):
     """Добавляет 1 попытку для голосования."""
     game = state.get_game(message.chat.id)
     if not game or game.status != "in_progress":
-        await message.answer("Нет активной игры для изменения")
+        post_to_chat(message, "Нет активной игры для изменения")
         return
         
     game.votes_total += 1
-    await message.answer(
+    state.save_game(game)
+    post_to_chat(
+        message,
         f"✅ Команда администратора: количество попыток голосования увеличено\n"
         f"Текущее количество: {game.votes_total}"
     )
@@ -233,13 +324,15 @@ async def remove_vote_handler(message: Message):
     """Убирает 1 попытку для голосования."""
     game = state.get_game(message.chat.id)
     if not game or game.status != "in_progress":
-        await message.answer("Нет активной игры для изменения")
+        post_to_chat(message, "Нет активной игры для изменения")
         return
     
     if game.votes_total > 0:
         game.votes_total -= 1
+        state.save_game(game)
         
-    await message.answer(
+    post_to_chat(
+        message,
         f"✅ Команда администратора: количество попыток голосования уменьшено\n"
         f"Текущее количество: {game.votes_total}"
     )
@@ -249,30 +342,27 @@ async def resend_task_handler(message: Message, bot: Bot):
     """Принудительно отправляет новое задание импостерам."""
     game = state.get_game(message.chat.id)
     if not game or game.status != "in_progress":
-        await message.answer("Нет активной игры.")
+        post_to_chat(message, "Нет активной игры.")
         return
         
     # ИСПРАВЛЕНИЕ: Используем imposter_ids вместо imposter_id
-    if not game.imposter_ids:
-        await message.answer("Ошибка: в игре еще не назначены импостеры.")
+    if not game.imposter_mask:
+        post_to_chat(message, "Ошибка: в игре еще не назначены импостеры.")
         return
         
     new_task = game.assign_imposter_task()
+    state.save_game(game)
     if new_task:
-        for imposter_id in game.imposter_ids:
-            try:
-                await bot.send_message(
-                    imposter_id,
-                    f"⚙️ **(Команда администратора)**\nВам выдано новое общее задание:\n"
-                    f"**{escape_markdown(new_task)}**",
-                    reply_markup=create_imposter_task_keyboard(can_skip=game.imposter_task_skips_left > 0)
-                )
-            except Exception as e:
-                logging.error(f"Admin command /resend_task failed to send PM to {imposter_id}: {e}")
+        task_text = (
+            f"⚙️ **(Команда администратора)**\nВам выдано новое общее задание:\n"
+            f"**{escape_markdown(new_task)}**"
+        )
+        keyboard = create_imposter_task_keyboard(game.chat_id, can_skip=game.imposter_task_skips_left > 0)
+        send_task_to_imposters(bot, game, task_text, keyboard, reason=f"resend{message.message_id}")
         
-        await message.answer("✅ Команда администратора: импостерам отправлено новое задание.")
+        post_to_chat(message, "✅ Команда администратора: импостерам отправлено новое задание.")
     else:
-        await message.answer("Не удалось выдать новое задание (возможно, они закончились).")
+        post_to_chat(message, "Не удалось выдать новое задание (возможно, они закончились).")
 
 # --- УПРАВЛЕНИЕ ЗАДАНИЯМИ ---
 
@@ -286,12 +376,11 @@ async def view_production_tasks(message: Message, bot: Bot):
         
         # Отправляем временное сообщение в чат с подсказкой
         confirm_msg = await message.answer("Команда доступна только для админа")
-        await asyncio.sleep(5)
-        await confirm_msg.delete()
+        scheduler.schedule(HINT_TTL, confirm_msg.delete, kind="delete_message")
         return
 
     # Если команда в ЛС, отправляем список
-    tasks = tm.get_production_tasks()
+    tasks = await tm.aget_production_tasks()
     text = "📝 **Чистовые задания (в игре):**\n\n"
     if not tasks:
         text += "Список пуст."
@@ -311,12 +400,11 @@ async def view_backlog_tasks(message: Message, bot: Bot):
             logging.warning("Не удалось удалить сообщение, недостаточно прав в чате.")
             
         confirm_msg = await message.answer("Команда доступна только для админа")
-        await asyncio.sleep(5)
-        await confirm_msg.delete()
+        scheduler.schedule(HINT_TTL, confirm_msg.delete, kind="delete_message")
         return
 
     # Если команда в ЛС, отправляем список
-    tasks = tm.get_backlog_tasks()
+    tasks = await tm.aget_backlog_tasks()
     text = "📋 **Черновики заданий (бэклог):**\n\n"
     if not tasks:
         text += "Список пуст."
@@ -337,57 +425,97 @@ async def add_task_command(message: Message, command: CommandObject):
         await message.answer("Пожалуйста, укажите текст задания после команды.\nПример: `/add_task Спеть песню`")
         return
     
-    tm.add_task_to_backlog(task_text)
+    await tm.aadd_task_to_backlog(task_text)
     await message.answer(f"✅ Задание \"{task_text}\" добавлено в черновики.")
 
 
+def _task_index(command: CommandObject) -> Optional[int]:
+    """Номер задания из аргумента команды (нумерация с 1) -> индекс в списке; None, если номер не указан."""
+    if command.args is None:
+        return None
+    try:
+        return int(command.args) - 1
+    except ValueError:
+        return None
+
+
 @admin_router.message(Command("move_to_prod"))
 async def move_to_prod_handler(message: Message, command: CommandObject):
     if message.chat.type != "private":
         await message.answer("Команда доступна только для админа")
         return
-    try:
-        task_index = int(command.args) - 1
-        tm.move_task('backlog', task_index)
-        await message.answer(f"✅ Задание #{task_index + 1} из черновика перемещено в игру.")
-    except (TypeError, ValueError):
+    task_index = _task_index(command)
+    if task_index is None:
         await message.answer("Пожалуйста, укажите номер задания.\nПример: `/move_to_prod 3`")
+        return
+    if not await tm.amove_task('backlog', task_index):
+        await message.answer(f"Задание #{task_index + 1} не найдено. Проверьте номер в списке.")
+        return
+    await message.answer(f"✅ Задание #{task_index + 1} из черновика перемещено в игру.")
 
 @admin_router.message(Command("move_to_backlog"))
 async def move_to_backlog_handler(message: Message, command: CommandObject):
     if message.chat.type != "private":
         await message.answer("Команда доступна только для админа")
         return
-    try:
-        task_index = int(command.args) - 1
-        tm.move_task('prod', task_index)
-        await message.answer(f"✅ Задание #{task_index + 1} из игры перемещено в черновик.")
-    except (TypeError, ValueError):
+    task_index = _task_index(command)
+    if task_index is None:
         await message.answer("Пожалуйста, укажите номер задания.\nПример: `/move_to_backlog 5`")
+        return
+    if not await tm.amove_task('prod', task_index):
+        await message.answer(f"Задание #{task_index + 1} не найдено. Проверьте номер в списке.")
+        return
+    await message.answer(f"✅ Задание #{task_index + 1} из игры перемещено в черновик.")
 
 @admin_router.message(Command("delete_prod"))
 async def delete_prod_handler(message: Message, command: CommandObject):
     if message.chat.type != "private":
         await message.answer("Команда доступна только для админа")
         return
-    try:
-        task_index = int(command.args) - 1
-        tm.delete_task('prod', task_index)
-        await message.answer(f"❌ Задание #{task_index + 1} из игрового списка удалено.")
-    except (TypeError, ValueError):
+    task_index = _task_index(command)
+    if task_index is None:
         await message.answer("Пожалуйста, укажите номер задания.\nПример: `/delete_prod 2`")
+        return
+    if not await tm.adelete_task('prod', task_index):
+        await message.answer(f"Задание #{task_index + 1} не найдено. Проверьте номер в списке.")
+        return
+    await message.answer(f"❌ Задание #{task_index + 1} из игрового списка удалено.")
 
 @admin_router.message(Command("delete_backlog"))
 async def delete_backlog_handler(message: Message, command: CommandObject):
     if message.chat.type != "private":
         await message.answer("Команда доступна только для админа")
         return
-    try:
-        task_index = int(command.args) - 1
-        tm.delete_task('backlog', task_index)
-        await message.answer(f"❌ Задание #{task_index + 1} из черновика удалено.")
-    except (TypeError, ValueError):
+    task_index = _task_index(command)
+    if task_index is None:
         await message.answer("Пожалуйста, укажите номер задания.\nПример: `/delete_backlog 1`")
+        return
+    if not await tm.adelete_task('backlog', task_index):
+        await message.answer(f"Задание #{task_index + 1} не найдено. Проверьте номер в списке.")
+        return
+    await message.answer(f"❌ Задание #{task_index + 1} из черновика удалено.")
+
+
+# --- СТАТИСТИКА ---
+
+def _stats_report(history_dir: str) -> str:
+    # pandas импортируется здесь, в потоке, а не при старте бота
+    from src.analytics import report
+    return report(history_dir)
+
+@admin_router.message(Command("stats"))
+async def stats_handler(message: Message):
+    """Сводка по сыгранным играм из журнала событий. Считается в отдельном потоке."""
+    if message.chat.type != "private":
+        await message.answer("Команда доступна только для админа")
+        return
+    history.flush()
+    try:
+        text = await asyncio.to_thread(_stats_report, Config.HISTORY_DIR)
+    except ImportError:
+        logging.exception("Game history analytics are unavailable")
+        text = "Статистика недоступна: не установлены зависимости бота (pandas, pyarrow)"
+    await message.answer(text)
 
 
 # ---------------------------------------------------------------------
@@ -406,39 +534,40 @@ async def apply_to_join_callback(query: CallbackQuery, bot: Bot):
     if game.get_player(user.id) or user.id in game.pending_players:
         await query.answer("Вы уже в списке или ваша заявка на рассмотрении.", show_alert=True)
         return
-    game.pending_players[user.id] = {"username": user.username, "full_name": user.full_name}
-    
-    try:
-        # ИЗМЕНЕНИЕ: Экранируем все пользовательские данные
-        user_full_name = escape_markdown(user.full_name)
-        username = escape_markdown(user.username or "")
-        chat_title = escape_markdown(query.message.chat.title)
-        
-        await bot.send_message(
-            Config.ADMIN_USER_ID,
-            f"Пользователь {user_full_name} (@{username}) хочет присоединиться к игре в чате '{chat_title}'.",
-            reply_markup=create_admin_approval_keyboard(user.id, user.username)
-        )
-        await query.answer("Ваша заявка отправлена администратору.", show_alert=False)
-    except Exception as e:
-        logging.error(f"Failed to send approval request to admin: {e}")
-        await query.answer("Не удалось связаться с админом. Попросите его проверить ЛС с ботом.", show_alert=True)
+    state.add_pending_player(game, user.id, user.username, user.full_name)
+    if not game.chat_title and query.message.chat.title:
+        game.chat_title = query.message.chat.title
+    if admin_unreachable(chat_id):
+        # Прошлая сводка до админа не дошла: отправляем сразу, чтобы честно ответить игроку
+        if not await flush_digest(chat_id, bot):
+            await query.answer(ADMIN_UNREACHABLE, show_alert=True)
+            return
+    else:
+        # Админ получит одну сводку на всю пачку заявок, а не сообщение на каждую
+        schedule_digest(game, bot)
+    await query.answer("Ваша заявка отправлена администратору.", show_alert=False)
 
 
-@player_router.callback_query(F.data.in_({"task_done", "task_skip"}), F.message.chat.type == "private")
+@player_router.callback_query(F.data.startswith(("task_done", "task_skip")), F.message.chat.type == "private")
 async def imposter_actions_callback(query: CallbackQuery, bot: Bot):
     user_id = query.from_user.id
-    # Используем imposter_ids для поиска
-    game = next((g for g in state.active_games.values() if user_id in g.imposter_ids and g.status == "in_progress"), None)
+    action = query.data[:len("task_done")]
+    # Игра — из callback_data; у кнопок старого формата — по индексу живых импостеров
+    chat_id = callback_chat_id(query.data)
+    game = state.get_game(chat_id) if chat_id is not None else state.find_game_by_imposter(user_id)
 
-    if not game:
+    if not game or game.status != "in_progress" or not game.is_imposter(user_id):
         await query.answer("Это действие сейчас неактивно", show_alert=True)
         return
 
-    if query.data == "task_done":
+    if action == "task_done":
+        history.record("task_done", game, user_id=user_id, task=game.current_imposter_task)
+        # Вес задания меняется сразу, запись в базу — в фоне: ответ игроку ее не ждет
+        tm.record_task_result(game.current_imposter_task, done=True)
         # Добавляем задание в историю в момент его выполнения
         game.imposter_tasks_history.append(game.current_imposter_task)
         game.complete_task()
+        state.save_game(game)
         try:
             await query.message.edit_text(f"✅ Задание принято. Выполнено: {game.tasks_completed}/{game.TASKS_TO_WIN}")
         except TelegramBadRequest:
@@ -447,40 +576,30 @@ async def imposter_actions_callback(query: CallbackQuery, bot: Bot):
         await query.answer("Задание принято!")
 
         if game.tasks_completed >= game.TASKS_TO_WIN:
-            imposter_names = [escape_markdown(p.full_name) for p in game.players if p.user_id in game.original_imposter_ids]
-            tasks_summary = format_task_history(game)
-            await bot.send_message(
-                game.chat_id,
-                f"🏆 **Победа Импостеров!**\nОни успешно выполнили все {game.TASKS_TO_WIN} задания\n"
-                f"Коварными импостерами были: {', '.join(imposter_names)}!{tasks_summary}"
-            )
-            state.end_game(game.chat_id)
+            await finish_game(game, bot, render.IMPOSTERS_WIN_BY_TASKS.format(tasks=game.TASKS_TO_WIN), "imposters", "tasks")
             return
 
-        await bot.send_message(game.chat_id, f"✅ Задание выполнено! Импостеры выполнили {game.tasks_completed} из {game.TASKS_TO_WIN} заданий. Будьте начеку!")
+        # Сообщения в группу идут через outbox: идущие подряд склеиваются в одно (src/outbox.py)
+        outbox.post(bot, game.chat_id, render.task_done(game))
         
         new_task = game.assign_imposter_task()
+        state.save_game(game)
         if new_task:
-            living_imposters = [p for p in game.players if p.user_id in game.imposter_ids]
-            for imposter in living_imposters:
-                try:
-                    await bot.send_message(
-                        imposter.user_id,
-                        f"Ваше следующее общее задание: **{escape_markdown(new_task)}**",
-                        reply_markup=create_imposter_task_keyboard(can_skip=game.imposter_task_skips_left > 0)
-                    )
-                except Exception:
-                    pass
+            keyboard = create_imposter_task_keyboard(game.chat_id, can_skip=game.imposter_task_skips_left > 0)
+            send_task_to_imposters(bot, game, f"Ваше следующее общее задание: **{escape_markdown(new_task)}**", keyboard, reason="next")
         else:
             await query.message.answer("Задания закончились!")
 
-    elif query.data == "task_skip":
+    elif action == "task_skip":
         if game.imposter_task_skips_left <= 0:
             await query.answer("Вы уже использовали свою попытку смены задания", show_alert=True)
             return
         
         game.imposter_task_skips_left -= 1
+        history.record("task_skip", game, user_id=user_id, task=game.current_imposter_task)
+        tm.record_task_result(game.current_imposter_task, done=False)
         new_task = game.assign_imposter_task()
+        state.save_game(game)
         
         # Сначала подтверждаем нажатие кнопки
         await query.answer("Задание сменено!")
@@ -493,18 +612,11 @@ async def imposter_actions_callback(query: CallbackQuery, bot: Bot):
                 logging.warning("Failed to edit message after task skip.")
             
             # --- ИЗМЕНЕНИЕ: Рассылаем новое задание всем живым импостерам ---
-            living_imposters = [p for p in game.players if p.user_id in game.imposter_ids]
-            for imposter in living_imposters:
-                try:
-                    await bot.send_message(
-                        imposter.user_id,
-                        f"Ваше общее задание было сменено. Новое задание:\n"
-                        f"**{escape_markdown(new_task)}**",
-                        # Кнопка смены задания больше неактивна
-                        reply_markup=create_imposter_task_keyboard(can_skip=False)
-                    )
-                except Exception:
-                    pass # Игнорируем, если не удалось доставить одному из
+            # Кнопка смены задания больше неактивна
+            keyboard = create_imposter_task_keyboard(game.chat_id, can_skip=False)
+            send_task_to_imposters(
+                bot, game, f"Ваше общее задание было сменено. Новое задание:\n**{escape_markdown(new_task)}**", keyboard, reason="skip"
+            )
         else:
             await query.message.edit_text("Не удалось сменить, так как задания закончились")
 
@@ -517,46 +629,48 @@ async def vote_command_handler(message: Message, bot: Bot):
     if not game or game.status != "in_progress": return
     
     # ИЗМЕНЕНИЕ 1: Проверяем, не выбыл ли игрок, который пытается начать голосование
-    if message.from_user.id in game.voted_out_player_ids:
-        await message.answer("Вы выбыли из игры и не можете начинать голосование.", reply_to_message_id=message.message_id)
+    if game.is_voted_out(message.from_user.id):
+        post_to_chat(message, "Вы выбыли из игры и не можете начинать голосование.", reply_to_message_id=message.message_id)
         return
 
     if game.is_voting_active:
-        await message.answer("Голосование уже идет!", reply_to_message_id=message.message_id)
+        post_to_chat(message, "Голосование уже идет!", reply_to_message_id=message.message_id)
         return
 
     if game.votes_used >= game.votes_total:
-        await message.answer("Попытки голосования закончились!", reply_to_message_id=message.message_id)
+        post_to_chat(message, "Попытки голосования закончились!", reply_to_message_id=message.message_id)
         return
 
     game.is_voting_active = True
     game.votes_used += 1
+    game.vote_deadline = time.time() + VOTE_DURATION
+    state.save_game(game)
+    history.record("vote_called", game, user_id=message.from_user.id)
     
-    await message.answer(
-        f"📢 {escape_markdown(message.from_user.full_name)} созывает экстренное совещание!\n"
-        f"Использована попытка голосования {game.votes_used} из {game.votes_total}.\n"
-        "**У вас есть 5 минут, чтобы проголосовать в личном чате с ботом!**"
-    )
+    post_to_chat(message, render.vote_called(game, message.from_user.full_name, VOTE_DURATION // 60))
 
-    game.vote_timer_task = asyncio.create_task(_vote_timer(game, bot))
+    game.vote_timer = scheduler.schedule(VOTE_DURATION, partial(_on_vote_deadline, game.chat_id, bot), kind="vote", group=game.chat_id)
 
     # ИЗМЕНЕНИЕ 2: Отправляем приглашение только "живым" игрокам
-    active_players = [p for p in game.players if p.user_id not in game.voted_out_player_ids]
-    for player in active_players:
-        try:
-            await bot.send_message(player.user_id, "Кого вы подозреваете?", reply_markup=create_vote_keyboard(game, voter_id=player.user_id))
-        except Exception as e:
-            logging.error(f"Failed to send vote keyboard to {player.user_id}: {e}")
-            await message.answer(f"⚠️ Не удалось отправить клавиатуру для голосования игроку {escape_markdown(player.full_name)}.")
+    active_players = [p for p in game.players if not game.is_voted_out(p.user_id)]
+    results = await broadcaster.broadcast(bot, [
+        OutgoingMessage(player.user_id, "Кого вы подозреваете?", {"reply_markup": create_vote_keyboard(game, voter_id=player.user_id)})
+        for player in active_players
+    ])
+    for player, result in zip(active_players, results):
+        if not result.ok:
+            logging.error(f"Failed to send vote keyboard to {player.user_id}: {result.error}")
+            post_to_chat(message, f"⚠️ Не удалось отправить клавиатуру для голосования игроку {render.player_name(game, player)}.")
 
 
 @player_router.callback_query(F.data.startswith("vote_"), F.message.chat.type == "private")
 async def process_vote_callback(query: CallbackQuery, bot: Bot):
     # ... (этот хендлер не выводит пользовательские данные, оставляем без изменений)
     voter_id = query.from_user.id
-    game = next((g for g in state.active_games.values() if g.get_player(voter_id) and g.status == "in_progress"), None)
+    chat_id, accused_id = parse_vote_data(query.data)
+    game = state.get_game(chat_id) if chat_id is not None else state.find_game_by_player(voter_id)
 
-    if not game:
+    if not game or game.status != "in_progress" or not game.get_player(voter_id):
         await query.answer("Вы не участвуете в активной игре.", show_alert=True)
         return
     
@@ -569,13 +683,17 @@ async def process_vote_callback(query: CallbackQuery, bot: Bot):
             pass # Игнорируем ошибку, если сообщение уже нельзя изменить
         return
         
-    if voter_id in game.players_voted:
+    if game.is_voted_out(voter_id):
+        await query.answer("Вы выбыли из игры и не можете голосовать.", show_alert=True)
+        return
+
+    if game.has_voted(voter_id):
         await query.answer("Вы уже проголосовали.", show_alert=True)
         return
 
-    accused_id = int(query.data.split("_")[1])
-    game.players_voted.append(voter_id)
-    game.current_votes[accused_id] = game.current_votes.get(accused_id, 0) + 1
+    is_decided = game.cast_vote(voter_id, accused_id)
+    state.save_game(game)
+    history.record("vote_cast", game, user_id=voter_id, target_id=accused_id, outcome="hit" if game.is_imposter(accused_id) else "miss")
 
     try:
         await query.message.edit_text("Ваш голос принят")
@@ -583,114 +701,104 @@ async def process_vote_callback(query: CallbackQuery, bot: Bot):
     except TelegramBadRequest:
         logging.warning("Failed to edit a stale message for vote action.")
         await query.answer("Ваш голос принят")
-    if len(game.players_voted) == len(game.players):
-        if game.vote_timer_task:
-            game.vote_timer_task.cancel()
+
+    # Закрываем голосование, как только проголосовали все живые игроки
+    # или оставшиеся голоса уже не могут изменить исход
+    if is_decided and game.is_voting_active:
+        scheduler.cancel(game.vote_timer)
+        game.vote_timer = None
         game.is_voting_active = False
+        if game.voted_count() < game.living_players_count():
+            outbox.post(bot, game.chat_id, "🗳 Исход голосования уже не изменится, подводим итоги досрочно")
         await process_vote_results(game, bot)
 
 
-async def _vote_timer(game: GameSession, bot: Bot):
+def resume_vote_timers(bot: Bot) -> int:
+    """Перезапускает таймеры голосований, восстановленных из журнала, с оставшимся временем."""
+    resumed = 0
+    for game in state.active_games.values():
+        if game.is_voting_active and game.vote_timer is None:
+            if game.vote_remaining is not None:
+                # Процесс остановили штатно: голосованию возвращается ровно то время, что у него оставалось
+                remaining = game.vote_remaining
+                game.vote_deadline = time.time() + remaining
+                game.vote_remaining = None
+                state.save_game(game)
+            else:
+                remaining = max(0.0, (game.vote_deadline or time.time()) - time.time())
+            game.vote_timer = scheduler.schedule(remaining, partial(_on_vote_deadline, game.chat_id, bot), kind="vote", group=game.chat_id)
+            resumed += 1
+    return resumed
+
+
+async def _on_vote_deadline(chat_id: int, bot: Bot):
     """
-    Таймер, который ждет и принудительно завершает голосование.
+    Дедлайн голосования из планировщика: принудительно завершает голосование.
+    Выполняется в очереди игры (src/game_actor.py), чтобы не пересечься с последними голосами.
     """
-    try:
-        await asyncio.sleep(300)
-        game.is_voting_active = False
-        # Если мы дождались, значит, голосование не завершилось само.
-        logging.info(f"Таймер голосования сработал для чата {game.chat_id}")
-        await bot.send_message(game.chat_id, "⏰ **Время вышло!** Подводим итоги по имеющимся голосам")
-        await process_vote_results(game, bot)
-    except asyncio.CancelledError:
-        # Это исключение возникнет, когда мы отменим задачу. Это нормальное поведение.
-        logging.info(f"Таймер голосования для чата {game.chat_id} был отменен.")
-        raise
+    await actors.run(chat_id, partial(_close_expired_vote, chat_id, bot))
+
+
+async def _close_expired_vote(chat_id: int, bot: Bot):
+    game = state.get_game(chat_id)
+    # Игра могла закончиться, а голосование — закрыться досрочно
+    if not game or not game.is_voting_active:
+        return
+    game.vote_timer = None
+    game.is_voting_active = False
+    logging.info(f"Таймер голосования сработал для чата {game.chat_id}")
+    outbox.post(bot, game.chat_id, "⏰ **Время вышло!** Подводим итоги по имеющимся голосам")
+    await process_vote_results(game, bot)
 
 async def process_vote_results(game: GameSession, bot: Bot):
     if not game.current_votes:
-        await bot.send_message(game.chat_id, "Голосование завершилось, но никто не проголосовал. Попытка потрачена впустую.")
+        history.record("vote_result", game, outcome="empty", value=0)
+        outbox.post(bot, game.chat_id, "Голосование завершилось, но никто не проголосовал. Попытка потрачена впустую.")
     else:
-        max_votes = max(game.current_votes.values())
-        most_voted_ids = [uid for uid, votes in game.current_votes.items() if votes == max_votes]
+        accused_id = game.vote_winner()
+        voted = game.voted_count()
 
-        if len(most_voted_ids) > 1:
-            await bot.send_message(game.chat_id, "⚠️ Голоса разделились! Никто не был изгнан")
+        if accused_id is None:
+            history.record("vote_result", game, outcome="tie", value=voted)
+            outbox.post(bot, game.chat_id, "⚠️ Голоса разделились! Никто не был изгнан")
         else:
-            accused_id = most_voted_ids[0]
             accused_player = game.get_player(accused_id)
 
             # --- ИЗМЕНЕНИЕ ЛОГИКИ ---
-            if accused_id in game.imposter_ids:
+            if game.is_imposter(accused_id):
                 # Если угадали, то добавляем в список выбывших и удаляем из активных импостеров
-                game.voted_out_player_ids.append(accused_id)
-                game.imposter_ids.remove(accused_id)
-                await bot.send_message(game.chat_id, f"✅ **Один импостер был найден!** Это был {escape_markdown(accused_player.full_name)}.")
+                history.record("vote_result", game, target_id=accused_id, outcome="found", value=voted)
+                state.vote_out_imposter(game, accused_id)
+                outbox.post(bot, game.chat_id, render.imposter_found(game, accused_player))
             else:
                 # Если ошиблись, просто сообщаем об этом. Игрок НЕ выбывает.
-                await bot.send_message(game.chat_id, f"❌ Вы ошиблись в выборе импостера! Попытка голосования потрачена")
+                history.record("vote_result", game, target_id=accused_id, outcome="miss", value=voted)
+                outbox.post(bot, game.chat_id, "❌ Вы ошиблись в выборе импостера! Попытка голосования потрачена")
     
     # --- ПРОВЕРКА УСЛОВИЙ ОКОНЧАНИЯ ИГРЫ ПОСЛЕ ГОЛОСОВАНИЯ ---
     
     # 1. Проверка на победу экипажа (все импостеры найдены)
-    if not game.imposter_ids:
-        imposter_names = [escape_markdown(p.full_name) for p in game.players if p.user_id in game.original_imposter_ids]
-        tasks_summary = format_task_history(game)
-        await bot.send_message(
-            game.chat_id,
-            f"🏆 **Победа Экипажа!**\nВсе импостеры были найдены!\n"
-            f"Коварными импостерами были: {', '.join(imposter_names)}!{tasks_summary}"
-        )
-        state.end_game(game.chat_id)
+    if not game.imposter_mask:
+        await finish_game(game, bot, render.CREW_WINS, "crew", "all_found")
         return
 
     # 2. Проверка на победу импостеров (их количество равно или больше мирных)
-    living_imposters_count = len(game.imposter_ids)
+    living_imposters_count = game.imposters_count()
     # Количество живых игроков теперь всегда равно общему числу игроков минус число выбывших импостеров
-    living_players_count = len(game.players) - len(game.voted_out_player_ids)
+    living_players_count = game.living_players_count()
     living_crew_count = living_players_count - living_imposters_count
 
     if living_imposters_count >= living_crew_count:
-        imposter_names = [escape_markdown(p.full_name) for p in game.players if p.user_id in game.original_imposter_ids]
-        tasks_summary = format_task_history(game)
-        await bot.send_message(
-            game.chat_id,
-            f"🏆 **Победа Импостеров!**\nИх осталось слишком много, чтобы сопротивляться.\n"
-            f"Коварными импостерами были: {', '.join(imposter_names)}!{tasks_summary}"
-        )
-        state.end_game(game.chat_id)
+        await finish_game(game, bot, render.IMPOSTERS_WIN_BY_NUMBERS, "imposters", "numbers")
         return
 
     # 3. Проверка на победу импостеров (закончились попытки голосования)
     remaining_votes = game.votes_total - game.votes_used
     if remaining_votes <= 0:
-        imposter_names = [escape_markdown(p.full_name) for p in game.players if p.user_id in game.original_imposter_ids]
-        tasks_summary = format_task_history(game)
-        await bot.send_message(
-            game.chat_id,
-            "Попытки голосования закончились, а импостеры так и не были найдены!\n\n"
-            f"🏆 **Победа Импостеров!**\n"
-            f"Коварными импостерами были: {', '.join(imposter_names)}!{tasks_summary}"
-        )
-        state.end_game(game.chat_id)
+        await finish_game(game, bot, render.IMPOSTERS_WIN_BY_VOTES, "imposters", "votes")
         return
 
     # Если игра не закончилась, сообщаем статус и сбрасываем состояние
-    await bot.send_message(game.chat_id, f"В игре осталось **{len(game.imposter_ids)}** импостера(-ов). Осталось попыток для голосования: **{remaining_votes}/{game.votes_total}**")
+    outbox.post(bot, game.chat_id, render.vote_status(game))
     game.reset_vote_state()
-
-def format_task_history(game: GameSession) -> str:
-    """Форматирует историю ВЫПОЛНЕННЫХ заданий импостера для вывода в чат."""
-    if game.tasks_completed == 0:
-        return ""
-    
-    tasks_text = "\n\nЗадания, которые импостер успел выполнить:\n"
-    
-    completed_tasks = game.imposter_tasks_history[:game.tasks_completed]
-    
-    tasks_list = [
-        f"{i}. {escape_markdown(task)}" 
-        for i, task in enumerate(completed_tasks, 1)
-    ]
-    tasks_text += "\n\n".join(tasks_list)
-    return tasks_text
-
+    state.save_game(game)
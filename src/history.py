@@ -0,0 +1,226 @@
+# src/history.py
+
+import asyncio
+import glob
+import importlib.util
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from configs.env_config import Config
+from src.model.game import GameSession
+from src.scheduler import Timer, scheduler
+
+# Колонки журнала событий. Все события плоские: неиспользуемые колонки — None
+COLUMNS = (
+    "ts",          # время события, time.time()
+    "chat_id",
+    "game",        # started_at игры: вместе с chat_id однозначно определяет игру
+    "event",       # game_started, task_done, task_skip, vote_called, vote_cast, vote_result, game_over
+    "user_id",     # кто действовал: импостер, голосующий, созвавший голосование
+    "target_id",   # против кого голосовали
+    "outcome",     # vote_cast: hit/miss; vote_result: found/miss/tie/empty; game_over: crew/imposters/stopped
+    "detail",      # game_over: причина (tasks, votes, numbers, all_found, stopped)
+    "task",        # текст задания для task_done/task_skip
+    "players",     # игроков в игре на момент события
+    "imposters",   # живых импостеров на момент события
+    "value",       # game_started: попыток голосования; vote_result: сколько проголосовало
+)
+
+# Сколько событий копить в памяти, прежде чем дописать в файл, и как часто дописывать в любом случае
+BUFFER_EVENTS = 256
+FLUSH_INTERVAL = 5.0
+# Сколько событий в одном сегменте журнала; закрытые сегменты сжимаются в колоночные файлы
+SEGMENT_EVENTS = 50_000
+
+SEGMENT_SUFFIX = ".jsonl"
+COLUMNAR_SUFFIX = ".parquet"
+
+
+def columnar_available() -> bool:
+    """Есть ли pyarrow для записи Parquet. Без него сегменты остаются в JSONL (их тоже читает /stats)."""
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def compact_segment(path: str) -> Optional[str]:
+    """
+    Сжимает закрытый сегмент JSONL в файл Parquet рядом с ним и удаляет сегмент.
+    Тяжелая работа (pandas), поэтому вызывается в отдельном потоке, а pandas импортируется только здесь.
+    """
+    import pandas as pd
+
+    rows = _read_segment(path)
+    if not rows:
+        os.remove(path)
+        return None
+    frame = _frame(pd, rows)
+    target = path[:-len(SEGMENT_SUFFIX)] + COLUMNAR_SUFFIX
+    tmp = target + ".tmp"
+    frame.to_parquet(tmp, index=False)
+    os.replace(tmp, target)
+    os.remove(path)
+    return target
+
+
+def _read_segment(path: str) -> List[dict]:
+    rows = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                rows.append(json.loads(line))
+            except json.JSONDecodeError:
+                # Недописанная строка на момент падения
+                break
+    return rows
+
+
+def _frame(pd, rows: List[dict]):
+    frame = pd.DataFrame.from_records(rows, columns=list(COLUMNS))
+    for name in ("chat_id", "user_id", "target_id", "players", "imposters"):
+        frame[name] = frame[name].astype("Int64")
+    for name in ("event", "outcome", "detail"):
+        frame[name] = frame[name].astype("category")
+    return frame
+
+
+def load_history(history_dir: str):
+    """
+    Вся история одной таблицей pandas: колоночные файлы всех шардов плюс еще не сжатые сегменты.
+    Для аналитики вне event loop (asyncio.to_thread).
+    """
+    import pandas as pd
+
+    readers = {
+        COLUMNAR_SUFFIX: pd.read_parquet,
+        SEGMENT_SUFFIX: lambda path: _frame(pd, _read_segment(path)),
+    }
+    frames = []
+    # Сначала колоночные файлы, потом сегменты: если сегмент сожмут между двумя проходами,
+    # его события пропадут из этого отчета, но не посчитаются дважды
+    for suffix, read in readers.items():
+        for path in sorted(glob.glob(os.path.join(history_dir, "**", "*" + suffix), recursive=True)):
+            try:
+                frames.append(read(path))
+            except FileNotFoundError:
+                continue
+    if not frames:
+        return _frame(pd, [])
+    frame = pd.concat(frames, ignore_index=True)
+    for name in ("event", "outcome", "detail"):
+        frame[name] = frame[name].astype("category")
+    return frame
+
+
+class EventLog:
+    """
+    Журнал игровых событий для аналитики: буфер в памяти -> сегменты JSONL -> файлы Parquet.
+    Запись в горячем пути — только добавление словаря в список. Буфер дописывается в текущий сегмент
+    пачкой (по размеру или раз в FLUSH_INTERVAL), заполненный сегмент закрывается и сжимается
+    в отдельном потоке. Журнал не участвует в восстановлении игр (это src/persistence.py).
+    """
+
+    def __init__(self, buffer_events: int = BUFFER_EVENTS, segment_events: int = SEGMENT_EVENTS):
+        self.buffer_events = buffer_events
+        self.segment_events = segment_events
+        self.history_dir: Optional[str] = None
+        self._buffer: List[Dict[str, Any]] = []
+        self._segment_path: Optional[str] = None
+        self._segment_events = 0
+        self._flush_timer: Optional[Timer] = None
+        self._compactions: set = set()
+        self._columnar = True
+
+    def open(self, history_dir: str):
+        """Открывает папку журнала; сегменты, оставшиеся от прошлого запуска, отправляются на сжатие."""
+        if self.history_dir is not None:
+            return
+        os.makedirs(history_dir, exist_ok=True)
+        self.history_dir = history_dir
+        self._columnar = columnar_available()
+        if not self._columnar:
+            logging.warning("pyarrow is not installed: game history segments will stay in JSONL, /stats will be slower")
+        for path in sorted(glob.glob(os.path.join(history_dir, "*" + SEGMENT_SUFFIX))):
+            self._compact_later(path)
+
+    # --- ЗАПИСЬ ---
+
+    def record(self, event: str, game: GameSession, user_id: Optional[int] = None, target_id: Optional[int] = None,
+               outcome: Optional[str] = None, detail: Optional[str] = None, task: Optional[str] = None,
+               value: Optional[float] = None):
+        self._buffer.append({
+            "ts": time.time(), "chat_id": game.chat_id, "game": game.started_at, "event": event,
+            "user_id": user_id, "target_id": target_id, "outcome": outcome, "detail": detail, "task": task,
+            "players": len(game.players), "imposters": game.imposters_count(), "value": value,
+        })
+        if len(self._buffer) >= self.buffer_events:
+            self.flush()
+        elif self._flush_timer is None:
+            self._schedule_flush()
+
+    def _schedule_flush(self):
+        try:
+            self._flush_timer = scheduler.schedule(FLUSH_INTERVAL, self._on_flush_timer, kind="history_flush")
+        except RuntimeError:
+            # Нет запущенного event loop (скрипты, импорт истории) — допишется при следующем flush
+            pass
+
+    async def _on_flush_timer(self):
+        self._flush_timer = None
+        self.flush()
+
+    def flush(self):
+        """Дописывает буфер в текущий сегмент; заполненный сегмент закрывает и отдает на сжатие."""
+        scheduler.cancel(self._flush_timer)
+        self._flush_timer = None
+        if not self._buffer:
+            return
+        if self.history_dir is None:
+            self.open(Config.HISTORY_DIR)
+        if self._segment_path is None:
+            self._segment_path = os.path.join(self.history_dir, f"events-{time.time_ns()}{SEGMENT_SUFFIX}")
+            self._segment_events = 0
+        with open(self._segment_path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(row, ensure_ascii=False, separators=(",", ":")) + "\n" for row in self._buffer))
+        self._segment_events += len(self._buffer)
+        self._buffer.clear()
+        if self._segment_events >= self.segment_events:
+            self.rotate()
+
+    def rotate(self):
+        """Закрывает текущий сегмент; следующий flush начнет новый."""
+        if self._segment_path is None:
+            return
+        path, self._segment_path = self._segment_path, None
+        self._compact_later(path)
+
+    # --- СЖАТИЕ ---
+
+    def _compact_later(self, path: str):
+        if not self._columnar:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = loop.create_task(self._compact(path))
+        self._compactions.add(task)
+        task.add_done_callback(self._compactions.discard)
+
+    async def _compact(self, path: str):
+        try:
+            target = await asyncio.to_thread(compact_segment, path)
+            if target:
+                logging.info(f"Compacted game history segment into {target}")
+        except Exception:
+            logging.exception(f"Failed to compact game history segment {path}")
+
+    async def close(self):
+        """Дописывает буфер и дожидается фоновых сжатий. Текущий сегмент сожмется при следующем запуске."""
+        self.flush()
+        if self._compactions:
+            await asyncio.gather(*self._compactions, return_exceptions=True)
+
+
+history = EventLog()
@@ -1,39 +1,86 @@
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from aiogram.utils.keyboard import InlineKeyboardBuilder
 from src.model.game import GameSession
 
+# Кнопок в ряду у клавиатуры голосования
+VOTE_ROW_WIDTH = 2
+# Telegram принимает не больше 100 кнопок; остальные заявки видны только в тексте сводки
+DIGEST_MAX_APPLICANT_BUTTONS = 90
+
+# --- СТАТИЧЕСКИЕ КЛАВИАТУРЫ ---
+# Объекты aiogram неизменяемы, поэтому одни и те же экземпляры можно отдавать всем
+
+_LOBBY_KEYBOARD = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="Подать заявку", callback_data="apply_to_join")]
+])
+
 def create_lobby_keyboard() -> InlineKeyboardMarkup:
-    builder = InlineKeyboardBuilder()
-    builder.add(InlineKeyboardButton(text="Подать заявку", callback_data="apply_to_join"))
-    return builder.as_markup()
-
-def create_admin_approval_keyboard(user_id: int, username: str) -> InlineKeyboardMarkup:
-    builder = InlineKeyboardBuilder()
-    builder.add(
-        InlineKeyboardButton(text="✅ Одобрить", callback_data=f"admin_approve_{user_id}"),
-        InlineKeyboardButton(text="❌ Отклонить", callback_data=f"admin_reject_{user_id}")
-    )
-    return builder.as_markup()
-
-def create_imposter_task_keyboard(can_skip: bool) -> InlineKeyboardMarkup:
-    builder = InlineKeyboardBuilder()
-    builder.add(InlineKeyboardButton(text="✅ Задание выполнено", callback_data="task_done"))
+    return _LOBBY_KEYBOARD
+
+# --- CALLBACK_DATA ЛИЧНЫХ КНОПОК ИГРЫ ---
+# Кнопки в личке несут chat_id игры: по нему апдейт попадает в шард и очередь своей игры
+# без таблицы игрок -> игра. Кнопки старого формата (vote_<user_id>, task_done) еще могут
+# оставаться в чатах — для них chat_id нет, и игра ищется по игроку.
+
+def callback_chat_id(data: str) -> Optional[int]:
+    """chat_id игры из callback_data личной кнопки (vote_<chat>_<user>, task_done_<chat>, task_skip_<chat>)."""
+    parts = data.split("_")
+    if len(parts) == 3 and parts[0] in ("vote", "task"):
+        return int(parts[1] if parts[0] == "vote" else parts[2])
+    return None
+
+def parse_vote_data(data: str) -> Tuple[Optional[int], int]:
+    """(chat_id игры или None у старой кнопки, за кого голос)"""
+    parts = data.split("_")
+    return (int(parts[1]), int(parts[2])) if len(parts) == 3 else (None, int(parts[1]))
+
+# Клавиатура заданий своя у каждой игры; объекты aiogram неизменяемы, поэтому кэшируем
+@lru_cache(maxsize=4096)
+def create_imposter_task_keyboard(chat_id: int, can_skip: bool) -> InlineKeyboardMarkup:
+    buttons = [InlineKeyboardButton(text="✅ Задание выполнено", callback_data=f"task_done_{chat_id}")]
     if can_skip:
-        builder.add(InlineKeyboardButton(text="♻️ Сменить задание", callback_data="task_skip"))
-    return builder.as_markup()
+        buttons.append(InlineKeyboardButton(text="♻️ Сменить задание", callback_data=f"task_skip_{chat_id}"))
+    return InlineKeyboardMarkup(inline_keyboard=[buttons])
+
+# --- КЛАВИАТУРА ГОЛОСОВАНИЯ ---
+
+def _vote_buttons(game: GameSession) -> List[Tuple[int, InlineKeyboardButton]]:
+    """Кнопки всех живых игроков. Строятся один раз на версию состава игры."""
+    cached_version, buttons = game.vote_buttons_cache or (None, None)
+    if cached_version == game.roster_version:
+        return buttons
+    buttons = [
+        (player.user_id, InlineKeyboardButton(text=player.full_name, callback_data=f"vote_{game.chat_id}_{player.user_id}"))
+        for player in game.players
+        if not game.is_voted_out(player.user_id)
+    ]
+    game.vote_buttons_cache = (game.roster_version, buttons)
+    return buttons
 
 def create_vote_keyboard(game: GameSession, voter_id: int) -> InlineKeyboardMarkup:
-    builder = InlineKeyboardBuilder()
-    
-    # ИЗМЕНЕНИЕ: Получаем список только тех игроков, кто еще в игре
-    active_players = [p for p in game.players if p.user_id not in game.voted_out_player_ids]
-    
-    for player in active_players:
-        if player.user_id != voter_id: # Нельзя голосовать за себя
-            builder.add(InlineKeyboardButton(
-                text=player.full_name,
-                callback_data=f"vote_{player.user_id}"
-            ))
-    builder.adjust(2)
-    return builder.as_markup()
+    # Нельзя голосовать за себя: из общего набора кнопок выкидываем только кнопку голосующего
+    buttons = [button for user_id, button in _vote_buttons(game) if user_id != voter_id]
+    rows = [buttons[i:i + VOTE_ROW_WIDTH] for i in range(0, len(buttons), VOTE_ROW_WIDTH)]
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+# --- СВОДКА ЗАЯВОК ---
 
+def create_approval_digest_keyboard(game: GameSession) -> InlineKeyboardMarkup:
+    """Кнопка-переключатель на каждую заявку и действия над отмеченными или всеми заявками сразу."""
+    chat_id = game.chat_id
+    rows = [
+        [InlineKeyboardButton(
+            text=f"{'✅' if data.get('selected', True) else '⬜'} {data['full_name']}",
+            callback_data=f"digest_toggle_{chat_id}_{user_id}"
+        )]
+        for user_id, data in list(game.pending_players.items())[:DIGEST_MAX_APPLICANT_BUTTONS]
+    ]
+    selected = sum(1 for data in game.pending_players.values() if data.get("selected", True))
+    rows.append([
+        InlineKeyboardButton(text=f"✅ Одобрить отмеченных ({selected})", callback_data=f"digest_approve_{chat_id}"),
+        InlineKeyboardButton(text=f"❌ Отклонить отмеченных ({selected})", callback_data=f"digest_reject_{chat_id}")
+    ])
+    rows.append([InlineKeyboardButton(text=f"👥 Одобрить всех ({len(game.pending_players)})", callback_data=f"digest_all_{chat_id}")])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
@@ -0,0 +1,274 @@
+# src/metrics.py
+
+import logging
+import time
+from bisect import bisect_left
+from collections import Counter as _Counter
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import TelegramMethod
+from aiogram.types import TelegramObject, Update
+
+import src.game_state as state
+from src.scheduler import scheduler
+from src.delivery import delivery
+from src.game_actor import actors
+
+if TYPE_CHECKING:
+    from aiohttp import web
+
+# Границы корзин гистограмм задержек, в секундах
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRICS_PATH = "/metrics"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Labels, values: Labels, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+# ---------------------------------------------------------------------
+# --- МЕТРИКИ ---
+# ---------------------------------------------------------------------
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Labels = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values: Dict[Labels, float] = _Counter()
+
+    def inc(self, *label_values: str, amount: float = 1):
+        self._values[label_values] += amount
+
+    def value(self, *label_values: str) -> float:
+        return self._values.get(label_values, 0)
+
+    def samples(self) -> Iterable[str]:
+        for values, count in self._values.items():
+            yield f"{self.name}{_format_labels(self.labels, values)} {count}"
+
+
+class Gauge:
+    """Значения снимаются в момент опроса функцией collect: {значения меток: число}."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, collect: Callable[[], Dict[Labels, float]], labels: Labels = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.collect = collect
+
+    def samples(self) -> Iterable[str]:
+        for values, value in self.collect().items():
+            yield f"{self.name}{_format_labels(self.labels, values)} {value}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Labels = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = buckets
+        # {значения меток: [счетчики корзин (последняя — +Inf), сумма]}
+        self._series: Dict[Labels, List[float]] = {}
+
+    def observe(self, value: float, *label_values: str):
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+        # Корзины хранятся не накопительно, складываются только при выдаче
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def count(self, *label_values: str) -> int:
+        series = self._series.get(label_values)
+        return int(sum(series[:-1])) if series else 0
+
+    def samples(self) -> Iterable[str]:
+        for values, series in self._series.items():
+            cumulative = 0
+            for bound, hits in zip(self.buckets + (float("inf"),), series):
+                cumulative += hits
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                yield f"{self.name}_bucket{_format_labels(self.labels, values, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labels, values)} {series[-1]}"
+            yield f"{self.name}_count{_format_labels(self.labels, values)} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Текстовый формат Prometheus (exposition format 0.0.4)."""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+# --- ГАУГИ СОСТОЯНИЯ ИГР ---
+
+def _collect_games() -> Dict[Labels, float]:
+    # Те же значения, что у GameSession.status, — обе серии есть с первого опроса
+    counts = _Counter({("lobby",): 0, ("in_progress",): 0})
+    for game in state.active_games.values():
+        counts[(game.status,)] += 1
+    return counts
+
+
+def _collect_open_votes() -> Dict[Labels, float]:
+    return {(): sum(1 for game in state.active_games.values() if game.is_voting_active)}
+
+
+def _collect_pending_timers() -> Dict[Labels, float]:
+    return {(kind,): count for kind, count in scheduler.pending_counts().items()}
+
+
+def _collect_game_actors() -> Dict[Labels, float]:
+    return {(): len(actors.actors)}
+
+
+def _collect_actor_mailboxes() -> Dict[Labels, float]:
+    return {(): actors.queued()}
+
+
+def _collect_delivery_queue() -> Dict[Labels, float]:
+    return {(status,): count for status, count in delivery.counts().items()}
+
+
+registry = Registry()
+
+UPDATES = registry.register(Counter("bot_updates_total", "Updates received, by type", ("type",)))
+UPDATE_LATENCY = registry.register(Histogram("bot_update_duration_seconds", "Full update processing time", ("type",)))
+HANDLER_LATENCY = registry.register(Histogram("bot_handler_duration_seconds", "Handler execution time", ("handler",)))
+HANDLER_ERRORS = registry.register(Counter("bot_handler_errors_total", "Exceptions raised by handlers", ("handler",)))
+API_LATENCY = registry.register(Histogram("telegram_api_duration_seconds", "Bot API request time", ("method",)))
+API_ERRORS = registry.register(Counter("telegram_api_errors_total", "Failed Bot API requests", ("method", "error")))
+API_RETRY_AFTER = registry.register(Counter("telegram_api_retry_after_total", "Bot API 429 (RetryAfter) responses", ("method",)))
+DEDUP_HITS = registry.register(Counter("bot_dedup_hits_total", "Duplicate updates and repeated button taps dropped before routing", ("layer",)))
+registry.register(Gauge("bot_games", "Games in memory, by status (lobby, in_progress)", _collect_games, ("status",)))
+registry.register(Gauge("bot_open_votes", "Games with an open vote", _collect_open_votes))
+registry.register(Gauge("bot_pending_timers", "Timers waiting in the scheduler, by kind", _collect_pending_timers, ("kind",)))
+registry.register(Gauge("bot_game_actors", "Games with events being processed right now", _collect_game_actors))
+registry.register(Gauge("bot_game_actor_queued", "Events waiting in game mailboxes", _collect_actor_mailboxes))
+registry.register(Gauge("bot_delivery_queue", "Messages in the durable delivery queue, by status", _collect_delivery_queue, ("status",)))
+
+
+# ---------------------------------------------------------------------
+# --- MIDDLEWARE ---
+# ---------------------------------------------------------------------
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """Внешний middleware на dp.update: число апдейтов и полное время их обработки по типам."""
+
+    async def __call__(self, handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                       event: Update, data: Dict[str, Any]) -> Any:
+        event_type = event.event_type
+        UPDATES.inc(event_type)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            UPDATE_LATENCY.observe(time.perf_counter() - started, event_type)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """
+    Внутренний middleware: вызывается уже после фильтров, когда известен конкретный хендлер.
+    Время и ошибки пишутся по имени функции хендлера.
+    """
+
+    async def __call__(self, handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                       event: TelegramObject, data: Dict[str, Any]) -> Any:
+        handler_object = data.get("handler")
+        name = getattr(handler_object.callback, "__name__", "unknown") if handler_object else "unknown"
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.inc(name)
+            raise
+        finally:
+            HANDLER_LATENCY.observe(time.perf_counter() - started, name)
+
+
+class ApiMetricsMiddleware(BaseRequestMiddleware):
+    """Middleware сессии бота: время каждого запроса к Bot API, ошибки и ответы 429."""
+
+    async def __call__(self, make_request: NextRequestMiddlewareType, bot: Bot, method: TelegramMethod):
+        name = method.__api_method__
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except TelegramRetryAfter:
+            API_RETRY_AFTER.inc(name)
+            API_ERRORS.inc(name, "TelegramRetryAfter")
+            raise
+        except Exception as e:
+            API_ERRORS.inc(name, type(e).__name__)
+            raise
+        finally:
+            API_LATENCY.observe(time.perf_counter() - started, name)
+
+
+def setup_dispatcher(dp: Dispatcher):
+    dp.update.outer_middleware(UpdateMetricsMiddleware())
+    # Внутренние middleware диспетчера применяются ко всем вложенным роутерам (admin_router, player_router)
+    handler_metrics = HandlerMetricsMiddleware()
+    dp.message.middleware(handler_metrics)
+    dp.callback_query.middleware(handler_metrics)
+
+
+def instrument_bot(bot: Bot):
+    bot.session.middleware(ApiMetricsMiddleware())
+
+
+# ---------------------------------------------------------------------
+# --- HTTP ---
+# ---------------------------------------------------------------------
+
+async def start_metrics_server(host: str, port: int) -> Optional["web.AppRunner"]:
+    """Поднимает отдельный HTTP-сервер с /metrics. Вызывающий отвечает за runner.cleanup()."""
+    # aiohttp.web нужен только при включенных метриках — не тянем его на старте
+    from aiohttp import web
+
+    async def handle(request: web.Request) -> web.Response:
+        return web.Response(body=registry.render().encode(), headers={"Content-Type": CONTENT_TYPE})
+
+    app = web.Application()
+    app.router.add_get(METRICS_PATH, handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host, port).start()
+    except OSError as e:
+        logging.error(f"Metrics server could not bind {host}:{port}: {e}")
+        await runner.cleanup()
+        return None
+    logging.info(f"Metrics are served on http://{host}:{port}{METRICS_PATH}")
+    return runner
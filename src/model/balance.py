@@ -0,0 +1,32 @@
+# src/model/balance.py
+# Правила баланса при старте игры. Отдельный модуль без зависимостей:
+# им пользуются и GameSession.start_game, и симулятор src/balance_sim.py.
+
+from dataclasses import dataclass
+from typing import Tuple
+
+
+@dataclass(frozen=True, slots=True)
+class BalanceRules:
+    # С какого числа игроков импостеров двое
+    two_imposters_from: int = 6
+    # Сколько заданий нужно импостерам для победы: (при одном импостере, при двух)
+    tasks_to_win: Tuple[int, int] = (2, 3)
+    # Попыток голосования: число мирных плюс поправка (при одном импостере, при двух)
+    votes_offset: Tuple[int, int] = (-1, 0)
+
+    def imposters(self, num_players: int) -> int:
+        return 2 if num_players >= self.two_imposters_from else 1
+
+    def for_players(self, num_players: int) -> Tuple[int, int, int]:
+        """(импостеров, заданий для победы импостеров, попыток голосования)"""
+        num_imposters = self.imposters(num_players)
+        num_crewmates = num_players - num_imposters
+        return (
+            num_imposters,
+            self.tasks_to_win[num_imposters - 1],
+            num_crewmates + self.votes_offset[num_imposters - 1],
+        )
+
+
+DEFAULT_RULES = BalanceRules()
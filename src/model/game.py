@@ -1,31 +1,48 @@
 # src/model/game.py (обновленная версия с несколькими импостерами)
 
 import random
-import asyncio
+import time
 from typing import Optional, List, Dict
 from dataclasses import dataclass, field
-from src.tasks import ALL_TASKS
+from src.task_manager import get_task_deck
+from src.task_deck import DeckCursor, find_deck
+from src.task_weights import task_weights
+from src.model.balance import DEFAULT_RULES
+from src.scheduler import Timer
 
-@dataclass
+@dataclass(slots=True)
 class Player:
     user_id: int
     username: str
     full_name: str
     role: str = "crewmate"
 
-@dataclass
+@dataclass(slots=True)
 class GameSession:
+    """
+    Состояние одной игры. Класс со __slots__: при десятках тысяч одновременных сессий
+    экономия на __dict__ каждого объекта заметна.
+    Принадлежность игроков к группам (импостеры, выбывшие, проголосовавшие) хранится битовыми масками:
+    бит i относится к игроку players[i]. Список players только растет, поэтому позиции не сдвигаются.
+    """
     chat_id: int
     status: str = "lobby"
+    chat_title: str = ""
+    # Момент старта игры (time.time()): отличает игры одного чата, например в ключах src/delivery.py
+    started_at: Optional[float] = None
     players: List[Player] = field(default_factory=list)
+    # {user_id: {"username", "full_name", "selected"}} — заявки; selected — отметка в сводке у админа
     pending_players: Dict[int, dict] = field(default_factory=dict)
+    # Сообщение со сводкой заявок в ЛС админа и таймер ее отложенного обновления (src/approvals.py)
+    approval_message_id: Optional[int] = None
+    approval_timer: Optional[Timer] = None
     
-    # ИЗМЕНЕНИЕ 1: Заменяем ID одного импостера на список ID
-    imposter_ids: List[int] = field(default_factory=list)
-    # НОВОЕ ПОЛЕ: Сохраняем исходный состав импостеров для финального сообщения
-    original_imposter_ids: List[int] = field(default_factory=list)
-    # НОВОЕ ПОЛЕ: Список игроков, которых выгнали голосованием
-    voted_out_player_ids: List[int] = field(default_factory=list)
+    # Живые импостеры
+    imposter_mask: int = 0
+    # Исходный состав импостеров для финального сообщения
+    original_imposter_mask: int = 0
+    # Игроки, которых выгнали голосованием
+    voted_out_mask: int = 0
     
     tasks_completed: int = 0
     TASKS_TO_WIN: int = 2
@@ -36,61 +53,177 @@ class GameSession:
     votes_total: int = 0
     votes_used: int = 0
     
-    vote_timer_task: Optional[asyncio.Task] = None
+    # Таймер окончания голосования в планировщике (src/scheduler.py)
+    vote_timer: Optional[Timer] = None
     is_voting_active: bool = False
+    # Момент окончания голосования (time.time()), чтобы восстановить таймер после перезапуска
+    vote_deadline: Optional[float] = None
+    # Сколько времени оставалось голосованию при штатной остановке (src/shutdown.py):
+    # после перезапуска отсчет продолжается с этого места, а не от vote_deadline
+    vote_remaining: Optional[float] = None
     
+    # Растет при каждом изменении состава (вступление, изгнание) — по ней сбрасываются кэши клавиатур
+    roster_version: int = 0
+    # (roster_version, [(user_id, кнопка)]) — кэш кнопок голосования, см. src/keyboards.py
+    vote_buttons_cache: Optional[tuple] = None
+    # Экранированные имена и куски сообщений игры (src/render.py)
+    render_cache: Optional[object] = None
+
     current_votes: Dict[int, int] = field(default_factory=dict)
-    players_voted: List[int] = field(default_factory=list)
+    # Игроки, уже проголосовавшие в текущем голосовании
+    voted_mask: int = 0
+    # Текущий лидер голосования и его отрыв: обновляются на каждом голосе, без пересчета всех голосов
+    vote_leader_id: Optional[int] = None
+    vote_leader_count: int = 0
+    # Максимум голосов среди всех, кроме лидера (равен vote_leader_count при ничьей)
+    vote_runner_up_count: int = 0
 
-    available_tasks: List[str] = field(default_factory=lambda: random.sample(ALL_TASKS, len(ALL_TASKS)))
+    # Позиция игры в общей колоде заданий (src/task_deck.py). Создается при старте игры
+    # по текущей колоде, поэтому новые игры сразу видят изменения /move_to_prod
+    task_cursor: Optional[DeckCursor] = None
     current_imposter_task: Optional[str] = None
 
+    # {user_id: позиция в players} — строится из players, не сохраняется
+    player_positions: Dict[int, int] = field(default_factory=dict, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.player_positions = {player.user_id: i for i, player in enumerate(self.players)}
+
+    # --- СОСТАВ ---
+
+    def add_player(self, player: Player):
+        self.player_positions[player.user_id] = len(self.players)
+        self.players.append(player)
+
     def get_player(self, user_id: int) -> Optional[Player]:
-        for player in self.players:
-            if player.user_id == user_id:
-                return player
-        return None
+        position = self.player_positions.get(user_id)
+        return self.players[position] if position is not None else None
+
+    def _bit(self, user_id: int) -> int:
+        position = self.player_positions.get(user_id)
+        return 1 << position if position is not None else 0
+
+    def _ids(self, mask: int) -> List[int]:
+        ids = []
+        while mask:
+            lowest = mask & -mask
+            ids.append(self.players[lowest.bit_length() - 1].user_id)
+            mask ^= lowest
+        return ids
+
+    def is_imposter(self, user_id: int) -> bool:
+        return bool(self.imposter_mask & self._bit(user_id))
+
+    def was_imposter(self, user_id: int) -> bool:
+        return bool(self.original_imposter_mask & self._bit(user_id))
+
+    def is_voted_out(self, user_id: int) -> bool:
+        return bool(self.voted_out_mask & self._bit(user_id))
+
+    def has_voted(self, user_id: int) -> bool:
+        return bool(self.voted_mask & self._bit(user_id))
+
+    @property
+    def imposter_ids(self) -> List[int]:
+        """ID живых импостеров в порядке вступления в игру (новый список)."""
+        return self._ids(self.imposter_mask)
+
+    @property
+    def original_imposter_ids(self) -> List[int]:
+        return self._ids(self.original_imposter_mask)
+
+    @property
+    def voted_out_player_ids(self) -> List[int]:
+        return self._ids(self.voted_out_mask)
+
+    def imposters_count(self) -> int:
+        return self.imposter_mask.bit_count()
+
+    def voted_count(self) -> int:
+        return self.voted_mask.bit_count()
+
+    def vote_out(self, user_id: int):
+        bit = self._bit(user_id)
+        self.voted_out_mask |= bit
+        self.imposter_mask &= ~bit
 
     def start_game(self):
         self.status = "in_progress"
+        self.started_at = time.time()
         
-        # Сначала определяем количество импостеров
-        num_players = len(self.players)
-        num_imposters = 2 if num_players >= 6 else 1
-
-        # --- ИЗМЕНЕНИЕ: Динамически устанавливаем количество заданий для победы ---
-        if num_imposters == 1:
-            self.TASKS_TO_WIN = 2
-        else: # num_imposters == 2
-            self.TASKS_TO_WIN = 3
-        
-        num_crewmates = num_players - num_imposters
-        
-        # ИЗМЕНЕНИЕ: Новая гибридная формула
-        if num_imposters == 1:
-            self.votes_total = num_crewmates - 1
-        else: # num_imposters == 2
-            self.votes_total = num_crewmates
+        # Число импостеров, заданий для их победы и попыток голосования — src/model/balance.py
+        num_imposters, self.TASKS_TO_WIN, self.votes_total = DEFAULT_RULES.for_players(len(self.players))
         
         imposter_players = random.sample(self.players, num_imposters)
         
         for player in imposter_players:
             player.role = "imposter"
-            self.imposter_ids.append(player.user_id)
+            self.imposter_mask |= self._bit(player.user_id)
         
-        self.original_imposter_ids = self.imposter_ids.copy()
+        self.original_imposter_mask = self.imposter_mask
+        if self.task_cursor is None:
+            self.task_cursor = DeckCursor.over(get_task_deck())
         
     def assign_imposter_task(self) -> Optional[str]:
-        if not self.available_tasks:
-            self.current_imposter_task = None
-            return None
-        self.current_imposter_task = self.available_tasks.pop(0)
-        # self.imposter_tasks_history.append(self.current_imposter_task)
+        cursor = self.task_cursor
+        if cursor is None:
+            cursor = self.task_cursor = DeckCursor.over(get_task_deck())
+        elif cursor.deck is None:
+            # Игра восстановлена из журнала: ищем ее колоду по версии, а если колода
+            # с тех пор изменилась, продолжаем по текущей без уже выданных заданий
+            current = get_task_deck()
+            deck = find_deck(cursor.version)
+            if deck is None:
+                cursor.rebase(current, self.imposter_tasks_history + [self.current_imposter_task])
+            else:
+                cursor.deck = deck
+        # Задания, которые чаще меняют, чем выполняют, выпадают реже (src/task_weights.py)
+        self.current_imposter_task = cursor.draw(task_weights.table_for(cursor.deck) if cursor.deck else None)
         return self.current_imposter_task
 
     def complete_task(self):
         self.tasks_completed += 1
+
+    # --- ГОЛОСОВАНИЕ ---
+
+    def living_players_count(self) -> int:
+        return len(self.players) - self.voted_out_mask.bit_count()
+
+    def cast_vote(self, voter_id: int, accused_id: int) -> bool:
+        """Учитывает голос и возвращает True, если исход голосования уже не может измениться."""
+        self.voted_mask |= self._bit(voter_id)
+        count = self.current_votes.get(accused_id, 0) + 1
+        self.current_votes[accused_id] = count
+
+        # Голоса только прибавляются, поэтому лидера и второе место можно вести инкрементально
+        if accused_id == self.vote_leader_id:
+            self.vote_leader_count = count
+        elif count > self.vote_leader_count:
+            self.vote_runner_up_count = self.vote_leader_count
+            self.vote_leader_id = accused_id
+            self.vote_leader_count = count
+        else:
+            self.vote_runner_up_count = max(self.vote_runner_up_count, count)
+        return self.is_vote_decided()
+
+    def is_vote_decided(self) -> bool:
+        remaining_voters = self.living_players_count() - self.voted_count()
+        if remaining_voters <= 0:
+            return True
+        # Даже если все оставшиеся проголосуют за второго, он не догонит лидера
+        return self.vote_leader_count - self.vote_runner_up_count > remaining_voters
+
+    def vote_winner(self) -> Optional[int]:
+        """ID изгоняемого игрока или None, если голосов нет или они разделились."""
+        if self.vote_leader_count == 0 or self.vote_leader_count == self.vote_runner_up_count:
+            return None
+        return self.vote_leader_id
         
     def reset_vote_state(self):
+        self.vote_deadline = None
+        self.vote_remaining = None
         self.current_votes.clear()
-        self.players_voted.clear()
\ No newline at end of file
+        self.voted_mask = 0
+        self.vote_leader_id = None
+        self.vote_leader_count = 0
+        self.vote_runner_up_count = 0
\ No newline at end of file
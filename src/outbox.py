@@ -0,0 +1,137 @@
+# src/outbox.py
+
+import asyncio
+import logging
+from functools import partial
+from typing import Any, Dict, List, Optional
+
+from aiogram import Bot
+
+from configs.env_config import Config
+from src.broadcaster import Broadcaster, DeliveryResult, broadcaster
+from src.scheduler import Timer, scheduler
+
+# Предел длины текста одного сообщения в Telegram
+MAX_MESSAGE_LENGTH = 4096
+# Чем склеиваются сообщения одной пачки
+SEPARATOR = "\n\n"
+
+
+class _Batch:
+    __slots__ = ("bot", "parts", "length", "parse_mode", "reply_markup", "reply_to_message_id", "futures", "timer")
+
+    def __init__(self, bot: Bot, parse_mode: Optional[str]):
+        self.bot = bot
+        self.parts: List[str] = []
+        self.length = 0
+        self.parse_mode = parse_mode
+        self.reply_markup: Any = None
+        self.reply_to_message_id: Optional[int] = None
+        self.futures: List[asyncio.Future] = []
+        self.timer: Optional[Timer] = None
+
+
+class ChatOutbox:
+    """
+    Исходящие сообщения в чаты с коротким окном склейки.
+    Сообщения в один чат, отправленные в пределах окна, уходят одним сообщением через "\\n\\n":
+    меньше запросов под лимитом ~20 сообщений в минуту на группу. Порядок сообщений в чате сохраняется.
+    В одну пачку попадают только сообщения с одинаковым parse_mode; клавиатура может быть только
+    у последнего сообщения пачки, поэтому сообщение с reply_markup отправляет пачку сразу.
+    Ответ на сообщение (reply_to_message_id) уходит отдельным сообщением, тоже сразу.
+    """
+
+    def __init__(self, window: float, sender: Broadcaster = broadcaster, max_length: int = MAX_MESSAGE_LENGTH):
+        self.window = window
+        self.sender = sender
+        self.max_length = max_length
+        self._batches: Dict[int, _Batch] = {}
+        # Последняя запущенная отправка в каждый чат: следующая пачка ждет ее, чтобы не обогнать
+        self._tails: Dict[int, asyncio.Task] = {}
+
+    def post(self, bot: Bot, chat_id: int, text: str, parse_mode: Optional[str] = None, reply_markup: Any = None,
+             reply_to_message_id: Optional[int] = None) -> asyncio.Future:
+        """
+        Ставит сообщение в очередь чата. Возвращает future с DeliveryResult пачки, в которую оно попало;
+        ждать его не обязательно. parse_mode=None — режим бота по умолчанию.
+        """
+        batch = self._batches.get(chat_id)
+        if batch is not None and (batch.parse_mode != parse_mode or reply_to_message_id is not None
+                                  or batch.length + len(SEPARATOR) + len(text) > self.max_length):
+            self._dispatch(chat_id)
+            batch = None
+        if batch is None:
+            batch = self._batches[chat_id] = _Batch(bot, parse_mode)
+            if self.window > 0:
+                batch.timer = scheduler.schedule(self.window, partial(self._on_window, chat_id), kind="outbox")
+
+        batch.length += len(text) + (len(SEPARATOR) if batch.parts else 0)
+        batch.parts.append(text)
+        future = asyncio.get_running_loop().create_future()
+        batch.futures.append(future)
+        if reply_markup is not None or reply_to_message_id is not None or self.window <= 0:
+            batch.reply_markup = reply_markup
+            batch.reply_to_message_id = reply_to_message_id
+            self._dispatch(chat_id)
+        return future
+
+    def flush_nowait(self, chat_id: int):
+        """
+        Отправляет накопленное в чат немедленно, не дожидаясь доставки (например, в конце игры):
+        лимит частоты на группу задерживает только саму отправку, а не очередь игры.
+        """
+        self._dispatch(chat_id)
+
+    async def flush(self, chat_id: int):
+        """Отправляет накопленное в чат немедленно и дожидается доставки."""
+        self._dispatch(chat_id)
+        tail = self._tails.get(chat_id)
+        if tail is not None:
+            await asyncio.shield(tail)
+
+    async def flush_all(self):
+        for chat_id in list(self._batches):
+            self._dispatch(chat_id)
+        if self._tails:
+            await asyncio.gather(*self._tails.values(), return_exceptions=True)
+
+    def pending_count(self) -> int:
+        return sum(len(batch.parts) for batch in self._batches.values())
+
+    # --- ВНУТРЕННЕЕ ---
+
+    async def _on_window(self, chat_id: int):
+        self._dispatch(chat_id)
+        tail = self._tails.get(chat_id)
+        if tail is not None:
+            await asyncio.shield(tail)
+
+    def _dispatch(self, chat_id: int):
+        batch = self._batches.pop(chat_id, None)
+        if batch is None:
+            return
+        scheduler.cancel(batch.timer)
+        previous = self._tails.get(chat_id)
+        task = asyncio.get_running_loop().create_task(self._deliver(chat_id, batch, previous))
+        self._tails[chat_id] = task
+        task.add_done_callback(lambda t: self._tails.pop(chat_id, None) if self._tails.get(chat_id) is t else None)
+
+    async def _deliver(self, chat_id: int, batch: _Batch, previous: Optional[asyncio.Task]):
+        if previous is not None:
+            await asyncio.wait([previous])
+        kwargs = {}
+        if batch.parse_mode is not None:
+            kwargs["parse_mode"] = batch.parse_mode
+        if batch.reply_markup is not None:
+            kwargs["reply_markup"] = batch.reply_markup
+        if batch.reply_to_message_id is not None:
+            kwargs["reply_to_message_id"] = batch.reply_to_message_id
+        result: DeliveryResult = await self.sender.send(batch.bot, chat_id, SEPARATOR.join(batch.parts), **kwargs)
+        if not result.ok:
+            logging.error(f"Failed to deliver {len(batch.parts)} queued message(s) to chat {chat_id}: {result.error}")
+        for future in batch.futures:
+            if not future.done():
+                future.set_result(result)
+
+
+outbox = ChatOutbox(window=Config.OUTBOX_WINDOW)
@@ -0,0 +1,285 @@
+# src/persistence.py
+
+import atexit
+import glob
+import json
+import logging
+import os
+import queue
+import threading
+from dataclasses import fields
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.model.game import GameSession, Player
+from src.task_deck import DeckCursor
+
+# Поля, которые не имеют смысла после перезапуска процесса или строятся заново из остальных
+_TRANSIENT_FIELDS = {"vote_timer", "approval_timer", "vote_buttons_cache", "render_cache", "player_positions"}
+# Словари с int-ключами: JSON превращает ключи в строки, при загрузке возвращаем обратно
+_INT_KEY_FIELDS = {"pending_players", "current_votes"}
+# Версия формата снимка и журнала. Снимок и журнал другой версии не читаются: при изменении формата
+# увеличьте номер и добавьте сюда же преобразование из предыдущего
+FORMAT_VERSION = 1
+
+
+_PERSISTED_FIELDS = tuple(f.name for f in fields(GameSession) if f.name not in _TRANSIENT_FIELDS)
+
+
+def game_to_dict(game: GameSession) -> dict:
+    data = {}
+    for name in _PERSISTED_FIELDS:
+        value = getattr(game, name)
+        if name == "players":
+            # dataclasses.asdict рекурсивно копирует значения и заметно медленнее
+            value = [{"user_id": p.user_id, "username": p.username, "full_name": p.full_name, "role": p.role} for p in value]
+        elif name == "task_cursor" and value is not None:
+            value = value.to_dict()
+        data[name] = value
+    return data
+
+
+def game_from_dict(data: dict) -> GameSession:
+    data = dict(data)
+    data["players"] = [Player(**p) for p in data.get("players", [])]
+    if data.get("task_cursor") is not None:
+        data["task_cursor"] = DeckCursor.from_dict(data["task_cursor"])
+    for name in _INT_KEY_FIELDS:
+        if name in data:
+            data[name] = {int(k): v for k, v in data[name].items()}
+    return GameSession(**{k: v for k, v in data.items() if k in _PERSISTED_FIELDS})
+
+
+class GameJournal:
+    """
+    Журнал изменений активных игр.
+    Каждое изменение дописывается в journal.jsonl полным состоянием игры (или отметкой об удалении).
+    Первая строка журнала и заголовок снимка хранят FORMAT_VERSION.
+    Время от времени журнал сворачивается в snapshot.json, после чего обнуляется.
+    При старте сначала читается снимок, затем поверх него проигрывается журнал.
+
+    В event loop игра только сериализуется в строку; запись в файл, fsync и свертка снимка идут
+    в отдельном потоке-писателе. Снимок он собирает из уже сериализованных последних состояний игр,
+    так что свертка не трогает объекты игр и не останавливает обработку апдейтов.
+    """
+
+    SNAPSHOT_NAME = "snapshot.json"
+    JOURNAL_NAME = "journal.jsonl"
+
+    def __init__(self, state_dir: str, compact_every: int = 5000, fsync: bool = False):
+        self.state_dir = state_dir
+        self.compact_every = compact_every
+        self.fsync = fsync
+        os.makedirs(state_dir, exist_ok=True)
+        self.snapshot_path = os.path.join(state_dir, self.SNAPSHOT_NAME)
+        self.journal_path = os.path.join(state_dir, self.JOURNAL_NAME)
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+        if self._journal.tell() == 0:
+            self._write_format_header()
+        self._records_since_compaction = 0
+        # {chat_id: JSON последнего состояния игры} — из этого писатель собирает снимок
+        self._latest: Dict[int, str] = {}
+        # Файлы журнала и снимка трогает только тот, кто держит блокировку
+        self._lock = threading.Lock()
+        # (chat_id, JSON игры или None для удаления); None — остановка писателя
+        self._queue: "queue.Queue[Optional[Tuple[int, Optional[str]]]]" = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="game-journal", daemon=True)
+        self._writer.start()
+        self._closed = False
+        # Поток-демон не должен унести с собой недописанный хвост при выходе процесса
+        atexit.register(self.close)
+
+    def record_game(self, game: GameSession):
+        # Сериализуем сразу: объект игры продолжит меняться, пока писатель дойдет до записи
+        self._queue.put((game.chat_id, json.dumps(game_to_dict(game), ensure_ascii=False, separators=(",", ":"))))
+
+    def record_end(self, chat_id: int):
+        self._queue.put((chat_id, None))
+
+    def flush(self):
+        """Дожидается, пока писатель допишет все, что было записано до вызова."""
+        if not self._closed:
+            self._queue.join()
+
+    def compact(self, games: Iterable[GameSession]):
+        """Атомарно записывает снимок переданных игр и обнуляет журнал (при старте, после восстановления)."""
+        latest = {g.chat_id: json.dumps(game_to_dict(g), ensure_ascii=False, separators=(",", ":")) for g in games}
+        self.flush()
+        with self._lock:
+            self._latest = latest
+            self._compact()
+
+    # --- ПОТОК-ПИСАТЕЛЬ ---
+
+    def _write_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            # Все, что накопилось, пока писали прошлую пачку, — одной записью и одним fsync
+            while len(batch) < 1000:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in batch
+            try:
+                with self._lock:
+                    self._append([item for item in batch if item is not None])
+                    if self._records_since_compaction >= self.compact_every:
+                        self._compact()
+            except Exception as e:
+                logging.error(f"Game journal write to {self.journal_path} failed: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if stop:
+                return
+
+    def _append(self, items: List[Tuple[int, Optional[str]]]):
+        if not items:
+            return
+        lines = []
+        for chat_id, game_json in items:
+            if game_json is None:
+                self._latest.pop(chat_id, None)
+                lines.append(f'{{"op":"del","chat_id":{chat_id}}}\n')
+            else:
+                self._latest[chat_id] = game_json
+                lines.append(f'{{"op":"put","chat_id":{chat_id},"game":{game_json}}}\n')
+        self._journal.write("".join(lines))
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+        self._records_since_compaction += len(items)
+
+    def _compact(self):
+        tmp_path = self.snapshot_path + ".tmp"
+        games = list(self._latest.values())
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(f'{{"format":{FORMAT_VERSION},"games":[')
+            # Кусками: одна склейка всех игр держала бы GIL, пока event loop ждет
+            for start in range(0, len(games), 256):
+                f.write(("," if start else "") + ",".join(games[start:start + 256]))
+            f.write("]}")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        # Журнал обнуляем только после того, как снимок гарантированно на диске
+        self._journal.close()
+        self._journal = open(self.journal_path, "w", encoding="utf-8")
+        self._write_format_header()
+        self._records_since_compaction = 0
+
+    def _write_format_header(self):
+        self._journal.write(f'{{"op":"format","format":{FORMAT_VERSION}}}\n')
+        self._journal.flush()
+
+    def _check_format(self, path: str, version):
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{path} has format {version}, this version of the bot reads format {FORMAT_VERSION}")
+
+    def load(self) -> Dict[int, GameSession]:
+        raw: Dict[int, dict] = {}
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+            self._check_format(self.snapshot_path, snapshot.get("format") if isinstance(snapshot, dict) else None)
+            for data in snapshot["games"]:
+                raw[data["chat_id"]] = data
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                for line_no, line in enumerate(f, 1):
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Недописанная строка на момент падения — все, что дальше, тоже недостоверно
+                        logging.warning(f"Journal {self.journal_path} is truncated at line {line_no}, ignoring the rest")
+                        break
+                    if record["op"] == "format":
+                        self._check_format(self.journal_path, record["format"])
+                    elif record["op"] == "put":
+                        raw[record["chat_id"]] = record["game"]
+                    elif record["op"] == "del":
+                        raw.pop(record["chat_id"], None)
+        return {chat_id: game_from_dict(data) for chat_id, data in raw.items()}
+
+    def close(self):
+        """Дописывает очередь и останавливает писателя. Повторный вызов ничего не делает."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join()
+        self._journal.close()
+        atexit.unregister(self.close)
+
+
+# --- РАСКЛАДКА ЖУРНАЛОВ ПО ШАРДАМ ---
+# В шардированном режиме у каждого воркера своя папка с журналом (shard-N), в обычном журнал лежит
+# прямо в STATE_DIR. Файл LAYOUT_NAME помнит, под какое число шардов разложены игры.
+
+LAYOUT_NAME = "layout"
+
+
+def shard_of_chat(chat_id: int, num_shards: int) -> int:
+    """Шард, которому принадлежит чат. По этой же формуле ShardRouter раздает апдейты."""
+    return chat_id % num_shards
+
+
+def shard_state_dir(state_dir: str, shard_id: int) -> str:
+    return os.path.join(state_dir, f"shard-{shard_id}")
+
+
+def _owner_dir(state_dir: str, num_shards: int, chat_id: int) -> str:
+    return state_dir if num_shards == 0 else shard_state_dir(state_dir, shard_of_chat(chat_id, num_shards))
+
+
+def _read_layout(state_dir: str) -> Optional[int]:
+    try:
+        with open(os.path.join(state_dir, LAYOUT_NAME), "r", encoding="utf-8") as f:
+            return int(f.read())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def reshard_state(state_dir: str, num_shards: int) -> int:
+    """
+    Раскладывает игры по журналам под текущее число шардов (0 — один процесс, журнал в state_dir).
+    После смены SHARD_WORKERS или режима игры переезжают в папку процесса, который теперь получает
+    их апдейты. Вызывается до восстановления игр. Возвращает число игр, если пришлось раскладывать заново.
+    """
+    os.makedirs(state_dir, exist_ok=True)
+    old_shards = _read_layout(state_dir)
+    if old_shards == num_shards:
+        return 0
+    sources = [state_dir] + sorted(glob.glob(os.path.join(state_dir, "shard-*")))
+    games: Dict[int, GameSession] = {}
+    for source in sources:
+        if not any(os.path.exists(os.path.join(source, name)) for name in (GameJournal.SNAPSHOT_NAME, GameJournal.JOURNAL_NAME)):
+            continue
+        journal = GameJournal(source)
+        for chat_id, game in journal.load().items():
+            # Если игра нашлась в нескольких папках, верна копия шарда, который получал ее апдейты
+            if chat_id not in games or old_shards is None or source == _owner_dir(state_dir, old_shards, chat_id):
+                games[chat_id] = game
+        journal.close()
+
+    targets: Dict[str, List[GameSession]] = {}
+    for chat_id, game in games.items():
+        targets.setdefault(_owner_dir(state_dir, num_shards, chat_id), []).append(game)
+    # Сначала новые снимки, потом очистка старых журналов, последней — отметка о раскладке: если упасть
+    # посередине, игра окажется в двух папках в одном и том же состоянии, и следующий запуск разложит ее заново
+    for target, target_games in targets.items():
+        journal = GameJournal(target)
+        journal.compact(target_games)
+        journal.close()
+    for source in sources:
+        if source not in targets:
+            for name in (GameJournal.SNAPSHOT_NAME, GameJournal.JOURNAL_NAME):
+                if os.path.exists(os.path.join(source, name)):
+                    os.remove(os.path.join(source, name))
+    tmp_path = os.path.join(state_dir, LAYOUT_NAME + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(str(num_shards))
+    os.replace(tmp_path, os.path.join(state_dir, LAYOUT_NAME))
+    if games:
+        logging.info(f"Re-sharded {len(games)} games from {old_shards} to {num_shards} shards")
+    return len(games)
@@ -0,0 +1,192 @@
+# src/render.py
+
+from typing import Dict, List, Optional
+
+from src.model.game import GameSession, Player
+
+# Markdown V1: экранируем _, *, `, [ — одной таблицей вместо регулярного выражения
+_MARKDOWN_ESCAPES = str.maketrans({"_": "\\_", "*": "\\*", "`": "\\`", "[": "\\["})
+
+
+def escape_markdown(text: str) -> str:
+    """Экранирует специальные символы Markdown V1."""
+    return text.translate(_MARKDOWN_ESCAPES)
+
+
+# ---------------------------------------------------------------------
+# --- ШАБЛОНЫ ---
+# ---------------------------------------------------------------------
+# Шаблоны разбираются один раз при импорте: в хендлерах остается только вызов .format
+
+_PLAYER_JOINED = "✅ {name} присоединяется к игре!\n**Текущий список игроков ({count}):** {roster}".format
+_PLAYERS_JOINED = "✅ {names} присоединяются к игре!\n**Текущий список игроков ({count}):** {roster}".format
+_DIGEST = ("📝 Заявки на участие в игре в чате '{title}' ({count}):\n{lines}\n\n"
+           "Отметьте нужные заявки кнопками ниже или одобрите всех сразу.").format
+_DIGEST_LINE = "{mark} {name}{username}".format
+_DIGEST_CLOSED = "📝 Заявки в чате '{title}' разобраны. Игроков в лобби: {count}.".format
+# Сообщение Telegram ограничено 4096 символами; заявки перечисляются, пока сводка не длиннее этого
+DIGEST_MAX_LENGTH = 4000
+_GAME_STARTED = ("Игра началась! Среди вас **{imposters}** импостера(-ов).\n"
+                 "У вас есть {votes} попыток на голосование. Удачи!").format
+_IMPOSTER_ROLE = ("🤫 Ты — Импостер! Твоя цель — выполнить {tasks} задания вместе с командой.{teammates}\n\n"
+                  "Ваше общее задание: **{task}**\n\n"
+                  "У тебя есть {skips} возможность сменить задание.").format
+_TEAMMATES = "\nВаши напарники: **{names}**.".format
+_CREW_ROLE = ("👥 Ты — член экипажа. Ваша цель — вычислить **{imposters}** импостера(-ов).\n"
+              "У вас есть {votes} попыток на голосование. Используйте их с умом!").format
+_TASK_DONE = "✅ Задание выполнено! Импостеры выполнили {done} из {total} заданий. Будьте начеку!".format
+_VOTE_CALLED = ("📢 {name} созывает экстренное совещание!\n"
+                "Использована попытка голосования {used} из {total}.\n"
+                "**У вас есть {minutes} минут, чтобы проголосовать в личном чате с ботом!**").format
+_IMPOSTER_FOUND = "✅ **Один импостер был найден!** Это был {name}.".format
+_VOTE_STATUS = ("В игре осталось **{imposters}** импостера(-ов). "
+                "Осталось попыток для голосования: **{remaining}/{total}**").format
+_GAME_OVER = "{headline}Коварными импостерами были: {imposters}!{history}".format
+_HISTORY_HEADER = "\n\nЗадания, которые импостер успел выполнить:\n"
+
+IMPOSTERS_WIN_BY_TASKS = "🏆 **Победа Импостеров!**\nОни успешно выполнили все {tasks} задания\n"
+CREW_WINS = "🏆 **Победа Экипажа!**\nВсе импостеры были найдены!\n"
+IMPOSTERS_WIN_BY_NUMBERS = "🏆 **Победа Импостеров!**\nИх осталось слишком много, чтобы сопротивляться.\n"
+IMPOSTERS_WIN_BY_VOTES = ("Попытки голосования закончились, а импостеры так и не были найдены!\n\n"
+                          "🏆 **Победа Импостеров!**\n")
+
+
+# ---------------------------------------------------------------------
+# --- КЭШ ИГРЫ ---
+# ---------------------------------------------------------------------
+
+class GameRenderCache:
+    """
+    Уже экранированные куски сообщений одной игры.
+    Списки игроков и истории заданий в игре только растут, поэтому кэш дописывается
+    по мере их роста, а не пересобирается.
+    """
+
+    __slots__ = ("names", "roster", "history_lines", "imposters")
+
+    def __init__(self):
+        # {user_id: экранированное имя}
+        self.names: Dict[int, str] = {}
+        # ", ".join имен всех игроков в порядке вступления
+        self.roster = ""
+        self.history_lines: List[str] = []
+        # Имена исходных импостеров; состав не меняется после старта игры
+        self.imposters: Optional[str] = None
+
+
+def _cache(game: GameSession) -> GameRenderCache:
+    cache = game.render_cache
+    if cache is None:
+        cache = game.render_cache = GameRenderCache()
+    # Дописываем игроков, вступивших после прошлого обращения
+    if len(cache.names) < len(game.players):
+        added = [escape_markdown(p.full_name) for p in game.players[len(cache.names):]]
+        for player, name in zip(game.players[len(cache.names):], added):
+            cache.names[player.user_id] = name
+        cache.roster = ", ".join(added) if not cache.roster else cache.roster + ", " + ", ".join(added)
+    history = game.imposter_tasks_history
+    if len(cache.history_lines) < len(history):
+        cache.history_lines.extend(
+            f"{i}. {escape_markdown(task)}" for i, task in enumerate(history[len(cache.history_lines):], len(cache.history_lines) + 1)
+        )
+    return cache
+
+
+def player_name(game: GameSession, player: Player) -> str:
+    return _cache(game).names.get(player.user_id) or escape_markdown(player.full_name)
+
+
+def imposter_names(game: GameSession) -> str:
+    cache = _cache(game)
+    if cache.imposters is None:
+        cache.imposters = ", ".join(cache.names[uid] for uid in game.original_imposter_ids)
+    return cache.imposters
+
+
+def task_history(game: GameSession) -> str:
+    """История ВЫПОЛНЕННЫХ заданий импостера для вывода в чат."""
+    if game.tasks_completed <= 0:
+        return ""
+    return _HISTORY_HEADER + "\n\n".join(_cache(game).history_lines[:game.tasks_completed])
+
+
+# ---------------------------------------------------------------------
+# --- СООБЩЕНИЯ ---
+# ---------------------------------------------------------------------
+
+def player_joined(game: GameSession, player: Player) -> str:
+    cache = _cache(game)
+    return _PLAYER_JOINED(name=cache.names[player.user_id], count=len(game.players), roster=cache.roster)
+
+
+def players_joined(game: GameSession, players: List[Player]) -> str:
+    """Одно объявление в группу на всю пачку одобренных заявок."""
+    if len(players) == 1:
+        return player_joined(game, players[0])
+    cache = _cache(game)
+    names = ", ".join(cache.names[p.user_id] for p in players)
+    return _PLAYERS_JOINED(names=names, count=len(game.players), roster=cache.roster)
+
+
+def approval_digest(game: GameSession) -> str:
+    """Текст сводки заявок лобби для админа."""
+    title = escape_markdown(game.chat_title)
+    if not game.pending_players:
+        return _DIGEST_CLOSED(title=title, count=len(game.players))
+    total = len(game.pending_players)
+    # Запас под строку «…и еще N»
+    budget = DIGEST_MAX_LENGTH - len(_DIGEST(title=title, count=total, lines="")) - 30
+    lines: List[str] = []
+    length = 0
+    for data in game.pending_players.values():
+        line = _DIGEST_LINE(
+            mark="✅" if data.get("selected", True) else "⬜",
+            name=escape_markdown(data["full_name"]),
+            username=f" (@{escape_markdown(data['username'])})" if data.get("username") else ""
+        )
+        if length + len(line) + 1 > budget:
+            break
+        lines.append(line)
+        length += len(line) + 1
+    if total > len(lines):
+        lines.append(f"…и еще {total - len(lines)}")
+    return _DIGEST(title=title, count=total, lines="\n".join(lines))
+
+
+def game_started(game: GameSession) -> str:
+    return _GAME_STARTED(imposters=game.imposters_count(), votes=game.votes_total)
+
+
+def role_message(game: GameSession, player: Player) -> str:
+    if player.role != "imposter":
+        return _CREW_ROLE(imposters=game.imposters_count(), votes=game.votes_total)
+    names = _cache(game).names
+    teammates = [names[uid] for uid in game.imposter_ids if uid != player.user_id]
+    return _IMPOSTER_ROLE(
+        tasks=game.TASKS_TO_WIN,
+        teammates=_TEAMMATES(names=", ".join(teammates)) if teammates else "",
+        task=escape_markdown(game.current_imposter_task),
+        skips=game.imposter_task_skips_left
+    )
+
+
+def task_done(game: GameSession) -> str:
+    return _TASK_DONE(done=game.tasks_completed, total=game.TASKS_TO_WIN)
+
+
+def vote_called(game: GameSession, caller_full_name: str, minutes: int) -> str:
+    return _VOTE_CALLED(name=escape_markdown(caller_full_name), used=game.votes_used, total=game.votes_total, minutes=minutes)
+
+
+def imposter_found(game: GameSession, player: Player) -> str:
+    return _IMPOSTER_FOUND(name=player_name(game, player))
+
+
+def vote_status(game: GameSession) -> str:
+    remaining = game.votes_total - game.votes_used
+    return _VOTE_STATUS(imposters=game.imposters_count(), remaining=remaining, total=game.votes_total)
+
+
+def game_over(game: GameSession, headline: str) -> str:
+    """Финальное сообщение: заголовок с исходом игры, имена импостеров и выполненные задания."""
+    return _GAME_OVER(headline=headline, imposters=imposter_names(game), history=task_history(game))
@@ -0,0 +1,149 @@
+# src/scheduler.py
+
+import asyncio
+import heapq
+import itertools
+import logging
+from collections import Counter
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+TimerCallback = Callable[[], Awaitable[None]]
+
+
+class Timer:
+    """Запланированный вызов. Отмена ленивая: запись остается в куче, пока до нее не дойдет очередь."""
+
+    __slots__ = ("when", "seq", "callback", "kind", "group", "cancelled")
+
+    def __init__(self, when: float, seq: int, callback: TimerCallback, kind: str, group: Optional[int]):
+        self.when = when
+        self.seq = seq
+        self.callback = callback
+        self.kind = kind
+        self.group = group
+        self.cancelled = False
+
+    def __lt__(self, other: "Timer") -> bool:
+        return (self.when, self.seq) < (other.when, other.seq)
+
+
+class Scheduler:
+    """
+    Единый планировщик всех игровых дедлайнов: окончание голосований, отложенное удаление сообщений и т.п.
+    Таймеры лежат в одной куче, а в event loop всегда взведен только один asyncio-таймер — на ближайший дедлайн.
+    Таймеры можно группировать по id игры и отменять всю группу разом.
+    """
+
+    def __init__(self):
+        self._heap: List[Timer] = []
+        self._seq = itertools.count()
+        self._groups: Dict[int, Set[Timer]] = {}
+        self._pending = Counter()
+        self._cancelled_in_heap = 0
+        self._armed: Optional[asyncio.TimerHandle] = None
+        self._armed_at: Optional[float] = None
+        self._running: Set[asyncio.Task] = set()
+
+    # --- ПЛАНИРОВАНИЕ ---
+
+    def schedule(self, delay: float, callback: TimerCallback, kind: str, group: Optional[int] = None) -> Timer:
+        loop = asyncio.get_running_loop()
+        timer = Timer(loop.time() + max(0.0, delay), next(self._seq), callback, kind, group)
+        heapq.heappush(self._heap, timer)
+        self._pending[kind] += 1
+        if group is not None:
+            self._groups.setdefault(group, set()).add(timer)
+        self._arm(loop)
+        return timer
+
+    def cancel(self, timer: Optional[Timer]) -> bool:
+        if timer is None or timer.cancelled:
+            return False
+        timer.cancelled = True
+        self._forget(timer)
+        self._cancelled_in_heap += 1
+        # Если отмененных записей стало больше половины кучи, пересобираем ее
+        if self._cancelled_in_heap * 2 > len(self._heap):
+            self._heap = [t for t in self._heap if not t.cancelled]
+            heapq.heapify(self._heap)
+            self._cancelled_in_heap = 0
+        return True
+
+    def cancel_group(self, group: int) -> int:
+        """Отменяет все таймеры игры. Возвращает число отмененных таймеров."""
+        timers = self._groups.pop(group, set())
+        for timer in list(timers):
+            self.cancel(timer)
+        return len(timers)
+
+    # --- МОНИТОРИНГ ---
+
+    def pending_count(self, kind: Optional[str] = None) -> int:
+        if kind is not None:
+            return self._pending[kind]
+        return sum(self._pending.values())
+
+    def pending_counts(self) -> Dict[str, int]:
+        return {kind: count for kind, count in self._pending.items() if count}
+
+    def remaining(self, timer: Timer) -> float:
+        return max(0.0, timer.when - asyncio.get_running_loop().time())
+
+    async def wait_running(self, timeout: float) -> bool:
+        """Дожидается колбэков, которые уже выполняются (при остановке процесса). True, если успели."""
+        if not self._running:
+            return True
+        _, pending = await asyncio.wait(set(self._running), timeout=timeout)
+        return not pending
+
+    # --- ВНУТРЕННЕЕ ---
+
+    def _forget(self, timer: Timer):
+        self._pending[timer.kind] -= 1
+        if timer.group is not None:
+            group = self._groups.get(timer.group)
+            if group is not None:
+                group.discard(timer)
+                if not group:
+                    del self._groups[timer.group]
+
+    def _arm(self, loop: asyncio.AbstractEventLoop):
+        while self._heap and self._heap[0].cancelled:
+            heapq.heappop(self._heap)
+            self._cancelled_in_heap -= 1
+        if not self._heap:
+            return
+        when = self._heap[0].when
+        if self._armed is not None and self._armed_at <= when:
+            return
+        if self._armed is not None:
+            self._armed.cancel()
+        self._armed = loop.call_at(when, self._fire)
+        self._armed_at = when
+
+    def _fire(self):
+        loop = asyncio.get_running_loop()
+        self._armed = None
+        self._armed_at = None
+        now = loop.time()
+        while self._heap and self._heap[0].when <= now:
+            timer = heapq.heappop(self._heap)
+            if timer.cancelled:
+                self._cancelled_in_heap -= 1
+                continue
+            timer.cancelled = True
+            self._forget(timer)
+            task = loop.create_task(self._run(timer))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+        self._arm(loop)
+
+    @staticmethod
+    async def _run(timer: Timer):
+        try:
+            await timer.callback()
+        except Exception:
+            logging.exception(f"Scheduled {timer.kind} callback failed (group {timer.group})")
+
+
+scheduler = Scheduler()
@@ -0,0 +1,366 @@
+# src/sharding.py
+
+import asyncio
+import importlib
+import logging
+import multiprocessing as mp
+import os
+import secrets
+import signal
+import threading
+import time
+from typing import Dict, List, Optional
+
+from aiogram import Bot
+from aiogram.methods import GetUpdates
+from aiohttp import web
+
+from configs.env_config import Config
+from src.keyboards import callback_chat_id
+from src.persistence import reshard_state, shard_of_chat, shard_state_dir
+from src.webhook import HEALTH_PATH, webhook_url
+
+# Фабрики бота и диспетчера передаются воркерам строкой "модуль:функция",
+# чтобы их можно было импортировать в новом процессе
+DEFAULT_BOT_FACTORY = "tg:create_bot"
+DEFAULT_DISPATCHER_FACTORY = "tg:build_dispatcher"
+# Как часто воркер сообщает фронту число обработанных апдейтов
+PROGRESS_INTERVAL = 0.1
+# Запас сверх DRAIN_TIMEOUT, который фронт дает воркеру на остановку: после graceful_shutdown
+# воркер еще закрывает очередь личных сообщений, журналы и сессию бота
+STOP_MARGIN = 5.0
+
+
+class ShardRouter:
+    """
+    Решает, какому воркеру отдать апдейт.
+    Групповые чаты делятся по chat_id. Кнопки голосов, заданий и сводки заявок несут chat_id игры
+    в callback_data и идут в ее шард сразу. Для остальных личных апдейтов связь игрок -> игра
+    воркеры присылают во фронт по мере изменения.
+    """
+
+    def __init__(self, num_shards: int):
+        self.num_shards = num_shards
+        # {user_id: chat_id игры}
+        self.routes: Dict[int, int] = {}
+
+    def shard_of_chat(self, chat_id: int) -> int:
+        return shard_of_chat(chat_id, self.num_shards)
+
+    def update_route(self, user_id: int, chat_id: Optional[int]):
+        if chat_id is None:
+            self.routes.pop(user_id, None)
+        else:
+            self.routes[user_id] = chat_id
+
+    def _shard_of_user(self, user_id: int) -> int:
+        chat_id = self.routes.get(user_id)
+        return self.shard_of_chat(chat_id if chat_id is not None else user_id)
+
+    def shard_for(self, update: dict) -> int:
+        message = update.get("message") or update.get("edited_message")
+        if message:
+            chat_id = message["chat"]["id"]
+            if chat_id < 0:
+                return self.shard_of_chat(chat_id)
+            return self._shard_of_user(message.get("from", {}).get("id", chat_id))
+
+        query = update.get("callback_query")
+        if query:
+            query_message = query.get("message")
+            if query_message and query_message["chat"]["id"] < 0:
+                return self.shard_of_chat(query_message["chat"]["id"])
+            data = query.get("data") or ""
+            # Сводка заявок у админа: chat_id лобби записан в callback_data
+            if data.startswith("digest_"):
+                return self.shard_of_chat(int(data.split("_")[2]))
+            # Голоса и задания: chat_id игры записан в callback_data, таблица маршрутов не нужна
+            chat_id = callback_chat_id(data)
+            if chat_id is not None:
+                return self.shard_of_chat(chat_id)
+            # Админ одобряет заявку из ЛС: игра определяется по игроку из callback_data
+            if data.startswith(("admin_approve_", "admin_reject_")):
+                return self._shard_of_user(int(data.rsplit("_", 1)[1]))
+            return self._shard_of_user(query["from"]["id"])
+
+        return 0
+
+
+def _load(path: str):
+    module_name, attr = path.split(":")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+# ---------------------------------------------------------------------
+# --- ВОРКЕР ---
+# ---------------------------------------------------------------------
+
+def worker_main(shard_id: int, num_shards: int, updates: mp.Queue, events: mp.Queue, bot_factory: str,
+                dispatcher_factory: str, state_dir: str):
+    # Останавливает воркер фронт (через None в очереди), а не сигнал терминала.
+    # SIGTERM приходит, если воркер не уложился в срок остановки (см. _run_worker)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.basicConfig(level=logging.INFO, format=f"%(asctime)s - %(levelname)s - shard {shard_id} - %(name)s - %(message)s")
+    asyncio.run(_run_worker(shard_id, num_shards, updates, events, bot_factory, dispatcher_factory, state_dir))
+
+
+async def _run_worker(shard_id: int, num_shards: int, updates: mp.Queue, events: mp.Queue, bot_factory: str,
+                      dispatcher_factory: str, state_dir: str):
+    import src.game_state as state
+    from src.handlers import resume_vote_timers
+    from src.approvals import resume_digests
+    from src.persistence import GameJournal
+    from src.metrics import start_metrics_server
+    from src.delivery import delivery
+    from src.history import history
+    from src.shutdown import graceful_shutdown, hand_off_votes
+    from src.broadcaster import broadcaster
+
+    bot: Bot = _load(bot_factory)()
+    dp = _load(dispatcher_factory)()
+    # Все воркеры шлют с одного токена: лимит Telegram на бота делится между ними поровну
+    broadcaster.share_global_rate(num_shards)
+
+    state.membership_listeners.append(lambda user_id, chat_id: events.put(("route", user_id, chat_id)))
+    restored = state.restore_games(GameJournal(state_dir, fsync=Config.JOURNAL_FSYNC))
+    resume_vote_timers(bot)
+    resume_digests(bot)
+    delivery.start(bot, os.path.join(state_dir, "delivery.sqlite3"))
+    # У каждого шарда свои сегменты журнала; /stats читает всю папку целиком
+    history.open(os.path.join(Config.HISTORY_DIR, f"shard-{shard_id}"))
+    logging.info(f"Shard {shard_id} restored {restored} games")
+    metrics_runner = None
+    if Config.METRICS_PORT:
+        metrics_runner = await start_metrics_server(Config.METRICS_HOST, Config.METRICS_PORT + 1 + shard_id)
+
+    loop = asyncio.get_running_loop()
+
+    def terminate():
+        # Фронт не дождался остановки: голосования и хвост журналов сохраняем сразу, остальное бросаем
+        logging.warning(f"Shard {shard_id} terminated before a graceful stop, saving games and exiting")
+        hand_off_votes()
+        if state.journal is not None:
+            state.journal.close()
+        history.flush()
+        delivery.close()
+        os._exit(0)
+
+    loop.add_signal_handler(signal.SIGTERM, terminate)
+    in_flight = set()
+    processed = 0
+
+    async def feed(raw: dict):
+        nonlocal processed
+        try:
+            await dp.feed_raw_update(bot, raw)
+        except Exception:
+            logging.exception(f"Shard {shard_id} failed to process update {raw.get('update_id')}")
+        finally:
+            processed += 1
+
+    reported = 0
+
+    def flush_progress():
+        nonlocal reported
+        if processed != reported:
+            events.put(("processed", shard_id, processed - reported))
+            reported = processed
+
+    async def report_progress():
+        while True:
+            await asyncio.sleep(PROGRESS_INTERVAL)
+            flush_progress()
+
+    reporter = asyncio.create_task(report_progress())
+    while True:
+        raw = await loop.run_in_executor(None, updates.get)
+        if raw is None:
+            break
+        task = asyncio.create_task(feed(raw))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+
+    # Даем разосланным апдейтам дойти до shutdown.tracker: начатые хендлеры дождется graceful_shutdown
+    await asyncio.sleep(0)
+    # Голосования — следующему запуску, исходящие — дописать (src/shutdown.py)
+    drained = await graceful_shutdown(bot, Config.DRAIN_TIMEOUT)
+    reporter.cancel()
+    flush_progress()
+    delivery.close()
+    events.put(("stopped", shard_id, drained))
+    if metrics_runner:
+        await metrics_runner.cleanup()
+    await bot.session.close()
+
+
+# ---------------------------------------------------------------------
+# --- ФРОНТ ---
+# ---------------------------------------------------------------------
+
+class ShardedRuntime:
+    """Запускает воркеры и раздает им апдейты по ShardRouter."""
+
+    def __init__(self, num_workers: int, bot_factory: str = DEFAULT_BOT_FACTORY,
+                 dispatcher_factory: str = DEFAULT_DISPATCHER_FACTORY, state_dir: Optional[str] = None):
+        self.num_workers = num_workers
+        self.bot_factory = bot_factory
+        self.dispatcher_factory = dispatcher_factory
+        self.state_dir = state_dir or Config.STATE_DIR
+        self.router = ShardRouter(num_workers)
+        self.processed = 0
+        self._queues: List[mp.Queue] = []
+        self._processes: List[mp.Process] = []
+        self._events: Optional[mp.Queue] = None
+        self._events_thread: Optional[threading.Thread] = None
+        self._stopped = 0
+        # Воркеры, которые перед выходом дообработали все полученные апдейты
+        self._drained = 0
+
+    def start(self):
+        # Игры из журналов прежней раскладки (другое число воркеров, обычный режим) — в шарды по chat_id
+        reshard_state(self.state_dir, self.num_workers)
+        ctx = mp.get_context("spawn")
+        self._events = ctx.Queue()
+        for shard_id in range(self.num_workers):
+            updates = ctx.Queue()
+            process = ctx.Process(
+                target=worker_main,
+                args=(shard_id, self.num_workers, updates, self._events, self.bot_factory, self.dispatcher_factory,
+                      shard_state_dir(self.state_dir, shard_id)),
+                name=f"shard-{shard_id}",
+                daemon=True
+            )
+            process.start()
+            self._queues.append(updates)
+            self._processes.append(process)
+        self._events_thread = threading.Thread(target=self._read_events, name="shard-events", daemon=True)
+        self._events_thread.start()
+
+    def _read_events(self):
+        while self._stopped < self.num_workers:
+            event = self._events.get()
+            if event[0] == "route":
+                self.router.update_route(event[1], event[2])
+            elif event[0] == "processed":
+                self.processed += event[2]
+            elif event[0] == "stopped":
+                self._stopped += 1
+                self._drained += event[2]
+
+    def drained(self) -> bool:
+        """После stop(): все воркеры штатно остановились и обработали все, что им раздали."""
+        return self._drained == self.num_workers
+
+    def alive_workers(self) -> int:
+        return sum(process.is_alive() for process in self._processes)
+
+    def route(self, update: dict) -> int:
+        shard_id = self.router.shard_for(update)
+        self._queues[shard_id].put(update)
+        return shard_id
+
+    def stop(self, timeout: float = 30):
+        """
+        Останавливает воркеры. timeout — их собственный срок на остановку (DRAIN_TIMEOUT);
+        сверх него каждый получает STOP_MARGIN, потом SIGTERM.
+        """
+        for updates in self._queues:
+            updates.put(None)
+        deadline = time.monotonic() + timeout + STOP_MARGIN
+        for process in self._processes:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                logging.warning(f"Worker {process.name} did not stop in {timeout + STOP_MARGIN}s, terminating")
+                process.terminate()
+                process.join(STOP_MARGIN)
+        if self._events_thread:
+            self._events_thread.join(1)
+
+
+async def run_sharded(bot: Bot, num_workers: int):
+    """Фронтовой процесс: принимает апдейты (polling или webhook) и раздает их воркерам."""
+    runtime = ShardedRuntime(num_workers)
+    # Типы апдейтов, на которые есть хендлеры, — как в start_polling и run_webhook обычного режима
+    allowed_updates = _load(runtime.dispatcher_factory)().resolve_used_update_types()
+    runtime.start()
+    logging.info(f"Started {num_workers} shard workers")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    last_update_id = None
+    try:
+        if Config.BOT_MODE == "webhook":
+            await _serve_webhook(bot, runtime, stop, allowed_updates)
+        else:
+            last_update_id = await _poll(bot, runtime, stop, allowed_updates)
+    finally:
+        await asyncio.to_thread(runtime.stop, Config.DRAIN_TIMEOUT)
+        if last_update_id is not None:
+            # Подтверждаем Telegram принятое, только если воркеры все это обработали. Иначе часть апдейтов
+            # осталась в очередях убитых воркеров — пусть следующий запуск получит их снова
+            if runtime.drained():
+                from src.shutdown import acknowledge_updates
+                await acknowledge_updates(bot, last_update_id)
+            else:
+                logging.warning(f"Not every shard worker drained its updates, leaving updates up to "
+                                f"{last_update_id} unacknowledged for the next start")
+        await bot.session.close()
+
+
+async def _poll(bot: Bot, runtime: ShardedRuntime, stop: asyncio.Event, allowed_updates: List[str]) -> Optional[int]:
+    """Раздает апдейты воркерам до сигнала остановки. Возвращает update_id последнего разосланного."""
+    await bot.delete_webhook(drop_pending_updates=Config.DROP_PENDING_UPDATES)
+    offset = None
+    while not stop.is_set():
+        request = asyncio.create_task(bot(GetUpdates(offset=offset, timeout=30, allowed_updates=allowed_updates)))
+        stopped = asyncio.create_task(stop.wait())
+        done, _ = await asyncio.wait({request, stopped}, return_when=asyncio.FIRST_COMPLETED)
+        stopped.cancel()
+        if request not in done:
+            request.cancel()
+            break
+        try:
+            updates = request.result()
+        except Exception as e:
+            logging.error(f"getUpdates failed: {e}")
+            await asyncio.sleep(1)
+            continue
+        for update in updates:
+            runtime.route(update.model_dump(mode="json", exclude_none=True, by_alias=True))
+            offset = update.update_id + 1
+    return None if offset is None else offset - 1
+
+
+async def _serve_webhook(bot: Bot, runtime: ShardedRuntime, stop: asyncio.Event, allowed_updates: List[str]):
+    async def handle(request: web.Request) -> web.Response:
+        token = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+        if Config.WEBHOOK_SECRET and not secrets.compare_digest(token, Config.WEBHOOK_SECRET):
+            return web.Response(status=401)
+        runtime.route(await request.json())
+        return web.Response()
+
+    async def health(request: web.Request) -> web.Response:
+        alive = runtime.alive_workers()
+        return web.json_response({"status": "ok" if alive == runtime.num_workers else "degraded", "workers": alive},
+                                 status=200 if alive else 503)
+
+    app = web.Application()
+    app.router.add_post(Config.WEBHOOK_PATH, handle)
+    app.router.add_get(HEALTH_PATH, health)
+
+    await bot.set_webhook(
+        webhook_url(),
+        secret_token=Config.WEBHOOK_SECRET or None,
+        allowed_updates=allowed_updates,
+        drop_pending_updates=Config.DROP_PENDING_UPDATES
+    )
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, Config.WEBAPP_HOST, Config.WEBAPP_PORT).start()
+    try:
+        await stop.wait()
+    finally:
+        await runner.cleanup()
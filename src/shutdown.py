@@ -0,0 +1,170 @@
+# src/shutdown.py
+
+import asyncio
+import logging
+import signal
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.methods import GetUpdates
+from aiogram.types import TelegramObject, Update
+
+from configs.env_config import Config
+import src.game_state as state
+from src.delivery import delivery
+from src.history import history
+from src.outbox import outbox
+from src.scheduler import scheduler
+import src.task_manager as tm
+
+
+class InFlightTracker(BaseMiddleware):
+    """
+    Внешний middleware на dp.update: считает апдейты, которые сейчас обрабатываются,
+    и помнит последний принятый update_id — его подтверждаем Telegram при остановке.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.last_update_id: Optional[int] = None
+        self._idle: Optional[asyncio.Event] = None
+
+    async def __call__(self, handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                       event: Update, data: Dict[str, Any]) -> Any:
+        if self.last_update_id is None or event.update_id > self.last_update_id:
+            self.last_update_id = event.update_id
+        self.count += 1
+        if self._idle is not None:
+            self._idle.clear()
+        try:
+            return await handler(event, data)
+        finally:
+            self.count -= 1
+            if self.count == 0 and self._idle is not None:
+                self._idle.set()
+
+    async def wait_idle(self, timeout: float) -> bool:
+        """Ждет, пока не останется апдейтов в обработке. True, если успели."""
+        if self.count == 0:
+            return True
+        if self._idle is None:
+            self._idle = asyncio.Event()
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+
+tracker = InFlightTracker()
+
+
+def setup_dispatcher(dp: Dispatcher):
+    # Первым среди внешних: апдейт считается "в работе" и тогда, когда его отбросит дедупликация
+    dp.update.outer_middleware(tracker)
+
+
+def hand_off_votes() -> int:
+    """
+    Снимает таймеры открытых голосований и сохраняет в журнал оставшееся у них время:
+    после перезапуска resume_vote_timers продолжит отсчет, время простоя голосованию не засчитается.
+    """
+    now = time.time()
+    handed_off = 0
+    for game in list(state.active_games.values()):
+        if not game.is_voting_active or game.vote_timer is None:
+            continue
+        scheduler.cancel(game.vote_timer)
+        game.vote_timer = None
+        game.vote_remaining = max(0.0, (game.vote_deadline or now) - now)
+        state.save_game(game)
+        handed_off += 1
+    return handed_off
+
+
+async def acknowledge_updates(bot: Bot, last_update_id: Optional[int]):
+    """
+    Подтверждает Telegram все апдейты до last_update_id включительно, чтобы после перезапуска
+    они не пришли снова. Из ответа ничего не обрабатываем: неподтвержденный апдейт получит следующий запуск.
+    """
+    if last_update_id is None:
+        return
+    try:
+        await bot(GetUpdates(offset=last_update_id + 1, limit=1, timeout=0))
+    except Exception as e:
+        logging.warning(f"Failed to acknowledge updates up to {last_update_id}: {e}")
+
+
+async def graceful_shutdown(bot: Bot, timeout: float = Config.DRAIN_TIMEOUT, acknowledge: bool = False) -> bool:
+    """
+    Штатная остановка после того, как прием апдейтов прекращен. Все шаги делят один дедлайн timeout:
+    1. дожидаемся хендлеров и сработавших таймеров, которые еще выполняются;
+    2. (polling) подтверждаем Telegram принятые апдейты;
+    3. передаем открытые голосования следующему запуску (hand_off_votes);
+    4. отправляем накопленное в outbox групп и дожидаемся очереди личных сообщений;
+    5. дописываем результаты заданий, журнал игр и журнал истории.
+    Что не успело уйти из очереди личных сообщений, останется в ее базе и уйдет после перезапуска.
+    Возвращает True, если все начатые хендлеры и таймеры успели завершиться.
+    """
+    started = time.monotonic()
+    deadline = started + timeout
+
+    def left() -> float:
+        return max(0.0, deadline - time.monotonic())
+
+    in_flight = tracker.count
+    drained = await tracker.wait_idle(left())
+    drained = await scheduler.wait_running(left()) and drained
+    if not drained:
+        logging.warning(f"{tracker.count} updates were still running after {timeout}s, shutting down anyway")
+    if acknowledge:
+        await acknowledge_updates(bot, tracker.last_update_id)
+
+    votes = hand_off_votes()
+    try:
+        await asyncio.wait_for(outbox.flush_all(), left())
+    except asyncio.TimeoutError:
+        logging.warning("Group outbox was not flushed before the shutdown deadline")
+    await delivery.stop(timeout=max(left(), 0.01))
+    await tm.flush_task_results()
+    if state.journal is not None:
+        await asyncio.to_thread(state.journal.flush)
+    await history.close()
+    logging.info(f"Shutdown: drained {in_flight} in-flight updates, handed off {votes} open votes "
+                 f"in {time.monotonic() - started:.2f}s")
+    return drained
+
+
+async def poll_until_signal(dp: Dispatcher, bot: Bot):
+    """
+    Long polling до SIGTERM/SIGINT; после возврата новые апдейты не принимаются, а начатые еще
+    обрабатываются — их дожидается graceful_shutdown. Сигналы обрабатываем сами, а не aiogram:
+    он закрывает сессию бота сразу после остановки polling, а исходящие еще нужно дописать.
+    """
+    await bot.delete_webhook(drop_pending_updates=Config.DROP_PENDING_UPDATES)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    polling = asyncio.create_task(dp.start_polling(bot, handle_signals=False, close_bot_session=False))
+    stopped = asyncio.create_task(stop.wait())
+    try:
+        await asyncio.wait({polling, stopped}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        stopped.cancel()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.remove_signal_handler(sig)
+    if not polling.done():
+        logging.info("Stop signal received, no longer accepting updates")
+        try:
+            await dp.stop_polling()
+        except RuntimeError:
+            # Polling еще не успел запуститься
+            polling.cancel()
+    try:
+        await polling
+    except asyncio.CancelledError:
+        if not stop.is_set():
+            raise
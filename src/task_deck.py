@@ -0,0 +1,172 @@
+# src/task_deck.py
+
+import hashlib
+import random
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from weakref import WeakValueDictionary
+
+# Сколько раз перевыбирать по весам уже выпавшее задание, прежде чем взять равномерно из оставшихся
+MAX_REJECTIONS = 8
+
+
+class TaskDeck:
+    """
+    Неизменяемый снимок списка заданий в игре. Один объект на версию делят все игры,
+    начатые при этой версии; своих копий заданий игры не хранят.
+    Версия — хэш содержимого, поэтому после перезапуска та же колода получает ту же версию.
+    """
+
+    __slots__ = ("version", "tasks", "__weakref__")
+
+    def __init__(self, tasks: Tuple[str, ...]):
+        self.version = hashlib.blake2b("\n".join(tasks).encode(), digest_size=8).hexdigest()
+        self.tasks = tasks
+
+    def __len__(self) -> int:
+        return len(self.tasks)
+
+
+# {version: колода}. Колода живет, пока она текущая или на нее ссылается хотя бы одна игра
+_decks: "WeakValueDictionary[str, TaskDeck]" = WeakValueDictionary()
+
+
+def register_deck(deck: TaskDeck):
+    _decks[deck.version] = deck
+
+
+def find_deck(version: str) -> Optional[TaskDeck]:
+    return _decks.get(version)
+
+
+class AliasTable:
+    """
+    Таблица алиасов (метод Воуза) для выбора индекса с заданными весами.
+    Построение — O(n), выбор — O(1): одна равномерная ячейка и одно сравнение.
+    """
+
+    __slots__ = ("prob", "alias")
+
+    def __init__(self, weights: Sequence[float]):
+        n = len(weights)
+        total = sum(weights)
+        self.prob: List[float] = [1.0] * n
+        self.alias: List[int] = list(range(n))
+        if n == 0 or total <= 0:
+            return
+        scaled = [w * n / total for w in weights]
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        # Остатки — ровно 1 с точностью до округления
+        for i in small + large:
+            self.prob[i] = 1.0
+
+    def __len__(self) -> int:
+        return len(self.prob)
+
+    def sample(self) -> int:
+        i = random.randrange(len(self.prob))
+        return i if random.random() < self.prob[i] else self.alias[i]
+
+
+class DeckCursor:
+    """
+    Ленивая случайная перестановка колоды для одной игры: разреженный Фишер-Йетс.
+    Хранятся только число вытянутых карт и позиции, которые успели поменяться местами,
+    поэтому создание курсора — O(1), а вытягивание задания — O(1) независимо от размера колоды.
+    """
+
+    __slots__ = ("version", "drawn", "swaps", "positions", "deck")
+
+    def __init__(self, version: str, drawn: int = 0, swaps: Optional[Dict[int, int]] = None, deck: Optional[TaskDeck] = None):
+        self.version = version
+        self.drawn = drawn
+        # {позиция: индекс задания в колоде}; отсутствующая позиция i означает задание i
+        self.swaps: Dict[int, int] = swaps if swaps is not None else {}
+        # Обратная таблица {индекс задания: позиция}, строится по swaps и не сохраняется
+        self.positions: Dict[int, int] = {index: position for position, index in self.swaps.items()}
+        # Не сохраняется: после перезапуска колода находится по версии (find_deck)
+        self.deck = deck
+
+    @classmethod
+    def over(cls, deck: TaskDeck) -> "DeckCursor":
+        return cls(deck.version, deck=deck)
+
+    def rebase(self, deck: TaskDeck, dealt: Iterable[str] = ()):
+        """
+        Начинает перестановку заново поверх другой колоды (снимок прежней версии потерян).
+        Задания из dealt, которые есть в новой колоде, считаются уже вытянутыми.
+        """
+        self.version = deck.version
+        self.drawn = 0
+        self.swaps = {}
+        self.positions = {}
+        self.deck = deck
+        dealt = set(dealt)
+        if not dealt:
+            return
+        for task_index, task in enumerate(deck.tasks):
+            if task in dealt:
+                dealt.discard(task)
+                self._deal(self._position(task_index))
+
+    def remaining(self) -> int:
+        return len(self.deck) - self.drawn if self.deck is not None else 0
+
+    def _position(self, task_index: int) -> int:
+        """Текущая позиция задания в перестановке; -1, если задание уже вытянуто."""
+        position = self.positions.get(task_index)
+        if position is not None:
+            return position
+        # Место задания занято другим, а само оно ни на какой позиции не лежит — его уже вытянули
+        return -1 if task_index in self.swaps else task_index
+
+    def _take(self, position: int) -> int:
+        task_index = self.swaps.pop(position, position)
+        self.positions.pop(task_index, None)
+        return task_index
+
+    def _deal(self, j: int) -> int:
+        """Вытягивает задание с позиции j (j >= drawn) и возвращает его индекс в колоде."""
+        i = self.drawn
+        picked = self._take(j)
+        if j != i:
+            # Позиция i больше не понадобится: на место j кладем то, что лежало в i
+            moved = self._take(i)
+            if moved != j:
+                self.swaps[j] = moved
+                self.positions[moved] = j
+        self.drawn += 1
+        return picked
+
+    def draw(self, weights: Optional[AliasTable] = None) -> Optional[str]:
+        """
+        Следующее задание игры. С таблицей весов (src/task_weights.py) задание выбирается по весам,
+        уже выпавшие отбрасываются и выбор повторяется; если за MAX_REJECTIONS попыток подходящего нет
+        (почти вся колода вытянута), берется равномерно случайное из оставшихся.
+        """
+        deck = self.deck
+        if deck is None or self.drawn >= len(deck):
+            return None
+        j = None
+        if weights is not None and len(weights) == len(deck):
+            for _ in range(MAX_REJECTIONS):
+                position = self._position(weights.sample())
+                if position >= self.drawn:
+                    j = position
+                    break
+        if j is None:
+            j = random.randrange(self.drawn, len(deck))
+        return deck.tasks[self._deal(j)]
+
+    def to_dict(self) -> dict:
+        return {"version": self.version, "drawn": self.drawn, "swaps": self.swaps}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "DeckCursor":
+        return cls(data["version"], data["drawn"], {int(k): v for k, v in data["swaps"].items()}, find_deck(data["version"]))
@@ -1,84 +1,96 @@
-# src/task_manager.py (обновленная версия)
-
-import os
-from src.tasks import ALL_TASKS, BACKLOG_TASKS
-
-# Теперь у нас только один файл для всех заданий
-TASKS_FILE_PATH = "src/tasks.py"
-
-def _read_both_task_lists():
-    """Безопасно читает ОБА списка заданий из одного файла."""
-    try:
-        with open(TASKS_FILE_PATH, 'r', encoding='utf-8') as f:
-            content = f.read()
-            local_scope = {}
-            exec(content, {}, local_scope)
-            prod_tasks = local_scope.get("ALL_TASKS", [])
-            backlog_tasks = local_scope.get("BACKLOG_TASKS", [])
-            return prod_tasks, backlog_tasks
-    except FileNotFoundError:
-        return [], []
-
-def _write_both_task_lists(prod_tasks, backlog_tasks):
-    """Безопасно записывает ОБА списка заданий в один файл."""
-    with open(TASKS_FILE_PATH, 'w', encoding='utf-8') as f:
-        f.write("# src/tasks.py\n\n")
-        
-        # Записываем ALL_TASKS
-        f.write("ALL_TASKS = [\n")
-        for task in prod_tasks:
-            formatted_task = task.replace('"', '\\"')
-            if '\n' in formatted_task:
-                f.write(f'    """{formatted_task}""",\n')
-            else:
-                f.write(f'    "{formatted_task}",\n')
-        f.write("]\n\n")
-        
-        # Записываем BACKLOG_TASKS
-        f.write("BACKLOG_TASKS = [\n")
-        for task in backlog_tasks:
-            formatted_task = task.replace('"', '\\"')
-            if '\n' in formatted_task:
-                f.write(f'    """{formatted_task}""",\n')
-            else:
-                f.write(f'    "{formatted_task}",\n')
-        f.write("]\n")
-
-def get_production_tasks():
-    prod_tasks, _ = _read_both_task_lists()
-    return prod_tasks
-
-def get_backlog_tasks():
-    _, backlog_tasks = _read_both_task_lists()
-    return backlog_tasks
+# src/task_manager.py (версия на SQLite)
+
+import asyncio
+import logging
+from typing import List, Optional, Set
+
+from configs.env_config import Config
+from src.task_deck import TaskDeck, register_deck
+from src.task_store import TaskStore
+from src.task_weights import task_weights
+
+_store: Optional[TaskStore] = None
+_deck: Optional[TaskDeck] = None
+# Версия хранилища, при которой колода была прочитана
+_deck_store_version: Optional[int] = None
+# Фоновые записи результатов заданий: хендлер не ждет SQLite, остановка бота дожидается их
+_result_writes: Set[asyncio.Task] = set()
+
+def get_store() -> TaskStore:
+    """Открывает хранилище при первом обращении. Пустая база заполняется заданиями из src/tasks.py."""
+    global _store
+    if _store is None:
+        from src.tasks import ALL_TASKS, BACKLOG_TASKS
+        _store = TaskStore(Config.TASKS_DB_PATH, seed=(ALL_TASKS, BACKLOG_TASKS))
+        task_weights.load(_store.task_stats())
+    return _store
+
+def get_production_tasks() -> List[str]:
+    return get_store().list_tasks('prod')
+
+def get_task_deck() -> TaskDeck:
+    """
+    Общая колода заданий для новых игр. Перечитывается из хранилища, только когда изменилась его версия
+    (например, после /move_to_prod); если список заданий в игре при этом не изменился, колода та же.
+    """
+    global _deck, _deck_store_version
+    store = get_store()
+    version = store.version
+    if _deck is None or version != _deck_store_version:
+        tasks = tuple(store.list_tasks('prod'))
+        if _deck is None or tasks != _deck.tasks:
+            _deck = TaskDeck(tasks)
+            register_deck(_deck)
+        _deck_store_version = version
+    return _deck
+
+def get_backlog_tasks() -> List[str]:
+    return get_store().list_tasks('backlog')
 
 def add_task_to_backlog(task_text: str):
-    prod_tasks, backlog_tasks = _read_both_task_lists()
-    backlog_tasks.append(task_text)
-    _write_both_task_lists(prod_tasks, backlog_tasks)
-
-def move_task(source_list: str, task_index: int):
-    prod_tasks, backlog_tasks = _read_both_task_lists()
-
-    if source_list == 'backlog':
-        if 0 <= task_index < len(backlog_tasks):
-            task_to_move = backlog_tasks.pop(task_index)
-            prod_tasks.append(task_to_move)
-    elif source_list == 'prod':
-        if 0 <= task_index < len(prod_tasks):
-            task_to_move = prod_tasks.pop(task_index)
-            backlog_tasks.append(task_to_move)
-    
-    _write_both_task_lists(prod_tasks, backlog_tasks)
-
-def delete_task(source_list: str, task_index: int):
-    prod_tasks, backlog_tasks = _read_both_task_lists()
-    
-    if source_list == 'backlog':
-        if 0 <= task_index < len(backlog_tasks):
-            backlog_tasks.pop(task_index)
-    elif source_list == 'prod':
-        if 0 <= task_index < len(prod_tasks):
-            prod_tasks.pop(task_index)
-            
-    _write_both_task_lists(prod_tasks, backlog_tasks)
\ No newline at end of file
+    get_store().add('backlog', task_text)
+
+def move_task(source_list: str, task_index: int) -> bool:
+    target_list = 'prod' if source_list == 'backlog' else 'backlog'
+    return get_store().move(source_list, task_index, target_list)
+
+def delete_task(source_list: str, task_index: int) -> bool:
+    return get_store().delete(source_list, task_index)
+
+
+# --- НЕБЛОКИРУЮЩИЕ ВЕРСИИ ДЛЯ ХЕНДЛЕРОВ ---
+# Работа с диском уходит в поток, чтобы не останавливать event loop.
+
+async def aget_production_tasks() -> List[str]:
+    return await asyncio.to_thread(get_production_tasks)
+
+async def aget_backlog_tasks() -> List[str]:
+    return await asyncio.to_thread(get_backlog_tasks)
+
+async def aadd_task_to_backlog(task_text: str):
+    await asyncio.to_thread(add_task_to_backlog, task_text)
+
+async def amove_task(source_list: str, task_index: int) -> bool:
+    return await asyncio.to_thread(move_task, source_list, task_index)
+
+async def adelete_task(source_list: str, task_index: int) -> bool:
+    return await asyncio.to_thread(delete_task, source_list, task_index)
+
+def record_task_result(task: Optional[str], done: bool):
+    """Выполнение или смена задания: вес меняется сразу, запись в базу уходит в поток в фоне."""
+    if not task:
+        return
+    task_weights.record(task, done)
+    write = asyncio.get_running_loop().create_task(asyncio.to_thread(get_store().record_result, task, done))
+    _result_writes.add(write)
+    write.add_done_callback(_on_result_written)
+
+def _on_result_written(write: asyncio.Task):
+    _result_writes.discard(write)
+    if not write.cancelled() and write.exception() is not None:
+        logging.error(f"Failed to save a task result: {write.exception()}")
+
+async def flush_task_results():
+    """Дожидается фоновых записей результатов заданий (при остановке бота)."""
+    if _result_writes:
+        await asyncio.gather(*_result_writes, return_exceptions=True)
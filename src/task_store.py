@@ -0,0 +1,176 @@
+# src/task_store.py
+
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+LISTS = ("prod", "backlog")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id   INTEGER PRIMARY KEY AUTOINCREMENT,
+    list TEXT    NOT NULL,
+    seq  INTEGER NOT NULL,
+    text TEXT    NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tasks_list_seq ON tasks (list, seq);
+CREATE INDEX IF NOT EXISTS tasks_seq ON tasks (seq);
+CREATE TABLE IF NOT EXISTS task_stats (
+    text    TEXT    PRIMARY KEY,
+    done    INTEGER NOT NULL DEFAULT 0,
+    skipped INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+class TaskStore:
+    """
+    Хранилище заданий в SQLite.
+    Списки кэшируются в памяти; кэш сбрасывается, когда версия базы
+    (PRAGMA user_version) изменилась, например после записи из другого процесса.
+    """
+
+    def __init__(self, db_path: str, seed: Optional[Tuple[Sequence[str], Sequence[str]]] = None):
+        self.db_path = db_path
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        # {list: [(id, text), ...]} в порядке seq
+        self._cache: Dict[str, List[Tuple[int, str]]] = {}
+        self._cache_version: Optional[int] = None
+        if seed is not None and self.version == 0:
+            self._seed(*seed)
+
+    # --- ВНУТРЕННЕЕ ---
+
+    def _read_version(self) -> int:
+        return self._conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def _ensure_cache(self):
+        version = self._read_version()
+        if version == self._cache_version:
+            return
+        cache = {name: [] for name in LISTS}
+        for task_id, list_name, text in self._conn.execute("SELECT id, list, text FROM tasks ORDER BY seq"):
+            cache.setdefault(list_name, []).append((task_id, text))
+        self._cache = cache
+        self._cache_version = version
+
+    def _write(self, statements: Sequence[Tuple[str, tuple]], must_change: bool = False) -> Optional[Tuple[bool, Optional[int]]]:
+        """
+        Выполняет изменения одной транзакцией и повышает версию базы.
+        Возвращает (был ли кэш актуален до записи, rowid последней вставки).
+        Если кэш был актуален, вызывающий обязан сам применить изменение к кэшу.
+        С must_change=True, если последний запрос не затронул ни одной строки (задание уже изменил
+        другой процесс), транзакция откатывается, кэш сбрасывается и возвращается None.
+        """
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = self._read_version()
+            cursor = None
+            for sql, params in statements:
+                cursor = self._conn.execute(sql, params)
+            if must_change and cursor is not None and cursor.rowcount == 0:
+                self._conn.execute("ROLLBACK")
+                self._cache_version = None
+                return None
+            self._conn.execute(f"PRAGMA user_version = {version + 1}")
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        cache_was_fresh = version == self._cache_version
+        # Если кто-то записал в базу раньше нас, кэш перечитается при следующем обращении
+        self._cache_version = version + 1 if cache_was_fresh else None
+        return cache_was_fresh, cursor.lastrowid if cursor else None
+
+    def _seed(self, prod_tasks: Sequence[str], backlog_tasks: Sequence[str]):
+        rows = [("prod", text) for text in prod_tasks] + [("backlog", text) for text in backlog_tasks]
+        self._write([
+            ("INSERT INTO tasks (list, seq, text) VALUES (?, ?, ?)", (list_name, seq, text))
+            for seq, (list_name, text) in enumerate(rows)
+        ])
+
+    def _task_id(self, list_name: str, task_index: int) -> Optional[int]:
+        tasks = self._cache.get(list_name, [])
+        if 0 <= task_index < len(tasks):
+            return tasks[task_index][0]
+        return None
+
+    # --- ПУБЛИЧНЫЙ API ---
+
+    @property
+    def version(self) -> int:
+        with self._lock:
+            return self._read_version()
+
+    def list_tasks(self, list_name: str) -> List[str]:
+        with self._lock:
+            self._ensure_cache()
+            return [text for _, text in self._cache.get(list_name, [])]
+
+    def add(self, list_name: str, text: str):
+        with self._lock:
+            cache_was_fresh, task_id = self._write([(
+                "INSERT INTO tasks (list, seq, text) VALUES (?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM tasks), ?)",
+                (list_name, text)
+            )])
+            if cache_was_fresh:
+                self._cache.setdefault(list_name, []).append((task_id, text))
+
+    def move(self, source_list: str, task_index: int, target_list: str) -> bool:
+        with self._lock:
+            self._ensure_cache()
+            task_id = self._task_id(source_list, task_index)
+            if task_id is None:
+                return False
+            # id взят из кэша до транзакции: list в условии отсекает задание, которое уже перенесли
+            written = self._write([(
+                "UPDATE tasks SET list = ?, seq = (SELECT MAX(seq) + 1 FROM tasks) WHERE id = ? AND list = ?",
+                (target_list, task_id, source_list)
+            )], must_change=True)
+            if written is None:
+                return False
+            if written[0]:
+                task = self._cache[source_list].pop(task_index)
+                self._cache.setdefault(target_list, []).append(task)
+            return True
+
+    def delete(self, list_name: str, task_index: int) -> bool:
+        with self._lock:
+            self._ensure_cache()
+            task_id = self._task_id(list_name, task_index)
+            if task_id is None:
+                return False
+            written = self._write([("DELETE FROM tasks WHERE id = ? AND list = ?", (task_id, list_name))], must_change=True)
+            if written is None:
+                return False
+            if written[0]:
+                self._cache[list_name].pop(task_index)
+            return True
+
+    # --- СТАТИСТИКА ЗАДАНИЙ ---
+    # Отдельно от списков: не меняет версию базы и не сбрасывает кэш и колоду
+
+    def record_result(self, text: str, done: bool):
+        column = "done" if done else "skipped"
+        with self._lock:
+            self._conn.execute(
+                f"INSERT INTO task_stats (text, {column}) VALUES (?, 1) "
+                f"ON CONFLICT (text) DO UPDATE SET {column} = {column} + 1",
+                (text,)
+            )
+
+    def task_stats(self) -> Dict[str, Tuple[int, int]]:
+        """{текст задания: (выполнено, сменено)}"""
+        with self._lock:
+            return {text: (done, skipped) for text, done, skipped in self._conn.execute("SELECT text, done, skipped FROM task_stats")}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
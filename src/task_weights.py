@@ -0,0 +1,96 @@
+# src/task_weights.py
+
+from collections import OrderedDict
+from typing import Dict, List, Mapping, Optional, Tuple
+
+from src.task_deck import AliasTable, TaskDeck
+
+# Априорные выполнения и смены (сглаживание Лапласа): у нового задания вес 0.5,
+# а одна смена не выбивает задание из игры
+PRIOR_DONE = 1.0
+PRIOR_SKIPPED = 1.0
+# Нижняя граница веса: даже самое нелюбимое задание иногда выпадает и может реабилитироваться
+MIN_WEIGHT = 0.05
+# Таблица алиасов перестраивается после REBUILD_EVERY новых результатов, но не чаще,
+# чем раз в len(колоды) / REBUILD_SHARE результатов: на огромных колодах перестройка O(n) редкая
+REBUILD_EVERY = 32
+REBUILD_SHARE = 64
+# Сколько версий колоды держать с готовыми таблицами: восстановленные игры тянут задания из прежней
+# колоды вперемешку с новыми играми, и одна общая таблица перестраивалась бы почти на каждом выборе
+MAX_DECKS = 4
+
+
+class _DeckTable:
+    """Таблица алиасов одной версии колоды: веса ее заданий по порядку и позиции заданий."""
+
+    __slots__ = ("weights", "positions", "table", "pending")
+
+    def __init__(self, deck: TaskDeck, weights: List[float]):
+        self.weights = weights
+        self.positions: Dict[str, List[int]] = {}
+        for i, task in enumerate(deck.tasks):
+            self.positions.setdefault(task, []).append(i)
+        self.table = AliasTable(weights)
+        self.pending = 0
+
+    def rebuild(self):
+        self.table = AliasTable(self.weights)
+        self.pending = 0
+
+
+class TaskWeights:
+    """
+    Веса заданий по истории: доля выполнений среди выполнений и смен (со сглаживанием).
+    Результат пересчитывает вес одного задания за O(1); таблица алиасов своя у каждой версии колоды
+    (последние MAX_DECKS) и перестраивается лениво — после накопления новых результатов, так что
+    перестройка O(n) размазывается по многим результатам, а выбор задания всегда O(1).
+    """
+
+    def __init__(self, prior_done: float = PRIOR_DONE, prior_skipped: float = PRIOR_SKIPPED,
+                 rebuild_every: int = REBUILD_EVERY):
+        self.prior_done = prior_done
+        self.prior_skipped = prior_skipped
+        self.rebuild_every = rebuild_every
+        # {текст задания: [выполнено, сменено]} — по тексту, чтобы статистика переживала правки колоды
+        self.stats: Dict[str, List[int]] = {}
+        # {версия колоды: таблица}, от давно не использованной к последней
+        self._tables: "OrderedDict[str, _DeckTable]" = OrderedDict()
+
+    def load(self, stats: Mapping[str, Tuple[int, int]]):
+        self.stats = {task: [done, skipped] for task, (done, skipped) in stats.items()}
+        self._tables.clear()
+
+    def weight(self, task: str) -> float:
+        done, skipped = self.stats.get(task, (0, 0))
+        rate = (done + self.prior_done) / (done + skipped + self.prior_done + self.prior_skipped)
+        return max(rate, MIN_WEIGHT)
+
+    def record(self, task: Optional[str], done: bool):
+        if not task:
+            return
+        counts = self.stats.setdefault(task, [0, 0])
+        counts[0 if done else 1] += 1
+        weight = None
+        for entry in self._tables.values():
+            positions = entry.positions.get(task)
+            if positions:
+                if weight is None:
+                    weight = self.weight(task)
+                for i in positions:
+                    entry.weights[i] = weight
+                entry.pending += 1
+
+    def table_for(self, deck: TaskDeck) -> AliasTable:
+        entry = self._tables.get(deck.version)
+        if entry is None:
+            entry = self._tables[deck.version] = _DeckTable(deck, [self.weight(task) for task in deck.tasks])
+            if len(self._tables) > MAX_DECKS:
+                self._tables.popitem(last=False)
+        else:
+            self._tables.move_to_end(deck.version)
+            if entry.pending >= max(self.rebuild_every, len(deck) // REBUILD_SHARE):
+                entry.rebuild()
+        return entry.table
+
+
+task_weights = TaskWeights()
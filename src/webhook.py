@@ -0,0 +1,83 @@
+# src/webhook.py
+
+import asyncio
+import logging
+import signal
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from configs.env_config import Config
+import src.game_state as state
+
+HEALTH_PATH = "/healthz"
+
+
+def webhook_url() -> str:
+    """Адрес, который регистрируется в Telegram. Без WEBHOOK_BASE_URL вебхук не заработает — падаем сразу."""
+    if not Config.WEBHOOK_BASE_URL:
+        raise RuntimeError("BOT_MODE=webhook requires WEBHOOK_BASE_URL: the public https address Telegram will post updates to")
+    return f"{Config.WEBHOOK_BASE_URL.rstrip('/')}{Config.WEBHOOK_PATH}"
+
+
+def build_webhook_app(dp: Dispatcher, bot: Bot, path: str, secret_token: str = "", drain_timeout: float = 10) -> web.Application:
+    """Создает aiohttp-приложение: прием апдейтов, проверка секрета, health-check и дренаж при остановке."""
+    from src.shutdown import tracker
+
+    app = web.Application()
+    app["draining"] = False
+    request_handler = SimpleRequestHandler(dispatcher=dp, bot=bot, secret_token=secret_token or None)
+
+    async def health(request: web.Request) -> web.Response:
+        status = 503 if app["draining"] else 200
+        return web.json_response(
+            {"status": "draining" if app["draining"] else "ok", "active_games": len(state.active_games)},
+            status=status
+        )
+
+    async def drain(app: web.Application):
+        # Новые соединения сервер уже не принимает; дожидаемся апдейтов, которые еще в работе
+        # (их считает InFlightTracker из src/shutdown.py, он же в build_dispatcher)
+        app["draining"] = True
+        if not tracker.count:
+            return
+        logging.info(f"Draining {tracker.count} in-flight updates")
+        if not await tracker.wait_idle(drain_timeout):
+            logging.warning(f"{tracker.count} updates were still running after {drain_timeout}s")
+
+    # Дренаж должен отработать раньше, чем request_handler закроет сессию бота
+    app.on_shutdown.append(drain)
+    request_handler.register(app, path=path)
+    app.router.add_get(HEALTH_PATH, health)
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot):
+    """Регистрирует вебхук в Telegram и обслуживает его до SIGTERM/SIGINT."""
+    url = webhook_url()
+    app = build_webhook_app(dp, bot, Config.WEBHOOK_PATH, Config.WEBHOOK_SECRET, Config.DRAIN_TIMEOUT)
+
+    await bot.set_webhook(
+        url,
+        secret_token=Config.WEBHOOK_SECRET or None,
+        allowed_updates=dp.resolve_used_update_types(),
+        drop_pending_updates=Config.DROP_PENDING_UPDATES
+    )
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, Config.WEBAPP_HOST, Config.WEBAPP_PORT)
+    await site.start()
+    logging.info(f"Webhook server is listening on {Config.WEBAPP_HOST}:{Config.WEBAPP_PORT}{Config.WEBHOOK_PATH}")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+    try:
+        await stop.wait()
+    finally:
+        # cleanup перестает принимать запросы, затем вызывает on_shutdown (дренаж)
+        await runner.cleanup()
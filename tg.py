@@ -1,49 +1,44 @@
 # tg.py (финальная, исправленная версия)
 
 import asyncio
+import hashlib
+import json
 import logging
+import os
 import traceback
+from typing import List, Optional, Tuple
 from aiogram import Bot, Dispatcher, F
 from aiogram.enums import ParseMode
 from aiogram.client.default import DefaultBotProperties
-from aiogram.types import BotCommand, BotCommandScopeDefault, BotCommandScopeChat, Update, ErrorEvent
+from aiogram.types import BotCommand, BotCommandScope, BotCommandScopeDefault, BotCommandScopeChat, Update, ErrorEvent
 
 from configs.env_config import Config
-from src.handlers import admin_router, player_router
+import src.game_state as state
+from src.handlers import admin_router, player_router, resume_vote_timers
+from src.persistence import GameJournal, reshard_state
+from src.approvals import resume_digests
+from src.delivery import delivery
+from src.history import history
+from src.error_reports import error_reports
+from src import metrics, dedup, game_actor, shutdown
+# src.webhook и src.sharding (aiohttp.web, multiprocessing) импортируются в main только в своем режиме
 
-# Вспомогательная функция для HTML-экранирования
-def escape_html(text: str) -> str:
-    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+# Хэш последних успешно зарегистрированных команд меню (см. sync_commands)
+COMMANDS_HASH_FILE = "commands.sha"
+# Фоновые задачи старта: ссылка нужна, чтобы задачу не собрал сборщик мусора
+_background: set = set()
 
 async def errors_handler(event: ErrorEvent, bot: Bot):
     """
-    Ловит все ошибки из хендлеров, логирует их и сообщает админу.
+    Ловит все ошибки из хендлеров и логирует их. Админ получает трейсбек только при первом
+    появлении ошибки, а дальше — предупреждения о частоте и периодическую сводку (src/error_reports.py).
     """
     update = event.update
     exception = event.exception
     
-    error_text = f"❗️ Произошла ошибка в боте!\n\n"
-    error_text += f"Тип апдейта: {update.event_type}\n"
-    
     tb_str = "".join(traceback.format_exception(type(exception), exception, exception.__traceback__))
-    
-    # --- ИЗМЕНЕНИЕ: Логика усечения длинного сообщения ---
-    MAX_TRACEBACK_LEN = 4000 # Оставляем запас до лимита в 4096
-    if len(tb_str) > MAX_TRACEBACK_LEN:
-        tb_str = f"... (Traceback урезан) ...\n{tb_str[-MAX_TRACEBACK_LEN:]}"
-        
-    error_text += f"\nTraceback:\n<code>{escape_html(tb_str)}</code>"
-
     logging.error(f"Caught exception: {exception}\n{tb_str}")
-
-    try:
-        await bot.send_message(
-            Config.ADMIN_USER_ID,
-            error_text,
-            parse_mode=ParseMode.HTML
-        )
-    except Exception as e:
-        logging.error(f"Не удалось отправить сообщение об ошибке админу: {e}")
+    error_reports.record(bot, exception, update.event_type, tb_str)
 
     if update.message:
         try:
@@ -53,9 +48,9 @@ async def errors_handler(event: ErrorEvent, bot: Bot):
     
     return True
 
-async def set_commands(bot: Bot):
+def command_sets() -> List[Tuple[List[BotCommand], BotCommandScope]]:
     """
-    Создает и устанавливает список команд, которые будут видны в меню.
+    Списки команд меню и области видимости, для которых они устанавливаются.
     """
     # Команды, которые видят ВСЕ пользователи
     user_commands = [
@@ -82,38 +77,145 @@ async def set_commands(bot: Bot):
         BotCommand(command="move_to_prod", description="⬆️ Из черновика в игру"),
         BotCommand(command="move_to_backlog", description="⬇️ Из игры в черновик"),
         BotCommand(command="delete_prod", description="🗑️ Удалить из игры"),
-        BotCommand(command="delete_backlog", description="🗑️ Удалить из черновика")
+        BotCommand(command="delete_backlog", description="🗑️ Удалить из черновика"),
+        BotCommand(command="stats", description="📊 Статистика сыгранных игр")
         
     ]
 
-    # 2. Устанавливаем команды для всех пользователей по умолчанию
-    # Они увидят только команду /vote
-    await bot.set_my_commands(user_commands, BotCommandScopeDefault())
-    
-    # 3. Устанавливаем расширенный набор команд персонально для администратора
-    # Эти команды будут видны только вам в вашем личном чате с ботом
-    await bot.set_my_commands(admin_commands, BotCommandScopeChat(chat_id=Config.ADMIN_USER_ID))
+    return [
+        # 2. Команды для всех пользователей по умолчанию
+        (user_commands, BotCommandScopeDefault()),
+        # 3. Расширенный набор команд персонально для администратора
+        # Эти команды будут видны только вам в вашем личном чате с ботом
+        (admin_commands, BotCommandScopeChat(chat_id=Config.ADMIN_USER_ID)),
+    ]
 
+async def set_commands(bot: Bot):
+    """
+    Создает и устанавливает список команд, которые будут видны в меню.
+    """
+    for commands, scope in command_sets():
+        await bot.set_my_commands(commands, scope)
 
-async def main():
-    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(name)s - %(message)s")
+def commands_hash(bot: Bot) -> str:
+    """Хэш списков команд вместе с id бота: меняется, только когда меню действительно нужно обновить."""
+    payload = json.dumps(
+        [bot.id, [[[c.model_dump() for c in commands], scope.model_dump()] for commands, scope in command_sets()]],
+        ensure_ascii=False, sort_keys=True
+    )
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+async def _register_commands(bot: Bot, path: str, digest: str):
+    try:
+        await set_commands(bot)
+    except Exception:
+        # Хэш не записан — при следующем запуске попробуем снова
+        logging.exception("Failed to register bot commands")
+        return
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        f.write(digest)
+    logging.info("Bot commands registered")
 
+def sync_commands(bot: Bot) -> Optional[asyncio.Task]:
+    """
+    Обновляет меню команд, не задерживая старт: если списки не менялись с прошлой успешной
+    регистрации (хэш в STATE_DIR), запросов нет вовсе, иначе они уходят в фоне, пока бот уже
+    принимает апдейты.
+    """
+    path = os.path.join(Config.STATE_DIR, COMMANDS_HASH_FILE)
+    digest = commands_hash(bot)
+    try:
+        with open(path) as f:
+            if f.read().strip() == digest:
+                return None
+    except FileNotFoundError:
+        pass
+    task = asyncio.create_task(_register_commands(bot, path, digest))
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+    return task
+
+
+def create_bot() -> Bot:
     bot = Bot(
         token=Config.TG_TOKEN, # Убедитесь, что здесь правильное имя переменной
         default=DefaultBotProperties(parse_mode=ParseMode.MARKDOWN)
     )
-    
+    if Config.METRICS_PORT:
+        metrics.instrument_bot(bot)
+    return bot
+
+def build_dispatcher() -> Dispatcher:
     dp = Dispatcher()
     
     dp.errors.register(errors_handler)
+    # Учет апдейтов в обработке для штатной остановки (src/shutdown.py)
+    shutdown.setup_dispatcher(dp)
     
     dp.include_router(admin_router)
     dp.include_router(player_router)
     
-    await set_commands(bot)
+    # Повторные апдейты и двойные нажатия кнопок отсекаются до роутинга (src/dedup.py)
+    dedup.setup_dispatcher(dp)
+    # События одной игры обрабатываются по очереди, разных игр — параллельно (src/game_actor.py)
+    game_actor.setup_dispatcher(dp)
+    if Config.METRICS_PORT:
+        metrics.setup_dispatcher(dp)
+    return dp
+
+def restore_state(bot: Bot, state_dir: str):
+    """Восстанавливает игры, прерванные перезапуском, до того как начнут приходить апдейты."""
+    # Игры, которые жили в шардах (SHARD_WORKERS > 0), переезжают в общий журнал
+    reshard_state(state_dir, 0)
+    restored = state.restore_games(GameJournal(state_dir, fsync=Config.JOURNAL_FSYNC))
+    resumed = resume_vote_timers(bot)
+    digests = resume_digests(bot)
+    logging.info(f"Restored {restored} games, resumed {resumed} vote timers and {digests} approval digests")
+
+
+async def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(name)s - %(message)s")
+
+    if Config.BOT_MODE == "webhook":
+        # Адрес проверяем до запуска воркеров и восстановления игр: без него вебхук все равно не заработает
+        from src.webhook import webhook_url
+        webhook_url()
+
+    bot = create_bot()
+
+    if Config.SHARD_WORKERS > 0:
+        # Игры живут в процессах-воркерах, здесь только прием и маршрутизация апдейтов
+        from src.sharding import run_sharded
+        sync_commands(bot)
+        await run_sharded(bot, Config.SHARD_WORKERS)
+        return
+
+    dp = build_dispatcher()
+    restore_state(bot, Config.STATE_DIR)
+
+    # Меню команд обновляется в фоне и только если изменилось: бот начинает слушать сразу
+    sync_commands(bot)
+    # Очередь личных сообщений: заодно дошлет то, что не успело уйти до перезапуска
+    delivery.start(bot)
+    history.open(Config.HISTORY_DIR)
     
-    await bot.delete_webhook(drop_pending_updates=True)
-    await dp.start_polling(bot)
+    metrics_runner = None
+    if Config.METRICS_PORT:
+        metrics_runner = await metrics.start_metrics_server(Config.METRICS_HOST, Config.METRICS_PORT)
+    try:
+        if Config.BOT_MODE == "webhook":
+            from src.webhook import run_webhook
+            await run_webhook(dp, bot)
+        else:
+            await shutdown.poll_until_signal(dp, bot)
+    finally:
+        # Дожидаемся начатых хендлеров, передаем голосования следующему запуску, дописываем исходящие
+        await shutdown.graceful_shutdown(bot, Config.DRAIN_TIMEOUT, acknowledge=Config.BOT_MODE != "webhook")
+        delivery.close()
+        if metrics_runner:
+            await metrics_runner.cleanup()
+        await bot.session.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file